@@ -24,11 +24,23 @@ from app.models.users import User
 from app.models.notes import Note
 from app.models.day_ratings import DayRating
 from app.models.polling import Polling, PollingString
+from app.models.analytics import UserActivityDaily
 
 target_metadata = Base.metadata
 
 from config import DATABASE_URL_SYNC
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Skip reflected tables that are not described by models.
+
+    Partitions of "notes" and "polling" tables are created by the app
+    (app.partitions), autogenerate must not drop them.
+    """
+    if type_ == "table" and reflected and compare_to is None:
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -53,7 +65,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
-        compare_type=True
+        compare_type=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -78,10 +91,12 @@ def run_migrations_online() -> None:
     with connectable.connect() as connection:
         context.configure(
             connection=connection, target_metadata=target_metadata,
-            compare_type=True
+            compare_type=True, include_object=include_object
         )
 
         with context.begin_transaction():
+            # trigram indexes (fuzzy search) need the pg_trgm extension
+            connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
             context.run_migrations()
 
 
@@ -1,18 +1,25 @@
+import asyncio
 import os
+import shlex
+import socket
 
 import psycopg2
 from loguru import logger
 
 import config
-from .database import sync_db
+from .database import sync_db_connect, redis_client
 from .static.sql_queries import GET_ALL_TABLES
-from .models.polling import PollingString
 from .crud.crud_polling import create_polling_strings
+from .events import event_bus, RedisStreamTransport
+from .cache import cache, register_cache_invalidation
+from .jobs import job_queue
+from .partitions import maintain_partitions
+from .tasks import register_event_handlers, register_job_handlers
+from .uow import unit_of_work
 
 import redis
 from redis import asyncio as aioredis
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
+from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.orm import sessionmaker
 
 
@@ -20,10 +27,12 @@ def database_init() -> None:
 	"""
 	Создание таблиц в БД по умолчанию.
 	"""
-	with sync_db.cursor() as cursor:
-		cursor.execute(GET_ALL_TABLES)
-		all_tables = cursor.fetchall()
-	if not sync_db.closed:
+	sync_db = sync_db_connect()
+	try:
+		with sync_db.cursor() as cursor:
+			cursor.execute(GET_ALL_TABLES)
+			all_tables = cursor.fetchall()
+	finally:
 		sync_db.close()
 	if not any(all_tables) or config.DB_AUTO_UPDATING is True:
 		for cmd in config.ALEMBIC_MIGRATION_CMDS:
@@ -40,6 +49,8 @@ def execute_from_command_line(*args):
 		match arg:
 			case config.STARTING_APP_FROM_CMD_DEBUG_ARG:
 				params.setdefault("debug", True)
+			case config.STARTING_WORKER_FROM_CMD_ARG:
+				params.setdefault("worker", True)
 	return params
 
 
@@ -49,22 +60,101 @@ def start_app(**kwargs) -> None:
 
 	Если debug == True, то запускается uvicorn-локальный сервер.
 
-	Если запуск в "продакшн" (debug = False), то запускается gunicorn-сервер.
+	Если запуск в "продакшн" (debug = False), то запускается gunicorn-сервер (настройки - в gunicorn_conf.py).
+
+	Процесс заменяется процессом сервера (exec), без промежуточного shell: сигналы остановки
+	 (например, от docker) получает сам сервер.
 	"""
 	debug = kwargs.get("debug")
-	if debug:
-		os.system(config.STARTING_APP_CMD_DEBUG_MODE)
-	else:
-		os.system(config.STARTING_APP_CMD)
+	cmd = shlex.split(config.STARTING_APP_CMD_DEBUG_MODE if debug else config.STARTING_APP_CMD)
+	os.execvp(cmd[0], cmd)
 
 
-async def fastapi_cache_init() -> None:
+async def cache_init(sa_session_maker: sessionmaker) -> None:
 	"""
+	Подключение кэша эндпоинтов (app.cache) к Redis и подписка его инвалидации на события шины.
 	Используется при старте сервера, а также при начале тестирования.
 	Redis должен быть активен!
+
+	Sa_session_maker нужен для фонового обновления кэша (сессия запроса к тому моменту закрыта).
+	"""
+	cache.redis = redis_client
+	cache.session_maker = sa_session_maker
+	register_cache_invalidation(event_bus)
+
+
+def start_worker() -> None:
 	"""
-	redis = aioredis.from_url(config.REDIS_URL)
-	FastAPICache.init(RedisBackend(redis), prefix=config.REDIS_CACHE_PREFIX)
+	Запуск воркера очереди фоновых задач (отдельный процесс, см. app.jobs).
+	"""
+	from .database import async_session_maker
+
+	async def worker() -> None:
+		logger.add(**config.LOGGING_PARAMS)
+		await check_connections()
+		await run_jobs_worker(async_session_maker)
+
+	asyncio.run(worker())
+
+
+async def run_jobs_worker(sa_session_maker: sessionmaker) -> None:
+	"""
+	Цикл воркера очереди задач. Используется отдельным процессом воркера, а также
+	 внутри сервера (config.JOBS_WORKER_IN_APP) и при тестировании.
+	"""
+	jobs_init(sa_session_maker)
+	schedulers = [
+		asyncio.create_task(job_queue.schedule(job, {}, interval=interval)) for job, interval in (
+			("partitions.maintain", config.PARTITIONS_MAINTENANCE_INTERVAL),
+			("analytics.refresh", config.ANALYTICS_REFRESH_INTERVAL)
+		)
+	]
+	try:
+		await job_queue.run_worker(consumer=f"{socket.gethostname()}-{os.getpid()}")
+	finally:
+		for scheduler in schedulers:
+			scheduler.cancel()
+
+
+def jobs_init(sa_session_maker: sessionmaker) -> None:
+	"""
+	Подключение очереди задач к Redis и регистрация обработчиков задач.
+	"""
+	job_queue.redis = redis_client
+	register_job_handlers(sa_session_maker)
+
+
+async def event_bus_init(eager: bool = False) -> None:
+	"""
+	Подписка фоновых задач на события и запуск шины событий.
+	Используется при старте сервера, а также при начале тестирования.
+
+	Eager-режим (для тестов): шина не запускается, а задачи не ставятся в очередь - обработчики событий
+	 и задачи выполняются сразу при публикации, последовательно (тест работает в одном соединении с БД).
+	"""
+	job_queue.redis = redis_client  # подписчики ставят задачи в очередь
+	register_event_handlers()
+	if eager:
+		job_queue.eager = True
+		return
+	transport = None
+	if config.EVENT_BUS_REDIS_TRANSPORT is True:
+		transport = RedisStreamTransport(
+			redis=redis_client,
+			stream=config.EVENT_BUS_REDIS_STREAM,
+			maxlen=config.EVENT_BUS_REDIS_STREAM_MAXLEN
+		)
+	await event_bus.start(transport=transport)
+
+
+async def partitions_init(sa_engine: AsyncEngine) -> None:
+	"""
+	Перевод таблиц в партиционированные (если нужно) и создание партиций на ближайшие месяцы (app.partitions).
+	Используется при старте сервера, а также при начале тестирования.
+	Далее партиции обслуживаются периодической задачей "partitions.maintain" воркера очереди.
+	"""
+	async with sa_engine.begin() as conn:
+		await maintain_partitions(conn)
 
 
 async def check_connections() -> None:
@@ -94,8 +184,12 @@ async def check_db_connection() -> None:
 	Проверка соединения с БД.
 	"""
 	try:
-		with sync_db.cursor() as cursor:
-			cursor.execute("SELECT 1")
+		sync_db = sync_db_connect()
+		try:
+			with sync_db.cursor() as cursor:
+				cursor.execute("SELECT 1")
+		finally:
+			sync_db.close()
 	except psycopg2.OperationalError:
 		error_text = "Can't establish the connection to PostgreSQL Database.\nPlease make sure that PSQL DB " \
 					 "is running on url that defined in 'config.py' file."
@@ -109,7 +203,7 @@ async def init_db_strings(sa_session_maker: sessionmaker) -> None:
 	 если их еще нет.
 
 	Sa_session_maker передаю извне, ибо в тестах и в приложении они отличаются.
+	Все данные создаются в одной транзакции.
 	"""
-	async with sa_session_maker() as session:  # делать еще одну БД-сессию, конечно, не надо,
-		# но другого варианта получить ее здесь я не нашел(
-		await create_polling_strings(db=session)
+	async with unit_of_work(sa_session_maker) as work:
+		await create_polling_strings(db=work.session)
@@ -0,0 +1,426 @@
+import asyncio
+import functools
+import hashlib
+import json
+import math
+import random
+import time
+from collections import OrderedDict
+from datetime import date
+from enum import Enum
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+from redis import asyncio as aioredis
+from sqlalchemy.orm import sessionmaker
+
+import config
+
+# primitive endpoint params that are a part of the cache key (sessions, users, etc. are not)
+KEY_PARAMS_TYPES = (str, int, float, bool, Enum, date, type(None))
+
+
+class LocalCache:
+	"""
+	Кэш первого уровня (L1): LRU-кэш в памяти воркера с коротким TTL.
+	Записи сгруппированы по группам (пространство имен + пользователь), чтобы инвалидировать группу целиком.
+	"""
+	def __init__(self, maxsize: int, ttl: float):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self._groups: OrderedDict[str, dict[str, tuple[float, Any]]] = OrderedDict()
+
+	def get(self, group: str, key: str) -> tuple[bool, Any]:
+		entries = self._groups.get(group)
+		if entries is None or key not in entries:
+			return False, None
+		expires, value = entries[key]
+		if expires < time.monotonic():
+			del entries[key]
+			return False, None
+		self._groups.move_to_end(group)
+		return True, value
+
+	def set(self, group: str, key: str, value: Any, ttl: float = None) -> None:
+		ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+		self._groups.setdefault(group, {})[key] = (time.monotonic() + ttl, value)
+		self._groups.move_to_end(group)
+		while len(self._groups) > self.maxsize:
+			self._groups.popitem(last=False)
+
+	def invalidate(self, group: str) -> None:
+		self._groups.pop(group, None)
+
+	def clear(self) -> None:
+		self._groups.clear()
+
+
+class TwoTierCache:
+	"""
+	Двухуровневый кэш эндпоинтов: L1 - в памяти воркера (LocalCache), L2 - Redis (общий для всех воркеров).
+
+	- При промахе L1 значение берется из L2 (и кладется в L1), при промахе обоих - вычисляется;
+	- Одновременные запросы одного и того же ключа (в рамках воркера) ждут одного вычисления (single-flight):
+	 холодный ключ под нагрузкой дает один запрос в БД, а не по запросу на каждого клиента;
+	- Записи группируются по пользователю: в Redis группа - это хэш (поле - параметры запроса), поэтому
+	 инвалидация данных пользователя - один DEL. Инвалидация происходит по событиям шины (app.events);
+	- Считаются попадания/промахи по уровням (см. metrics).
+
+	Stale-while-revalidate: истекшая запись еще stale_ttl секунд отдается как есть, а пересчитывается
+	 одним фоновым обновлением (refresh). Кроме того, запись может обновиться заранее, до истечения
+	 (вероятностное раннее обновление XFetch: чем дороже вычисление и ближе истечение, тем вероятнее).
+	Поэтому на границе истечения запросы не ждут БД и не создают лавину одинаковых запросов.
+	"""
+	def __init__(
+		self,
+		prefix: str = config.REDIS_CACHE_PREFIX,
+		local_maxsize: int = config.CACHE_LOCAL_MAXSIZE,
+		local_ttl: float = config.CACHE_LOCAL_TTL,
+		stale_ttl: int = config.CACHE_STALE_TTL,
+		xfetch_beta: float = config.CACHE_XFETCH_BETA
+	):
+		self.prefix = prefix
+		self.local = LocalCache(maxsize=local_maxsize, ttl=local_ttl)
+		self.stale_ttl = stale_ttl
+		self.xfetch_beta = xfetch_beta
+		self.redis: Optional[aioredis.Redis] = None
+		self.session_maker: Optional[sessionmaker] = None  # БД-сессии фоновых обновлений
+		self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+		self._refreshing: dict[tuple[str, str], asyncio.Task] = {}
+		self._invalidated_at: dict[str, float] = {}
+		self._stats = dict.fromkeys((
+			"l1_hits", "l1_misses", "l2_hits", "l2_misses", "stale_hits", "coalesced",
+			"refreshes", "early_refreshes", "errors"
+		), 0)
+
+	def group_key(self, namespace: str, user_id: Any) -> str:
+		return f"{self.prefix}:{namespace}:{user_id}"
+
+	async def _get_remote(self, group: str, key: str) -> Optional[dict[str, Any]]:
+		"""
+		Запись L2: {"value": ..., "expires": ..., "delta": время вычисления} (None - если нет или она слишком стара).
+		"""
+		if self.redis is None:
+			return
+		try:
+			entry = await self.redis.hget(group, key)
+		except Exception:
+			self._stats["errors"] += 1
+			logger.exception(f"Can't get cache entry '{group}' from Redis")
+			return
+		if entry is None:
+			return
+		entry = json.loads(entry)
+		if entry["expires"] + self.stale_ttl < time.time():
+			return
+		return entry
+
+	async def _set_remote(self, group: str, key: str, value: Any, expire: int, delta: float) -> None:
+		if self.redis is None:
+			return
+		try:
+			async with self.redis.pipeline(transaction=False) as pipe:
+				pipe.hset(group, key, json.dumps({"value": value, "expires": time.time() + expire, "delta": delta}))
+				# у полей - свое время жизни (expires), группа живет не меньше их (с учетом stale_ttl)
+				pipe.expire(group, expire + self.stale_ttl)
+				await pipe.execute()
+		except Exception:
+			self._stats["errors"] += 1
+			logger.exception(f"Can't set cache entry '{group}' to Redis")
+
+	async def get_many(self, entries: list[tuple[str, str]]) -> dict[tuple[str, str], Any]:
+		"""
+		Актуальные (не истекшие) значения записей (группа, ключ) без вычисления - для пакетного вычисления
+		 недостающих (см. set_many). L2 читается одним pipeline-запросом.
+		"""
+		values, remote_entries = {}, []
+		for group, key in entries:
+			hit, value = self.local.get(group, key)
+			self._stats["l1_hits" if hit else "l1_misses"] += 1
+			if hit:
+				values[(group, key)] = value
+			else:
+				remote_entries.append((group, key))
+		if not remote_entries or self.redis is None:
+			return values
+		try:
+			async with self.redis.pipeline(transaction=False) as pipe:
+				for group, key in remote_entries:
+					pipe.hget(group, key)
+				raw_entries = await pipe.execute()
+		except Exception:
+			self._stats["errors"] += 1
+			logger.exception("Can't get cache entries from Redis")
+			return values
+		now = time.time()
+		for (group, key), raw_entry in zip(remote_entries, raw_entries):
+			entry = json.loads(raw_entry) if raw_entry is not None else None
+			if entry is None or entry["expires"] < now:
+				self._stats["l2_misses"] += 1
+				continue
+			self._stats["l2_hits"] += 1
+			values[(group, key)] = entry["value"]
+			self.local.set(group, key, entry["value"], ttl=entry["expires"] - now)
+		return values
+
+	async def set_many(self, entries: dict[tuple[str, str], tuple[Any, int]], started_at: float) -> None:
+		"""
+		Запись значений {(группа, ключ): (значение, expire)}, вычисленных начиная с started_at, в оба уровня.
+		Записи групп, инвалидированных во время вычисления, не записываются.
+		"""
+		entries = {
+			(group, key): (jsonable_encoder(value), expire) for (group, key), (value, expire) in entries.items()
+			if self._invalidated_at.get(group, 0) < started_at
+		}
+		for (group, key), (value, _) in entries.items():
+			self.local.set(group, key, value)
+		if not entries or self.redis is None:
+			return
+		now = time.time()
+		try:
+			async with self.redis.pipeline(transaction=False) as pipe:
+				for (group, key), (value, expire) in entries.items():
+					pipe.hset(group, key, json.dumps({"value": value, "expires": now + expire, "delta": now - started_at}))
+					pipe.expire(group, expire + self.stale_ttl)
+				await pipe.execute()
+		except Exception:
+			self._stats["errors"] += 1
+			logger.exception("Can't set cache entries to Redis")
+
+	async def _compute(self, group: str, key: str, expire: int, func: Callable[[], Awaitable[Any]]) -> Any:
+		"""
+		Вычисление значения и запись в оба уровня.
+		Если группа была инвалидирована во время вычисления, значение может быть устаревшим - не записывается.
+		"""
+		started_at = time.time()
+		value = jsonable_encoder(await func())
+		if self._invalidated_at.get(group, 0) < started_at:
+			await self._set_remote(group, key, value, expire, delta=time.time() - started_at)
+			self.local.set(group, key, value)
+		return value
+
+	def _should_refresh(self, entry: dict[str, Any], now: float) -> bool:
+		"""
+		XFetch: запись обновляется заранее с вероятностью, растущей к моменту истечения
+		 (now - delta * beta * ln(rand) >= expires). Истекшая запись обновляется всегда.
+		"""
+		return now - entry.get("delta", 0) * self.xfetch_beta * math.log(1 - random.random()) >= entry["expires"]
+
+	async def _refresh(self, group: str, key: str, expire: int, refresh: Callable[[], Awaitable[Any]]) -> None:
+		"""
+		Фоновое обновление записи. Между воркерами обновление не дублируется благодаря короткой Redis-блокировке.
+		"""
+		try:
+			lock = f"{group}:refresh:{hashlib.md5(key.encode()).hexdigest()}"
+			if self.redis is not None and not await self.redis.set(lock, 1, nx=True, ex=config.CACHE_REFRESH_LOCK_TTL):
+				return
+			self._stats["refreshes"] += 1
+			await self._compute(group, key, expire, refresh)
+		except Exception:
+			self._stats["errors"] += 1
+			logger.exception(f"Can't refresh cache entry of '{group}'")
+		finally:
+			self._refreshing.pop((group, key), None)
+
+	def _refresh_in_background(
+		self, group: str, key: str, expire: int, refresh: Callable[[], Awaitable[Any]]
+	) -> None:
+		if (group, key) not in self._refreshing:
+			self._refreshing[(group, key)] = asyncio.create_task(self._refresh(group, key, expire, refresh))
+
+	async def get_or_set(
+		self,
+		group: str,
+		key: str,
+		expire: int,
+		func: Callable[[], Awaitable[Any]],
+		refresh: Callable[[], Awaitable[Any]] = None
+	) -> Any:
+		"""
+		Значение из кэша или результат func (сериализованный в JSON-совместимый вид).
+		Refresh - вычисление значения вне запроса (в собственной БД-сессии) для фонового обновления.
+		 Если не передано, истекшие записи не отдаются, а вычисляются заново в запросе.
+		"""
+		hit, value = self.local.get(group, key)
+		if hit:
+			self._stats["l1_hits"] += 1
+			return value
+		self._stats["l1_misses"] += 1
+
+		inflight = self._inflight.get((group, key))
+		if inflight is not None:
+			self._stats["coalesced"] += 1
+			return await asyncio.shield(inflight)
+
+		future = asyncio.get_running_loop().create_future()
+		self._inflight[(group, key)] = future
+		try:
+			now = time.time()
+			entry = await self._get_remote(group, key)
+			if entry is not None and refresh is None and entry["expires"] < now:
+				entry = None
+			if entry is not None:
+				self._stats["l2_hits"] += 1
+				value = entry["value"]
+				if entry["expires"] < now:
+					self._stats["stale_hits"] += 1
+				if refresh is not None and self._should_refresh(entry, now):
+					if entry["expires"] >= now:
+						self._stats["early_refreshes"] += 1
+					self._refresh_in_background(group, key, expire, refresh)
+				self.local.set(group, key, value, ttl=max(entry["expires"] - now, 0))
+			else:
+				self._stats["l2_misses"] += 1
+				value = await self._compute(group, key, expire, func)
+			future.set_result(value)
+		except BaseException as error:
+			future.set_exception(error)
+			future.exception()  # ошибка получена ожидающими запросами, а не потеряна
+			raise
+		finally:
+			del self._inflight[(group, key)]
+		return value
+
+	async def invalidate(self, namespace: str, user_id: Any) -> None:
+		group = self.group_key(namespace, user_id)
+		self.local.invalidate(group)
+		now = time.time()
+		if len(self._invalidated_at) > self.local.maxsize:  # нужны только для идущих сейчас вычислений
+			self._invalidated_at = {
+				group: at for group, at in self._invalidated_at.items() if at > now - config.CACHE_REFRESH_LOCK_TTL
+			}
+		self._invalidated_at[group] = now
+		if self.redis is not None:
+			try:
+				await self.redis.delete(group)
+			except Exception:
+				self._stats["errors"] += 1
+				logger.exception(f"Can't invalidate cache group '{group}'")
+
+	def version_key(self, namespace: str, user_id: Any) -> str:
+		return f"{self.prefix}:version:{namespace}:{user_id}"
+
+	async def get_version(self, namespace: str, user_id: Any) -> Optional[str]:
+		"""
+		Версия данных пользователя (общая для всех воркеров, хранится в Redis), увеличивается при каждом изменении.
+		Начальная версия - текущее время: если счетчик потеряется (очистка Redis), новые версии не совпадут
+		 со старыми, выданными клиентам.
+		Если Redis недоступен - None (версия неизвестна).
+		"""
+		key = self.version_key(namespace, user_id)
+		try:
+			version = await self.redis.get(key)
+			if version is None:
+				await self.redis.set(key, time.time_ns(), nx=True)
+				version = await self.redis.get(key)
+		except Exception:
+			self._stats["errors"] += 1
+			logger.exception(f"Can't get data version '{key}'")
+			return None
+		return version
+
+	async def bump_version(self, namespace: str, user_id: Any) -> None:
+		key = self.version_key(namespace, user_id)
+		try:
+			if not await self.redis.set(key, time.time_ns(), nx=True):
+				await self.redis.incr(key)
+		except Exception:
+			self._stats["errors"] += 1
+			logger.exception(f"Can't bump data version '{key}'")
+
+	def metrics(self) -> dict[str, Any]:
+		"""
+		Попадания/промахи по уровням кэша (в рамках текущего воркера).
+		"""
+		stats = self._stats
+		l1_total, l2_total = stats["l1_hits"] + stats["l1_misses"], stats["l2_hits"] + stats["l2_misses"]
+		return {
+			**stats,
+			"l1_hit_rate": stats["l1_hits"] / l1_total if l1_total else None,
+			"l2_hit_rate": stats["l2_hits"] / l2_total if l2_total else None,
+			"l1_groups": len(self.local._groups),
+			"refreshing": len(self._refreshing)
+		}
+
+	def reset_metrics(self) -> None:
+		self._stats = dict.fromkeys(self._stats, 0)
+
+
+cache = TwoTierCache()
+
+# per-day polling stats cache namespace (cache group is the date of polls, see crud_polling.get_polling_stats)
+POLLING_STATS_NAMESPACE = "polling_stats"
+
+# events of the event bus (app.events) that invalidate cached data of the user (payload "user_id")
+CACHE_INVALIDATION_EVENTS = {
+	"note.*": ("notes",),
+	"rating.*": ("day_ratings",),
+	"user.updated": ("notes", "day_ratings"),
+	"user.deleted": ("notes", "day_ratings")
+}
+
+
+def make_cache_key(kwargs: dict[str, Any]) -> str:
+	"""
+	Ключ записи - параметры запроса примитивных типов (без хэширования всего запроса).
+	"""
+	params = {
+		name: value.value if isinstance(value, Enum) else value
+		for name, value in kwargs.items() if isinstance(value, KEY_PARAMS_TYPES)
+	}
+	params.update({
+		name: sorted(value.items()) for name, value in kwargs.items()
+		if isinstance(value, dict) and all(isinstance(v, KEY_PARAMS_TYPES) for v in value.values())
+	})  # параметры, собранные зависимостями (например, фильтры)
+	return json.dumps(params, sort_keys=True, default=str)
+
+
+def cached(namespace: str, expire: int):
+	"""
+	Декоратор кэширования эндпоинта с данными текущего пользователя (параметр current_user).
+	Данные кэшируются на expire секунд в Redis (и на config.CACHE_LOCAL_TTL - в памяти воркера)
+	 и сбрасываются при изменении данных пользователя (CACHE_INVALIDATION_EVENTS).
+
+	Фоновое обновление вызывает эндпоинт с новой БД-сессией (параметр db): сессия запроса
+	 к этому моменту уже закрыта.
+	Если эндпоинт получает ETag (параметр etag), а он неизвестен (None - Redis недоступен), кэш не используется.
+	"""
+	def decorator(func):
+		@functools.wraps(func)  # fastapi берет параметры эндпоинта из сигнатуры исходной функции
+		async def wrapper(*args, **kwargs):
+			if "etag" in kwargs and kwargs["etag"] is None:  # data version is unknown - cached data may be stale
+				return await func(*args, **kwargs)
+			group = cache.group_key(namespace, kwargs["current_user"].id)
+
+			async def refresh():
+				async with cache.session_maker() as session:
+					return await func(*args, **{**kwargs, "db": session})
+
+			return await cache.get_or_set(
+				group, make_cache_key(kwargs), expire, lambda: func(*args, **kwargs),
+				refresh=refresh if cache.session_maker is not None and "db" in kwargs else None
+			)
+		return wrapper
+	return decorator
+
+
+def register_cache_invalidation(bus) -> None:
+	"""
+	Подписка инвалидации кэша и увеличения версии данных (ETag, см. dependencies.get_etag)
+	 на события изменения данных. Статистика опросов сбрасывается за день пройденного опроса.
+	Обработчики вызываются сразу при публикации (inline), чтобы после ответа на изменяющий запрос
+	 пользователь не получил устаревшие данные.
+	"""
+	for event, namespaces in CACHE_INVALIDATION_EVENTS.items():
+		async def invalidate_user_cache(event: str, payload: dict[str, Any], namespaces=namespaces) -> None:
+			for namespace in namespaces:
+				await cache.bump_version(namespace, payload["user_id"])
+				await cache.invalidate(namespace, payload["user_id"])
+
+		bus.subscribe(event, invalidate_user_cache, inline=True)
+
+	async def invalidate_polling_stats(event: str, payload: dict[str, Any]) -> None:
+		await cache.invalidate(POLLING_STATS_NAMESPACE, payload["date"])
+
+	bus.subscribe("polling.completed", invalidate_polling_stats, inline=True)
@@ -0,0 +1,207 @@
+import asyncio
+import datetime
+import json
+import time
+from typing import Any, Optional
+
+import httpx
+from jose import jwt, JWTError
+
+from . import schemas
+
+try:
+	import h2  # optional dependency: without it requests go over HTTP/1.1 keep-alive connections
+except ImportError:
+	h2 = None
+
+API_PREFIX = "/api/v1"
+TOKEN_REFRESH_MARGIN = 60  # token is refreshed this time (seconds) before it expires
+
+
+class EztaskClientError(Exception):
+	"""
+	Ошибочный ответ API (status_code и detail из тела ответа).
+	"""
+	def __init__(self, status_code: int, detail: Any):
+		self.status_code = status_code
+		self.detail = detail
+		super().__init__(f"{status_code}: {detail}")
+
+
+class EztaskClient:
+	"""
+	Асинхронный клиент API eztask (httpx).
+
+	- Одно долгоживущее соединение (пул keep-alive соединений) на клиента; HTTP/2, если установлен h2 -
+	 тогда параллельные запросы идут по одному соединению;
+	- Токен получается по email и паролю и обновляется заранее, до истечения, а также при ответе 401;
+	- GET-запросы к спискам данных пользователя - условные (If-None-Match): если данные не менялись,
+	 сервер отвечает 304 без тела, и клиент отдает ранее полученный ответ;
+	- Ответы разбираются в pydantic-схемы приложения (app.schemas).
+
+	Использование:
+		async with EztaskClient("https://eztask.example", email=..., password=...) as client:
+			data = await client.launch()
+	"""
+	def __init__(
+		self,
+		base_url: str,
+		email: str = None,
+		password: str = None,
+		token: str = None,
+		http2: bool = None,
+		timeout: float = 10.0,
+		max_connections: int = 10,
+		transport: httpx.AsyncBaseTransport = None
+	):
+		self.email = email
+		self.password = password
+		self.token = token
+		self.not_modified = 0  # responses served from the ETag cache
+		self._etag_cache: dict[str, tuple[str, Any]] = {}
+		self._login_lock = asyncio.Lock()
+		self._client = httpx.AsyncClient(
+			base_url=base_url.rstrip("/") + API_PREFIX,
+			http2=h2 is not None if http2 is None else http2,
+			timeout=timeout,
+			limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+			transport=transport
+		)
+
+	async def __aenter__(self) -> "EztaskClient":
+		return self
+
+	async def __aexit__(self, *exc_info) -> None:
+		await self.aclose()
+
+	async def aclose(self) -> None:
+		await self._client.aclose()
+
+	async def login(self) -> str:
+		"""
+		Получение нового токена по email и паролю.
+		"""
+		if self.email is None or self.password is None:
+			raise EztaskClientError(httpx.codes.UNAUTHORIZED, "Credentials are required to refresh the token")
+		response = await self._client.post("/token/", data={"email": self.email, "password": self.password})
+		self._raise_for_status(response)
+		self.token = response.json()["access_token"]
+		return self.token
+
+	async def _ensure_token(self, used_token: Optional[str] = None) -> str:
+		"""
+		Действующий токен. Одновременные запросы (например, в launch) ждут одного входа.
+		Used_token - токен, отклоненный сервером: если его уже заменили, повторный вход не нужен.
+		"""
+		async with self._login_lock:
+			if self.token is None or self.token == used_token or self._token_expires_soon():
+				await self.login()
+			return self.token
+
+	def _token_expires_soon(self) -> bool:
+		try:
+			expires = jwt.get_unverified_claims(self.token).get("exp")
+		except JWTError:
+			return False  # not JWT - refreshed on 401 response only
+		return expires is not None and expires - time.time() < TOKEN_REFRESH_MARGIN
+
+	async def request(self, method: str, url: str, conditional: bool = False, **kwargs) -> Any:
+		"""
+		Авторизованный запрос. Возвращает JSON ответа (None - если тела нет).
+		Conditional - условный GET-запрос с кэшированием ответа по ETag.
+		"""
+		cache_key = f"{url}?{httpx.QueryParams(kwargs.get('params'))}"
+		cached = self._etag_cache.get(cache_key) if conditional else None
+		headers = kwargs.pop("headers", {})
+		if cached is not None:
+			headers = {**headers, "If-None-Match": cached[0]}
+
+		token = await self._ensure_token()
+		response = await self._client.request(
+			method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+		)
+		if response.status_code == httpx.codes.UNAUTHORIZED:  # token was expired or revoked - one retry
+			token = await self._ensure_token(used_token=token)
+			response = await self._client.request(
+				method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+			)
+
+		if response.status_code == httpx.codes.NOT_MODIFIED and cached is not None:
+			self.not_modified += 1
+			return cached[1]
+		self._raise_for_status(response)
+		data = response.json() if response.content else None
+		if conditional and "ETag" in response.headers:
+			self._etag_cache[cache_key] = (response.headers["ETag"], data)
+		return data
+
+	@staticmethod
+	def _raise_for_status(response: httpx.Response) -> None:
+		if response.is_success:
+			return
+		try:
+			body = response.json()
+		except ValueError:
+			body = response.text
+		detail = body.get("detail", body) if isinstance(body, dict) else body
+		raise EztaskClientError(response.status_code, detail)
+
+	async def me(self) -> schemas.User:
+		return schemas.User(**await self.request("GET", "/users/me"))
+
+	async def notes_me(self, **params) -> list[schemas.Note]:
+		"""
+		Заметки пользователя; params - параметры фильтрации эндпоинта (period, type, completed, sorting).
+		"""
+		notes = await self.request("GET", "/notes/me", conditional=True, params=params)
+		return [schemas.Note(**note) for note in notes]
+
+	async def create_note(self, note: schemas.NoteCreate) -> schemas.Note:
+		# dates are serialized by pydantic: httpx serializes "json" with plain json.dumps
+		created_note = await self.request("POST", "/notes/", json={"note": json.loads(note.json(exclude_none=True))})
+		return schemas.Note(**created_note)
+
+	async def day_ratings_me(self) -> list[schemas.DayRating]:
+		day_ratings = await self.request("GET", "/day_ratings/me", conditional=True)
+		return [schemas.DayRating(**day_rating) for day_rating in day_ratings]
+
+	async def polling(self, user_id: int) -> Optional[dict[str, Any]]:
+		"""
+		Опрос пользователя на сегодня (None - если его нет).
+		"""
+		try:
+			return await self.request("GET", f"/polling/user/{user_id}")
+		except EztaskClientError as error:
+			if error.status_code == httpx.codes.NOT_FOUND:
+				return None
+			raise
+
+	async def pollings(
+		self,
+		user_id: int,
+		date_from: datetime.date,
+		date_to: datetime.date = None
+	) -> list[dict[str, Any]]:
+		params = {"date_from": date_from.isoformat()}
+		if date_to is not None:
+			params["date_to"] = date_to.isoformat()
+		return await self.request("GET", f"/polling/user/{user_id}/range", params=params)
+
+	async def complete_polling(self, polling_id: int) -> None:
+		await self.request("PUT", f"/polling/{polling_id}")
+
+	async def launch(self, user_id: int = None) -> dict[str, Any]:
+		"""
+		Данные для запуска приложения одним вызовом: пользователь, заметки, оценки дня и опрос на сегодня.
+		Запросы выполняются параллельно (при HTTP/2 - по одному соединению).
+		"""
+		if user_id is None:
+			user = await self.me()
+			notes, day_ratings, polling = await asyncio.gather(
+				self.notes_me(), self.day_ratings_me(), self.polling(user.id)
+			)
+		else:
+			user, notes, day_ratings, polling = await asyncio.gather(
+				self.me(), self.notes_me(), self.day_ratings_me(), self.polling(user_id)
+			)
+		return {"user": user, "notes": notes, "day_ratings": day_ratings, "polling": polling}
@@ -0,0 +1,114 @@
+import datetime
+from typing import Iterable, Optional
+
+from redis import asyncio as aioredis
+from sqlalchemy import select, text, func, distinct, or_, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from ..models.analytics import UserActivityDaily
+from ..static.enums import AnalyticsPeriodEnum
+
+# recomputing of daily activity rows from source tables (one query for a batch of (user_id, date) keys)
+REFRESH_ACTIVITY_QUERY = text(
+	"INSERT INTO user_activity_daily "
+	"(user_id, date, notes, tasks, tasks_completed, rated, polls, polls_completed, updated_at) "
+	"SELECT k.user_id, k.date, n.notes, n.tasks, n.tasks_completed, r.rated, p.polls, p.polls_completed, now() "
+	"FROM unnest(CAST(:user_ids AS integer[]), CAST(:dates AS date[])) AS k(user_id, date) "
+	"JOIN users u ON u.id = k.user_id "
+	"CROSS JOIN LATERAL (SELECT count(*) FILTER (WHERE note_type = 'note') AS notes, "
+	"count(*) FILTER (WHERE note_type = 'task') AS tasks, "
+	"count(*) FILTER (WHERE note_type = 'task' AND completed) AS tasks_completed "
+	"FROM notes WHERE user_id = k.user_id AND date = k.date) n "
+	"CROSS JOIN LATERAL (SELECT EXISTS (SELECT 1 FROM day_ratings "
+	"WHERE user_id = k.user_id AND date = k.date) AS rated) r "
+	"CROSS JOIN LATERAL (SELECT count(*) AS polls, count(*) FILTER (WHERE completed) AS polls_completed "
+	"FROM polling WHERE user_id = k.user_id AND created_at = k.date) p "
+	"ON CONFLICT (user_id, date) DO UPDATE SET notes = EXCLUDED.notes, tasks = EXCLUDED.tasks, "
+	"tasks_completed = EXCLUDED.tasks_completed, rated = EXCLUDED.rated, polls = EXCLUDED.polls, "
+	"polls_completed = EXCLUDED.polls_completed, updated_at = EXCLUDED.updated_at"
+)
+
+
+async def mark_activity_dirty(redis: aioredis.Redis, keys: Iterable[tuple[int, datetime.date]]) -> None:
+	"""
+	Отметка дней пользователей, сводку которых надо пересчитать (множество в Redis, см. refresh-задачу в app.tasks).
+	"""
+	members = {f"{user_id}:{date.isoformat()}" for user_id, date in keys}
+	if members:
+		await redis.sadd(config.ANALYTICS_DIRTY_SET, *members)
+
+
+def parse_activity_keys(members: Iterable[str]) -> list[tuple[int, datetime.date]]:
+	keys = []
+	for member in members:
+		user_id, date = member.split(":")
+		keys.append((int(user_id), datetime.date.fromisoformat(date)))
+	return keys
+
+
+async def refresh_user_activity(keys: list[tuple[int, datetime.date]], db: AsyncSession) -> None:
+	"""
+	Пересчет сводок активности по ключам (ИД пользователя, дата) из исходных таблиц.
+	"""
+	for start in range(0, len(keys), config.ANALYTICS_REFRESH_BATCH):
+		batch = keys[start:start + config.ANALYTICS_REFRESH_BATCH]
+		await db.execute(REFRESH_ACTIVITY_QUERY, {
+			"user_ids": [user_id for user_id, _ in batch], "dates": [date for _, date in batch]
+		})
+
+
+async def rebuild_user_activity(date_from: datetime.date, db: AsyncSession) -> int:
+	"""
+	Полный пересчет сводок начиная с date_from (например, для данных, созданных до появления аналитики).
+	Возвращает количество пересчитанных дней пользователей.
+	"""
+	result = await db.execute(text(
+		"SELECT user_id, date FROM notes WHERE date >= :date_from AND user_id IS NOT NULL "
+		"UNION SELECT user_id, date FROM day_ratings WHERE date >= :date_from "
+		"UNION SELECT user_id, created_at FROM polling WHERE created_at >= :date_from AND user_id IS NOT NULL"
+	), {"date_from": date_from})
+	keys = [tuple(row) for row in result.all()]
+	await refresh_user_activity(keys, db)
+	return len(keys)
+
+
+async def get_activity_stats(
+	period: AnalyticsPeriodEnum,
+	date_from: datetime.date,
+	date_to: datetime.date,
+	db: AsyncSession,
+	user_id: Optional[int] = None
+) -> list[dict]:
+	"""
+	Агрегаты активности (всех пользователей или одного) по дням, неделям или месяцам.
+	Активный пользователь - создавший заметку, оценивший день или прошедший опрос.
+	"""
+	activity = UserActivityDaily
+	period_start = func.cast(func.date_trunc(period.value, activity.date), Date).label("period_start")
+	query = select(
+		period_start,
+		func.count(distinct(activity.user_id)).filter(
+			or_(activity.notes + activity.tasks > 0, activity.rated, activity.polls_completed > 0)
+		).label("active_users"),
+		func.coalesce(func.sum(activity.notes), 0).label("notes"),
+		func.coalesce(func.sum(activity.tasks), 0).label("tasks"),
+		func.coalesce(func.sum(activity.tasks_completed), 0).label("tasks_completed"),
+		func.count().filter(activity.rated).label("day_ratings"),
+		func.coalesce(func.sum(activity.polls), 0).label("polls"),
+		func.coalesce(func.sum(activity.polls_completed), 0).label("polls_completed")
+	).where(
+		(activity.date >= date_from) &
+		(activity.date <= date_to)
+	).group_by(period_start).order_by(period_start)
+	if user_id is not None:
+		query = query.where(activity.user_id == user_id)
+	result = await db.execute(query)
+
+	return [
+		{
+			**row,
+			"tasks_completion_rate": round(row["tasks_completed"] / row["tasks"], 4) if row["tasks"] else None,
+			"polls_response_rate": round(row["polls_completed"] / row["polls"], 4) if row["polls"] else None
+		} for row in result.mappings().all()
+	]
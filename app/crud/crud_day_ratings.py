@@ -1,10 +1,13 @@
 import datetime
+from typing import AsyncIterator
 
 from loguru import logger
-from sqlalchemy import insert, select, update, delete
+from sqlalchemy import insert, select, update, delete, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
+from ..imports import create_staging_table, copy_to_staging
+from ..uow import UnitOfWork
 from ..models.day_ratings import DayRating
 from ..utils import sa_objects_dicts_list
 
@@ -19,14 +22,62 @@ async def create_day_rating(day_rating: schemas.DayRatingCreate, db: AsyncSessio
 		**day_rating_dict
 	)
 	await db.execute(query)
-	await db.commit()
 
 	logger.info(f"Day rating for date {datetime.date.today()} was "
 				f"successfully created by user with ID: {day_rating.user_id}")
+	UnitOfWork.of(db).publish("rating.created", {
+		"user_id": day_rating.user_id, "date": day_rating_dict["date"].isoformat()
+	})
 
 	return day_rating_dict
 
 
+async def import_day_ratings(
+	day_ratings_chunks: AsyncIterator[list[schemas.DayRatingImport]],
+	user_id: int,
+	db: AsyncSession
+):
+	"""
+	Массовый импорт оценок дня пользователя (из файла, см. app.imports).
+
+	Пачки оценок загружаются COPY'ем во временную таблицу, затем одним запросом переносятся в "day_ratings".
+	Существующие оценки за те же даты перезаписываются; если дата в файле повторяется - берется последняя оценка.
+	"""
+	staging_table, columns = "day_ratings_import", {
+		"line": "integer", "date": "date", "notes": "boolean", "mood": "boolean",
+		"next_day_expectations": "boolean", "health": "boolean"
+	}
+	await create_staging_table(db, staging_table, columns)
+	received = 0
+	async for chunk in day_ratings_chunks:
+		await copy_to_staging(db, staging_table, tuple(columns), [
+			(
+				received + number, day_rating.date, day_rating.notes, day_rating.mood,
+				day_rating.next_day_expectations, day_rating.health
+			) for number, day_rating in enumerate(chunk)
+		])
+		received += len(chunk)
+
+	result = await db.execute(text(
+		f"INSERT INTO day_ratings (user_id, date, notes, mood, next_day_expectations, health) "
+		f"SELECT DISTINCT ON (date) :user_id, date, notes, mood, next_day_expectations, health "
+		f"FROM {staging_table} ORDER BY date, line DESC "
+		f"ON CONFLICT (user_id, date) DO UPDATE SET notes = EXCLUDED.notes, mood = EXCLUDED.mood, "
+		f"next_day_expectations = EXCLUDED.next_day_expectations, health = EXCLUDED.health "
+		f"RETURNING date"
+	), {"user_id": user_id})
+	imported_dates = result.scalars().all()
+	imported = len(imported_dates)
+
+	logger.info(f"{imported} day ratings of {received} were successfully imported for user with ID: {user_id}")
+	if imported:
+		UnitOfWork.of(db).publish("rating.imported", {
+			"user_id": user_id, "count": imported, "dates": [day.isoformat() for day in imported_dates]
+		})
+
+	return {"received": received, "imported": imported}
+
+
 async def get_day_ratings(db: AsyncSession):
 	"""
 	Получение всех оценок дня.
@@ -78,10 +129,16 @@ async def update_day_rating(current_day_rating: schemas.DayRating,
 	)
 
 	await db.execute(query)
-	await db.commit()
+	UnitOfWork.of(db).put(
+		"day_rating", (current_day_rating.user_id, current_day_rating.date),
+		schemas.DayRating(**{**current_day_rating_dict, "date": current_day_rating.date})
+	)
 
 	logger.info(f"Day rating for date {current_day_rating.date} was successfully "
 				f"updated by creator with ID: {current_day_rating.user_id}")
+	UnitOfWork.of(db).publish("rating.updated", {
+		"user_id": current_day_rating.user_id, "date": current_day_rating.date.isoformat()
+	})
 
 	return {**current_day_rating_dict, "date": current_day_rating.date}
 
@@ -95,9 +152,12 @@ async def delete_day_rating(day_rating: schemas.DayRating, db: AsyncSession):
 		(DayRating.date == day_rating.date)
 	)
 	await db.execute(query)
-	await db.commit()
+	UnitOfWork.of(db).forget("day_rating", (day_rating.user_id, day_rating.date))
 
 	logger.info(f"Day rating for date {datetime.date.today()} was "
 				f"successfully deleted by user with ID: {day_rating.user_id}")
+	UnitOfWork.of(db).publish("rating.deleted", {
+		"user_id": day_rating.user_id, "date": day_rating.date.isoformat()
+	})
 
 	return day_rating
@@ -1,13 +1,17 @@
 from datetime import date
+from typing import AsyncIterator
 
 from loguru import logger
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import select, insert, update, delete, func, literal, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
-from ..models.notes import Note
+from ..imports import create_staging_table, copy_to_staging
+from ..uow import UnitOfWork
+from ..models.notes import Note, NOTES_SEARCH_CONFIG
 from ..static.enums import NoteTypeEnumDB
-from ..utils import sa_objects_dicts_list, convert_query_enums
+from ..utils import sa_objects_dicts_list, sa_object_to_dict, convert_query_enums, make_prefix_tsquery, \
+	set_trgm_threshold
 
 
 async def get_notes(db: AsyncSession):
@@ -30,6 +34,7 @@ async def create_note(note: schemas.NoteCreate, db: AsyncSession):
 	note_type = note.note_type.value if isinstance(note.note_type, NoteTypeEnumDB) else note.note_type
 
 	completed = False if note_type == NoteTypeEnumDB.task.value else None
+	note.date = note.date or date.today()  # partition key can't be null
 
 	query = insert(Note).values(
 		note_type=note.note_type,
@@ -41,13 +46,56 @@ async def create_note(note: schemas.NoteCreate, db: AsyncSession):
 	)
 	note_id = await db.execute(query)
 	note_id = note_id.inserted_primary_key[0]
-	await db.commit()
 
 	logger.info(f"Note (ID: {note_id}) was successfully created by user with ID: {note.user_id}")
+	UnitOfWork.of(db).publish("note.created", {"note_id": note_id, "user_id": note.user_id, "date": note.date.isoformat()})
 
 	return {**note.dict(), "id": note_id, "completed": completed}
 
 
+async def import_notes(notes_chunks: AsyncIterator[list[schemas.NoteImport]], user_id: int, db: AsyncSession):
+	"""
+	Массовый импорт заметок пользователя (из файла, см. app.imports).
+
+	Пачки заметок загружаются COPY'ем во временную таблицу, затем одним запросом переносятся в "notes".
+	Заметки, которые у пользователя уже есть (та же дата, тип и текст), пропускаются - повторный импорт
+	 того же файла ничего не дублирует. Одинаковые заметки внутри файла импортируются один раз.
+	"""
+	staging_table, columns = "notes_import", {
+		"line": "integer", "note_type": "text", "text": "varchar(1000)", "date": "date", "created_at": "timestamptz", "completed": "boolean"
+	}
+	await create_staging_table(db, staging_table, columns)
+	received = 0
+	async for chunk in notes_chunks:
+		await copy_to_staging(db, staging_table, tuple(columns), [
+			(
+				received + number, note.note_type.value if isinstance(note.note_type, NoteTypeEnumDB) else note.note_type,
+				note.text, note.date or date.today(), note.created_at, note.completed
+			) for number, note in enumerate(chunk)
+		])
+		received += len(chunk)
+
+	result = await db.execute(text(
+		f"INSERT INTO notes (note_type, text, date, created_at, completed, user_id) "
+		f"SELECT CAST(s.note_type AS note_type_enum), s.text, s.date, s.created_at, s.completed, :user_id "
+		f"FROM (SELECT DISTINCT ON (date, note_type, text) * FROM {staging_table} "
+		f"ORDER BY date, note_type, text, line) s WHERE NOT EXISTS ("
+		f"SELECT 1 FROM notes n WHERE n.user_id = :user_id AND n.date = s.date "
+		f"AND n.note_type = CAST(s.note_type AS note_type_enum) AND n.text = s.text) "
+		f"RETURNING date"
+	), {"user_id": user_id})
+	imported_dates = result.scalars().all()
+	imported = len(imported_dates)
+
+	logger.info(f"{imported} notes of {received} were successfully imported for user with ID: {user_id}")
+	if imported:
+		UnitOfWork.of(db).publish("note.imported", {
+			"user_id": user_id, "count": imported, "dates": sorted({day.isoformat() for day in imported_dates})
+		})
+
+	return {"received": received, "imported": imported}
+
+
 async def get_user_notes(user: schemas.User, filtering_params: tuple, db: AsyncSession):
 	"""
 	Получение списка заметок пользователя.
@@ -73,42 +121,114 @@ async def get_user_notes(user: schemas.User, filtering_params: tuple, db: AsyncS
 	return notes_list
 
 
+async def search_user_notes(user: schemas.User, search_query: str, limit: int, offset: int, db: AsyncSession):
+	"""
+	Полнотекстовый поиск по заметкам пользователя (все периоды и типы).
+	Слова ищутся по префиксу, результаты сортируются по релевантности, найденные слова
+	 выделяются в "headline" тегами <b></b>.
+
+	Используется сгенерированная БД колонка notes.text_search с GIN-индексом.
+	"""
+	tsquery_text = make_prefix_tsquery(search_query)
+	if not tsquery_text:
+		return []
+	tsquery = func.to_tsquery(NOTES_SEARCH_CONFIG, tsquery_text)
+	rank = func.ts_rank_cd(Note.text_search, tsquery).label("rank")
+	headline = func.ts_headline(
+		NOTES_SEARCH_CONFIG, Note.text, tsquery, "StartSel=<b>, StopSel=</b>, MaxFragments=2"
+	).label("headline")
+	query = select(Note, rank, headline).where(
+		(Note.user_id == user.id) &
+		(Note.text_search.op("@@")(tsquery))
+	).order_by(rank.desc(), Note.date.desc()).limit(limit).offset(offset)
+	result = await db.execute(query)
+
+	return [
+		{**sa_object_to_dict(note), "rank": note_rank, "headline": note_headline}
+		for note, note_rank, note_headline in result.all()
+	]
+
+
+async def autocomplete_user_notes(user: schemas.User, search_query: str, limit: int, threshold: float,
+								  db: AsyncSession):
+	"""
+	Нечеткий поиск (автодополнение) по тексту заметок пользователя (pg_trgm).
+	В отличие от полнотекстового поиска, находит заметки и с опечатками в словах запроса.
+	Используется схожесть запроса со словами текста (word_similarity) - самые похожие первыми.
+	"""
+	await set_trgm_threshold(db, threshold, word_similarity=True)
+	query = select(Note).where(
+		(Note.user_id == user.id) &
+		(literal(search_query).op("<%")(Note.text))
+	).order_by(func.word_similarity(search_query, Note.text).desc(), Note.date.desc()).limit(limit)
+	result = await db.execute(query)
+	return sa_objects_dicts_list(result.scalars().all())
+
+
 async def update_note(current_note: schemas.Note, updated_note: schemas.NoteUpdate, db: AsyncSession):
 	"""
 	Обновление параметров текущей заметки согласно новым переданным.
 	Предусмотрено определение параметра "completed" относительно типа заметки:
 	 если заметка - не задача, то "completed" может быть только со значением None, а не True/False,
 	 и наоборот.
+
+	Текущая заметка уже получена в dependencies.get_note, поэтому в UPDATE попадают только
+	 реально измененные колонки, а данные для ответа возвращаются тем же запросом (RETURNING).
 	"""
-	updated_params = dict(updated_note)
 	current_params = dict(current_note)
-	for param, val in updated_params.items():
-		if not val is None:
-			current_params[param] = val
-	match current_params["note_type"].value:
+	updated_params = {}
+	for param, val in dict(updated_note).items():
+		if not val is None and val != current_params[param]:
+			updated_params[param] = val
+
+	note_type = updated_params.get("note_type", current_params["note_type"])
+	note_type = note_type.value if isinstance(note_type, NoteTypeEnumDB) else note_type
+	match note_type:
 		case NoteTypeEnumDB.note.value:  # note with type of std note (not task) hasn't completing param
-			if isinstance(current_params["completed"], bool):
-				current_params["completed"] = None
-		case NoteTypeEnumDB.task.value:
-			if current_params["completed"] is None:
-				current_params["completed"] = current_note.completed or False
-	query = update(Note).where(Note.id == current_note.id).values(**current_params)
-	await db.execute(query)
-	await db.commit()
+			completed = None
+		case _:
+			completed = updated_note.completed
+			if completed is None:
+				completed = current_note.completed or False
+	if completed != current_note.completed:
+		updated_params["completed"] = completed
+	else:
+		updated_params.pop("completed", None)
+
+	if not any(updated_params):
+		return current_params
+
+	query = update(Note).where(
+		(Note.id == current_note.id) &
+		(Note.date == current_note.date)  # partition pruning
+	).values(**updated_params).returning(*Note.__table__.columns)
+	result = await db.execute(query)
+	updated_note_db = dict(result.mappings().one())
+	UnitOfWork.of(db).put("note", current_note.id, schemas.Note(**updated_note_db))
 
 	logger.info(f"Note ID: {current_note.id} was successfully updated by creator (ID: {current_note.user_id})")
+	UnitOfWork.of(db).publish("note.updated", {
+		"note_id": current_note.id, "user_id": current_note.user_id, "date": updated_note_db["date"].isoformat(),
+		"previous_date": current_note.date.isoformat()
+	})
 
-	return current_params
+	return updated_note_db
 
 
 async def delete_note(current_note: schemas.Note, db: AsyncSession):
 	"""
 	Удаление заметки. Возвращает pydantic-объект удаленной заметки.
 	"""
-	query = delete(Note).where(Note.id == current_note.id)
+	query = delete(Note).where(
+		(Note.id == current_note.id) &
+		(Note.date == current_note.date)  # partition pruning
+	)
 	await db.execute(query)
-	await db.commit()
+	UnitOfWork.of(db).forget("note", current_note.id)
 
 	logger.info(f"Note ID: {current_note.id} was successfully deleted by creator (ID: {current_note.user_id})")
+	UnitOfWork.of(db).publish("note.deleted", {
+		"note_id": current_note.id, "user_id": current_note.user_id, "date": current_note.date.isoformat()
+	})
 
 	return current_note
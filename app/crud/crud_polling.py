@@ -1,52 +1,225 @@
 from ..models.polling import Polling, PollingString
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import insert, select, update
+from sqlalchemy import insert, select, update, func, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from ..static.enums import PollingTypeEnum
 import datetime
+import time
 from typing import Optional, Any
-from ..utils import sa_object_to_dict
 from ..static.strings import polling_strings
+from ..uow import UnitOfWork
+from ..cache import cache, POLLING_STATS_NAMESPACE
 from loguru import logger
+import config
 
 
-async def create_polling(db: AsyncSession, **kwargs) -> int:
+# in-memory catalog of polling strings IDs by poll type
+# (polling strings are static - they're created once at server start, see create_polling_strings)
+polling_strings_catalog: dict[str, list[int]] = {}
+
+# polling stats counters: created polls -> completed polls -> polls completed on the same day
+POLLING_STATS_COUNTERS = ("polls", "completed", "completed_same_day")
+
+
+async def get_polling_strings_catalog(db: AsyncSession) -> dict[str, list[int]]:
+	"""
+	Возвращает ИД опросов (строк) по типам опроса. Загружается из БД один раз на процесс.
+	"""
+	if not any(polling_strings_catalog):
+		result = await db.execute(select(PollingString.id, PollingString.poll_type))
+		catalog = {}
+		for string_id, poll_type in result.all():
+			catalog.setdefault(poll_type.value, []).append(string_id)
+		polling_strings_catalog.update(catalog)
+	return polling_strings_catalog
+
+
+async def create_polling(db: AsyncSession, **kwargs) -> Optional[int]:
 	"""
 	Создание опроса. Ссылается на вопрос (строку).
+
+	У пользователя только один опрос в день (ограничение "user_date_polling_unique"), поэтому
+	 создание идемпотентно: если опрос уже есть, ничего не создается и возвращается None.
 	"""
-	query = insert(Polling).values(
+	query = pg_insert(Polling).values(
 		**kwargs
-	)
+	).on_conflict_do_nothing(constraint="user_date_polling_unique").returning(Polling.id)
 	inserted_poll = await db.execute(query)
-	await db.commit()
 
-	return inserted_poll.inserted_primary_key[0]
+	return inserted_poll.scalar()
 
 
 async def get_user_polling(user_id: int, db: AsyncSession, date: datetime.date = None) -> Optional[dict[str, Any]]:
 	"""
-	Поиск опроса для пользователя по дате.
+	Поиск опроса для пользователя по дате (с текстом вопроса - см. get_user_pollings).
 	"""
 	if date is None:
 		date = datetime.date.today()
-	query = select(Polling).where(
+	pollings = await get_user_pollings(user_id=user_id, date_from=date, date_to=date, db=db)
+	if pollings:
+		return pollings[0]  # one poll per day
+
+
+async def get_user_pollings(
+	user_id: int,
+	date_from: datetime.date,
+	date_to: datetime.date,
+	db: AsyncSession
+) -> list[dict[str, Any]]:
+	"""
+	Опросы пользователя за период (по дате) вместе с текстом вопроса - одним запросом.
+	"""
+	query = select(
+		*Polling.__table__.columns, PollingString.text
+	).join(
+		PollingString, PollingString.id == Polling.polling_string_id, isouter=True
+	).where(
 		(Polling.user_id == user_id) &
-		(Polling.created_at == date)
-	)
+		(Polling.created_at >= date_from) &
+		(Polling.created_at <= date_to)  # partition pruning
+	).order_by(Polling.created_at)
 	result = await db.execute(query)
-	polling = result.scalar()
-	if polling:
-		return sa_object_to_dict(polling)
+
+	return [dict(row) for row in result.mappings().all()]
 
 
 async def update_user_polling(polling_id: int, db: AsyncSession) -> None:
 	"""
 	Обновление статуса опроса.
+	Время прохождения ставится только при первом прохождении (от него зависит статистика "в тот же день").
 	"""
 	query = update(Polling).where(
 		Polling.id == polling_id
-	).values(completed=True)
-	await db.execute(query)
-	await db.commit()
+	).values(
+		completed=True, completed_at=func.coalesce(Polling.completed_at, func.now())  # instead of onupdate
+	).returning(Polling.user_id, Polling.created_at)
+	result = await db.execute(query)
+	user_id, created_at = result.one()
+
+	UnitOfWork.of(db).publish("polling.completed", {
+		"polling_id": polling_id, "user_id": user_id, "date": created_at.isoformat()
+	})
+
+
+async def get_polling_days_stats(days: list[datetime.date], db: AsyncSession) -> dict[datetime.date, list[dict[str, Any]]]:
+	"""
+	Счетчики опросов по дням и вопросам (строкам): создано, пройдено, пройдено в тот же день.
+	Один GROUP BY-запрос на все дни.
+	"""
+	query = select(
+		Polling.created_at,
+		Polling.poll_type,
+		Polling.polling_string_id,
+		func.count().label("polls"),
+		func.count().filter(Polling.completed.is_(True)).label("completed"),
+		func.count().filter(func.cast(Polling.completed_at, Date) == Polling.created_at).label("completed_same_day")
+	).where(
+		Polling.created_at.in_(days)
+	).group_by(Polling.created_at, Polling.poll_type, Polling.polling_string_id)
+	result = await db.execute(query)
+
+	days_stats = {day: [] for day in days}
+	for row in result.mappings().all():
+		days_stats[row["created_at"]].append({
+			"poll_type": row["poll_type"].value, "polling_string_id": row["polling_string_id"],
+			**{counter: row[counter] for counter in POLLING_STATS_COUNTERS}
+		})
+	return days_stats
+
+
+async def get_polling_stats(date_from: datetime.date, date_to: datetime.date, db: AsyncSession) -> list[dict[str, Any]]:
+	"""
+	Счетчики опросов по вопросам за период - сумма дневных счетчиков (get_polling_days_stats).
+
+	Дневные счетчики кэшируются: прошедшие дни почти не меняются и хранятся долго (сбрасываются, если
+	 опрос за этот день пройден позже - см. cache.register_cache_invalidation), текущий день - недолго.
+	 Дни, которых нет в кэше, считаются одним запросом к БД.
+	"""
+	today = datetime.date.today()
+	days = [date_from + datetime.timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+	entries = {day: (cache.group_key(POLLING_STATS_NAMESPACE, day.isoformat()), "day") for day in days}
+	cached = await cache.get_many(list(entries.values()))
+	days_stats = {day: cached[entry] for day, entry in entries.items() if entry in cached}
+
+	missing_days = [day for day in days if day not in days_stats]
+	if missing_days:
+		started_at = time.time()
+		computed = await get_polling_days_stats(missing_days, db)
+		await cache.set_many({
+			entries[day]: (
+				computed[day],
+				config.POLLING_STATS_CACHE_EXPIRE if day < today else config.POLLING_STATS_TODAY_CACHE_EXPIRE
+			) for day in missing_days
+		}, started_at=started_at)
+		days_stats.update(computed)
+
+	totals = {}
+	for day_stats in days_stats.values():
+		for row in day_stats:
+			total = totals.setdefault(
+				(row["poll_type"], row["polling_string_id"]),
+				{"poll_type": row["poll_type"], "polling_string_id": row["polling_string_id"], **dict.fromkeys(POLLING_STATS_COUNTERS, 0)}
+			)
+			for counter in POLLING_STATS_COUNTERS:
+				total[counter] += row[counter]
+
+	return list(totals.values())
+
+
+def add_completion_rates(stats: dict[str, Any]) -> dict[str, Any]:
+	polls = stats["polls"]
+	return {
+		**stats,
+		"completion_rate": round(stats["completed"] / polls, 4) if polls else None,
+		"same_day_completion_rate": round(stats["completed_same_day"] / polls, 4) if polls else None
+	}
+
+
+async def get_polling_types_stats(date_from: datetime.date, date_to: datetime.date, db: AsyncSession) -> list[dict[str, Any]]:
+	"""
+	Воронка опросов по типам: создано -> пройдено -> пройдено в тот же день (с долями от созданных).
+	"""
+	types_stats = {}
+	for stats in await get_polling_stats(date_from, date_to, db):
+		total = types_stats.setdefault(
+			stats["poll_type"], {"poll_type": stats["poll_type"], **dict.fromkeys(POLLING_STATS_COUNTERS, 0)}
+		)
+		for counter in POLLING_STATS_COUNTERS:
+			total[counter] += stats[counter]
+
+	return [add_completion_rates(stats) for _, stats in sorted(types_stats.items())]
+
+
+async def get_polling_strings_stats(
+	date_from: datetime.date,
+	date_to: datetime.date,
+	db: AsyncSession,
+	poll_type: PollingTypeEnum = None
+) -> list[dict[str, Any]]:
+	"""
+	Воронка опросов по вопросам (строкам) с текстом вопроса - от менее к более проходимым.
+	Вопросы, которые за период не задавались, тоже возвращаются (с нулевыми счетчиками).
+	"""
+	query = select(PollingString.id, PollingString.poll_type, PollingString.text)
+	if poll_type is not None:
+		query = query.where(PollingString.poll_type == poll_type)
+	result = await db.execute(query)
+	strings_stats = {
+		string_id: {
+			"polling_string_id": string_id, "poll_type": string_type.value, "text": text,
+			**dict.fromkeys(POLLING_STATS_COUNTERS, 0)
+		} for string_id, string_type, text in result.all()
+	}
+	for stats in await get_polling_stats(date_from, date_to, db):
+		if stats["polling_string_id"] in strings_stats:
+			strings_stats[stats["polling_string_id"]].update(
+				{counter: stats[counter] for counter in POLLING_STATS_COUNTERS}
+			)
+
+	return sorted(
+		(add_completion_rates(stats) for stats in strings_stats.values()),
+		key=lambda stats: (stats["completion_rate"] is None, stats["completion_rate"] or 0, stats["polling_string_id"])
+	)
 
 
 async def create_polling_string(text: str, polling_type: PollingTypeEnum, db: AsyncSession) -> None:
@@ -58,7 +231,8 @@ async def create_polling_string(text: str, polling_type: PollingTypeEnum, db: As
 		text=text
 	)
 	await db.execute(query)
-	await db.commit()
+
+	polling_strings_catalog.clear()  # will be reloaded on next use
 
 
 async def create_polling_strings(db: AsyncSession):
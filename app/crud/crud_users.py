@@ -1,11 +1,12 @@
 from loguru import logger
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import select, insert, update, delete, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
 from ..models.users import User
-from ..utils import get_password_hash
-from ..utils import sa_objects_dicts_list, sa_object_to_dict
+from ..uow import UnitOfWork
+from ..utils import get_password_hash, escape_like, set_trgm_threshold
+from ..utils import sa_objects_dicts_list
 
 
 async def get_users(db: AsyncSession):
@@ -17,6 +18,32 @@ async def get_users(db: AsyncSession):
 	return sa_objects_dicts_list(result.scalars().all())
 
 
+async def search_users(search_query: str, limit: int, threshold: float, db: AsyncSession):
+	"""
+	Нечеткий поиск (автодополнение) пользователей по email, имени и фамилии (pg_trgm).
+	Находятся пользователи с email, начинающимся с запроса, или с похожими (по порогу threshold)
+	 email/именем/фамилией. Самые похожие - первыми.
+
+	:return: Возвращает список из не более чем limit пользователей.
+	"""
+	await set_trgm_threshold(db, threshold)
+	similarity = func.greatest(
+		func.similarity(User.email, search_query),
+		func.similarity(User.first_name, search_query),
+		func.similarity(func.coalesce(User.last_name, ""), search_query)
+	)
+	query = select(User).where(
+		or_(
+			User.email.ilike(f"{escape_like(search_query)}%", escape="\\"),
+			User.email.op("%")(search_query),
+			User.first_name.op("%")(search_query),
+			User.last_name.op("%")(search_query)
+		)
+	).order_by(similarity.desc(), User.id).limit(limit)
+	result = await db.execute(query)
+	return sa_objects_dicts_list(result.scalars().all())
+
+
 async def create_user(user: schemas.UserCreate, db: AsyncSession):
 	"""
 	:return: Возвращает словарь с данными созданного юзера.
@@ -33,11 +60,10 @@ async def create_user(user: schemas.UserCreate, db: AsyncSession):
 	)  # пришлось тут определить is_staff и disabled опять - почему-то дефолтные значения в
 	# models.users.User не срабатывают :(
 	user_id = await db.execute(query)
-	await db.commit()
-
 	user_id = user_id.inserted_primary_key[0]
 
 	logger.info(f"User {user.email} (ID: {user_id}) was successfully registered")
+	UnitOfWork.of(db).publish("user.created", {"user_id": user_id})
 
 	return {
 		**user.dict(), "id": user_id
@@ -46,27 +72,44 @@ async def create_user(user: schemas.UserCreate, db: AsyncSession):
 
 async def update_user(user: schemas.UserUpdate, user_id: int, action_by: schemas.User, db: AsyncSession):
 	"""
+	Частичное обновление пользователя: в UPDATE попадают только переданные и реально измененные поля
+	 (неизменные индексируемые колонки, например email, не перезаписываются).
+	Данные для ответа возвращаются тем же запросом (RETURNING) - без предварительного SELECT,
+	 а если менять нечего - берутся из единицы работы запроса (пользователь уже загружен при проверке токена).
+
 	:return: Возвращает словарь с данными обновленного пользователя.
 	"""
-	query = select(User).where(User.id == user_id)
-	result = await db.execute(query)
-	user_db = sa_object_to_dict(result.scalar())
+	updated_params = {}
 	for key, val in user.dict().items():
 		if not val is None:
 			if key == "password":
 				if action_by.id != user_id:
 					pass  # only user can set a new password, not staff
 				else:
-					hashed_password = get_password_hash(val)
-					user_db["hashed_password"] = hashed_password
+					updated_params["hashed_password"] = get_password_hash(val)
+			elif action_by.id == user_id and getattr(action_by, key, None) == val:
+				pass  # current user data is already known - skip unchanged columns
 			else:
-				user_db[key] = val
-	query = update(User).where(User.id == user_id).values(**user_db)
-	await db.execute(query)
-	await db.commit()
+				updated_params[key] = val
+
+	unit_of_work = UnitOfWork.of(db)
+	loaded_user: schemas.UserInDB | None = unit_of_work.get("user", user_id)
+	if any(updated_params):
+		query = update(User).where(User.id == user_id).values(**updated_params).returning(*User.__table__.columns)
+	elif loaded_user is not None:
+		query = None
+	else:
+		query = select(*User.__table__.columns).where(User.id == user_id)
+	if query is not None:
+		result = await db.execute(query)
+		user_db = dict(result.mappings().one())
+		unit_of_work.put("user", user_id, schemas.UserInDB(**user_db))
+	else:
+		user_db = loaded_user.dict()
 
 	logger.info(f"User {user_db['email']} (ID: {user_id}) was successfully updated by user "
 				f"{action_by.email} with ID {action_by.id}")
+	unit_of_work.publish("user.updated", {"user_id": user_id, "action_by": action_by.id})
 
 	return user_db
 
@@ -77,9 +120,10 @@ async def delete_user(user_id: int, action_by: schemas.User, db: AsyncSession) -
 	"""
 	query = delete(User).where(User.id == user_id)
 	await db.execute(query)
-	await db.commit()
+	UnitOfWork.of(db).forget("user", user_id)
 
 	logger.info(f"User ID: {user_id} was successfully deleted by user {action_by.email} with ID "
 				f"{action_by.id}")
+	UnitOfWork.of(db).publish("user.deleted", {"user_id": user_id, "action_by": action_by.id})
 
 	return {"deleted_user_id": user_id}
@@ -1,4 +1,6 @@
 from psycopg2 import connect
+from redis import asyncio as aioredis
+from sqlalchemy import DDL, event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -16,9 +18,38 @@ except ValueError:
 
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# read replica engine (optional, see dependencies.get_async_read_session)
+replica_engine = create_async_engine(config.DATABASE_URL_REPLICA) if config.DATABASE_URL_REPLICA else None
+async_replica_session_maker = sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False) \
+    if replica_engine is not None else None
+
+# redis connection (lazy - connects on first command; using for events, jobs, etc.)
+redis_client = aioredis.from_url(config.REDIS_URL, decode_responses=True)
+
+
+async def stick_to_primary(subject: str) -> None:
+    """
+    Read-your-writes: after a write, user's reads go to the main DB
+    for DB_REPLICA_STICKINESS_TIME seconds (the replica may lag behind).
+    """
+    await redis_client.set(
+        f"{config.REDIS_DB_STICKINESS_PREFIX}:{subject}", 1, ex=config.DB_REPLICA_STICKINESS_TIME
+    )
+
+
+async def is_stuck_to_primary(subject: str) -> bool:
+    return bool(await redis_client.exists(f"{config.REDIS_DB_STICKINESS_PREFIX}:{subject}"))
+
 Base = declarative_base()
 
-# db connection instance (sync mode, using while starting app)
-sync_db = connect(
-    **config.DB_PARAMS
-)
+# trigram indexes (fuzzy search) need the pg_trgm extension
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+
+def sync_db_connect():
+    """
+    DB connection (sync mode, using while starting app).
+    It isn't opened at import: gunicorn master imports the app before
+    forking workers (preload_app), and workers must not share a connection.
+    """
+    return connect(**config.DB_PARAMS)
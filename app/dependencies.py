@@ -1,37 +1,92 @@
 import datetime
+import hashlib
 from typing import Annotated
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 
-from fastapi import Depends, status, HTTPException, Path, Query, BackgroundTasks
+from fastapi import Depends, status, HTTPException, Path, Query, Request, Response
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.security.utils import get_authorization_scheme_param
 from jose import JWTError, jwt
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from . import schemas
-from .database import async_session_maker
-from .exceptions import CredentialsException
+from .database import async_session_maker, async_replica_session_maker, is_stuck_to_primary
+from .exceptions import CredentialsException, PermissionsError
+from .imports import IMPORT_FORMATS
 from .models.day_ratings import DayRating
 from .models.notes import Note
 from .models.users import User
 from .models.polling import Polling
 from .utils import sa_object_to_dict
-from . import tasks
+from .events import event_bus
+from .cache import cache
+from .uow import UnitOfWork, bind_unit_of_work
 
 
 # dependency that expects for token from user
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+	"""
+	Сессия БД запроса (одна на все зависимости и эндпоинт). Транзакция фиксируется
+	 после эндпоинта (app.uow.UnitOfWorkRoute).
+	"""
 	async with async_session_maker() as session:
+		bind_unit_of_work(request, session)
+		yield session
+
+
+async def get_unit_of_work(db: Annotated[AsyncSession, Depends(get_async_session)]) -> UnitOfWork:
+	"""
+	Единица работы запроса: кэш загруженных за запрос пользователей, заметок и оценок дня.
+	"""
+	return UnitOfWork.of(db)
+
+
+def get_token_subject(request: Request) -> Optional[str]:
+	"""
+	Субъект (email) JWT-токена запроса без проверки пользователя в БД (None - если токена нет или он некорректный).
+	"""
+	scheme, token = get_authorization_scheme_param(request.headers.get("Authorization"))
+	if scheme.lower() != "bearer":
+		return
+	try:
+		return jwt.decode(token=token, key=config.JWT_SECRET_KEY, algorithms=[config.JWT_SIGN_ALGORITHM]).get("sub")
+	except JWTError:
+		return
+
+
+async def get_async_read_session(
+	request: Request,
+	db: Annotated[AsyncSession, Depends(get_async_session)]
+) -> AsyncGenerator[AsyncSession, None]:
+	"""
+	Сессия для запросов только на чтение.
+
+	Если настроена реплика БД (config.DATABASE_URL_REPLICA), GET-запросы читают из нее.
+	Остальные запросы, а также запросы пользователя, недавно что-то изменившего (read-your-writes,
+	 см. main.stick_to_primary_after_write), используют основную БД - сессию get_async_session
+	 (она та же, что и у эндпоинта: зависимости кэшируются в рамках запроса).
+	"""
+	if async_replica_session_maker is None or request.method not in ("GET", "HEAD"):
+		yield db
+		return
+	subject = get_token_subject(request)
+	if subject is not None and await is_stuck_to_primary(subject):
+		yield db
+		return
+	async with async_replica_session_maker() as session:
 		yield session
 
 
 async def get_current_user(
 	token: Annotated[str, Depends(oauth2_scheme)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	primary_db: Annotated[AsyncSession, Depends(get_async_session)],
+	unit_of_work: Annotated[UnitOfWork, Depends(get_unit_of_work)]
 ) -> schemas.UserInDB:
 	"""
 	Функция для декодирования получаемого от пользователя токена.
@@ -47,40 +102,48 @@ async def get_current_user(
 		token_data = schemas.TokenData(email=email)
 	except JWTError:
 		raise CredentialsException()
-	user = await User.get_user_by_email(db=db, email=token_data.email)
+
+	async def load_user() -> Optional[schemas.UserInDB]:
+		user_db = await User.get_user_by_email(db=db, email=token_data.email)
+		if user_db is None and db is not primary_db:  # только что созданного пользователя может еще не быть в реплике
+			user_db = await User.get_user_by_email(db=primary_db, email=token_data.email)
+		return user_db
+
+	user = await unit_of_work.load("user_by_email", token_data.email, load_user)
 	if user is None:
 		raise CredentialsException()
+	unit_of_work.put("user", user.id, user)
 	return user
 
 
 async def get_current_active_user(
-	current_user: Annotated[schemas.User, Depends(get_current_user)],
-	background_tasks: BackgroundTasks,
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	current_user: Annotated[schemas.User, Depends(get_current_user)]
 ) -> schemas.User:
 	"""
 	Функция проверяет, заблокирован ли пользователь, сделавший запрос.
 
-	А также запускает каскад проверки и формирования опросов для него.
+	А также публикует событие активности пользователя - по нему запускается каскад проверки
+	 и формирования опросов для него (см. tasks.register_event_handlers).
 	"""
 	if current_user.disabled:
 		raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Disabled user")
 
 	if not current_user.is_staff:
-		background_tasks.add_task(
-			tasks.initialize_user_polls, current_user, db
-		)
+		await event_bus.publish("user.activity", {"user_id": current_user.id})
 	return current_user
 
 
 async def get_user_id(
 	user_id: Annotated[int, Path(ge=1)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	unit_of_work: Annotated[UnitOfWork, Depends(get_unit_of_work)]
 ) -> int:
 	"""
 	Функция проверяет, существует ли пользователь с переданным ИД.
 	Возвращает ИД.
 	"""
+	if unit_of_work.get("user", user_id) is not None:  # уже загружен в этом запросе (например, это текущий пользователь)
+		return user_id
 	result = await db.execute(
 		select(User).where(User.id == user_id)
 	)
@@ -92,7 +155,7 @@ async def get_user_id(
 
 async def get_polling_id(
 	polling_id: Annotated[int, Path(ge=1)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ) -> int:
 	"""
 	Функция проверяет, существует ли опрос с переданным ИД.
@@ -109,43 +172,51 @@ async def get_polling_id(
 
 async def get_note(
 	note_id: Annotated[int, Path(ge=1)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	unit_of_work: Annotated[UnitOfWork, Depends(get_unit_of_work)]
 ) -> schemas.Note:
 	"""
 	Функция проверяет, существует ли заметка с переданным ИД.
 	Возвращает pydantic-объект заметки.
 	"""
-	result = await db.execute(
-		select(Note).where(Note.id == note_id)
-	)
-	note = result.scalar()
+	async def load_note() -> Optional[schemas.Note]:
+		result = await db.execute(
+			select(Note).where(Note.id == note_id)
+		)
+		note_db = result.scalar()
+		if note_db is not None:
+			return schemas.Note(**sa_object_to_dict(note_db))
+
+	note = await unit_of_work.load("note", note_id, load_note)
 	if note is None:
 		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
-	note_dict = sa_object_to_dict(note)
-
-	return schemas.Note(**note_dict)
+	return note
 
 
 async def get_day_rating(
 	date: Annotated[datetime.date, Query(title="Day rating date", example="2000-01-01")],
 	user_id: Annotated[int, Depends(get_user_id)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	unit_of_work: Annotated[UnitOfWork, Depends(get_unit_of_work)]
 ):
 	"""
 	Функция проверяет, существует ли пользователь и его оценка дня по переданной дате.
 	"""
-	result = await db.execute(
-		select(DayRating).where(
-			(DayRating.user_id == user_id) &
-			(DayRating.date == date)
+	async def load_day_rating() -> Optional[schemas.DayRating]:
+		result = await db.execute(
+			select(DayRating).where(
+				(DayRating.user_id == user_id) &
+				(DayRating.date == date)
+			)
 		)
-	)
-	day_rating = result.scalar()
+		day_rating_db = result.scalar()
+		if day_rating_db is not None:
+			return schemas.DayRating(**sa_object_to_dict(day_rating_db))
+
+	day_rating = await unit_of_work.load("day_rating", (user_id, date), load_day_rating)
 	if day_rating is None:
 		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Day rating not found")
-	day_rating = sa_object_to_dict(day_rating)
-
-	return schemas.DayRating(**day_rating)
+	return day_rating
 
 
 async def get_day_rating_filters(
@@ -164,3 +235,66 @@ async def get_day_rating_filters(
 		"next_day_expectations": next_day_expectations
 	}
 
+
+def get_import_format(request: Request) -> str:
+	"""
+	Формат импортируемого файла по заголовку Content-Type (NDJSON или CSV).
+	"""
+	content_type = request.headers.get("Content-Type", "").split(";")[0].strip().lower()
+	import_format = IMPORT_FORMATS.get(content_type)
+	if import_format is None:
+		raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+							detail=f"Content-Type must be one of {list(IMPORT_FORMATS)}")
+	return import_format
+
+
+async def get_import_user_id(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	db: Annotated[AsyncSession, Depends(get_async_session)],
+	user_id: Annotated[int, Query(ge=1, description="Importing for another user (only for is_staff users)")] = None
+) -> int:
+	"""
+	ИД пользователя, для которого импортируются данные: по умолчанию - текущий пользователь,
+	 is_staff-пользователи могут импортировать данные любого существующего пользователя.
+	"""
+	if user_id is None or user_id == current_user.id:
+		return current_user.id
+	if not current_user.is_staff:
+		raise PermissionsError()
+	result = await db.execute(select(User.id).where(User.id == user_id))
+	if result.scalar() is None:
+		raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+	return user_id
+
+
+def get_etag(namespace: str):
+	"""
+	Зависимость условного GET-запроса для списков данных пользователя (If-None-Match / ETag).
+
+	Сильный ETag строится из версии данных пользователя (app.cache, увеличивается при каждом их изменении)
+	 и параметров запроса. Если клиент прислал актуальный ETag, отдается 304 Not Modified - без запроса к БД
+	 и сериализации ответа.
+	ETag передается в эндпоинт: он входит в ключ кэша, поэтому после изменения данных
+	 кэш всех воркеров (в том числе в памяти) сразу становится неактуальным.
+	Если версию получить не удалось (Redis недоступен), ETag не выдается (None) - эндпоинт работает без кэша.
+	"""
+	async def etag_dependency(
+		request: Request,
+		response: Response,
+		current_user: Annotated[schemas.User, Depends(get_current_active_user)]
+	) -> Optional[str]:
+		version = await cache.get_version(namespace, current_user.id)
+		if version is None:  # Redis is unavailable - without ETag and cache
+			return None
+		params = hashlib.md5(str(sorted(request.query_params.multi_items())).encode()).hexdigest()[:16]
+		etag = f'"{namespace}-{current_user.id}-{version}-{params}"'
+
+		if_none_match = request.headers.get("If-None-Match")
+		if if_none_match is not None:
+			client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+			if etag in client_etags or "*" in client_etags:
+				raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+		response.headers["ETag"] = etag
+		return etag
+
+	return etag_dependency
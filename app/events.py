@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import socket
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Optional
+
+from loguru import logger
+from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
+
+import config
+
+EventHandler = Callable[[str, dict[str, Any]], Awaitable[None]]
+
+
+class RedisStreamTransport:
+	"""
+	Доставка событий через Redis Streams.
+
+	Событие публикуется в стрим (XADD), а воркеры приложения читают его через общую consumer group
+	 (XREADGROUP): каждое событие получает один воркер, который передает его в свою локальную шину.
+	 Поэтому обработчики (не inline) срабатывают один раз на событие, а не в каждом процессе, и нагрузка
+	 распределяется между воркерами. Inline-обработчики вызываются только в публикующем процессе.
+
+	Событие подтверждается (XACK) после передачи в локальную шину - как и внутрипроцессные события,
+	 оно теряется, если воркер упадет до его обработки.
+	"""
+	def __init__(
+		self,
+		redis: aioredis.Redis,
+		stream: str,
+		maxlen: int,
+		group: str = config.EVENT_BUS_REDIS_GROUP,
+		consumer: str = None
+	):
+		self.redis = redis
+		self.stream = stream
+		self.maxlen = maxlen
+		self.group = group
+		self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+
+	async def send(self, event: str, payload: dict[str, Any]) -> None:
+		await self.redis.xadd(
+			self.stream, {"event": event, "payload": json.dumps(payload)},
+			maxlen=self.maxlen, approximate=True
+		)
+
+	async def ensure_group(self) -> None:
+		try:
+			await self.redis.xgroup_create(self.stream, self.group, id="$", mkstream=True)
+		except ResponseError as error:
+			if "BUSYGROUP" not in str(error):  # group already exists
+				raise
+
+	async def read(self, bus: "EventBus", block: Optional[int] = 5000) -> int:
+		"""
+		Передача в шину новых событий группы (не полученных другими воркерами). Возвращает их количество.
+		"""
+		response = await self.redis.xreadgroup(self.group, self.consumer, {self.stream: ">"}, block=block, count=100)
+		received = 0
+		for _, messages in response:
+			for message_id, fields in messages:
+				await bus.put(fields["event"], json.loads(fields["payload"]))
+				await self.redis.xack(self.stream, self.group, message_id)
+				received += 1
+		return received
+
+	async def listen(self, bus: "EventBus") -> None:
+		"""
+		Чтение событий из стрима до отмены корутины.
+		"""
+		while True:
+			try:
+				await self.ensure_group()
+				while True:
+					await self.read(bus)
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				logger.exception(f"Can't read events from Redis stream '{self.stream}'")
+				await asyncio.sleep(1)
+
+
+class EventBus:
+	"""
+	Внутрипроцессная асинхронная шина событий для побочных действий после записи в БД
+	 (генерация опросов, инвалидация кэша и т.д.).
+
+	Названия событий - "<объект>.<действие>": "note.created", "rating.updated", "user.deleted"...
+	Подписаться можно на конкретное событие, на все события объекта ("note.*") или на все ("*").
+
+	События кладутся в ограниченную очередь и обрабатываются воркер-корутинами, поэтому время ответа
+	 на запрос не включает работу подписчиков. Если очередь заполнена, publish ждет освобождения места
+	 (back-pressure). Payload события должен сериализоваться в JSON (для Redis-транспорта).
+	"""
+	def __init__(self, maxsize: int = config.EVENT_BUS_QUEUE_SIZE, workers: int = config.EVENT_BUS_WORKERS):
+		self._handlers: dict[str, list[EventHandler]] = defaultdict(list)
+		self._inline_handlers: dict[str, list[EventHandler]] = defaultdict(list)
+		self._maxsize = maxsize
+		self._workers_amount = workers
+		self._queue: Optional[asyncio.Queue] = None
+		self._tasks: list[asyncio.Task] = []
+		self.transport: Optional[RedisStreamTransport] = None
+
+	@property
+	def running(self) -> bool:
+		return self._queue is not None
+
+	def subscribe(self, event: str, handler: EventHandler = None, inline: bool = False):
+		"""
+		Подписка обработчика на событие. Можно использовать как декоратор.
+
+		Inline-обработчики вызываются сразу при публикации в текущем процессе, до ответа на запрос
+		 (например, инвалидация кэша). Они должны быть быстрыми.
+		"""
+		def decorator(func: EventHandler) -> EventHandler:
+			handlers = self._inline_handlers[event] if inline else self._handlers[event]
+			if func not in handlers:
+				handlers.append(func)
+			return func
+
+		if handler is not None:
+			return decorator(handler)
+		return decorator
+
+	def get_handlers(self, event: str, inline: bool = False) -> list[EventHandler]:
+		"""
+		Все обработчики события: точные, по объекту ("note.*") и общие ("*").
+		"""
+		handlers, obj = self._inline_handlers if inline else self._handlers, event.split(".")[0]
+		return [*handlers.get(event, ()), *handlers.get(f"{obj}.*", ()), *handlers.get("*", ())]
+
+	async def publish(self, event: str, payload: dict[str, Any]) -> None:
+		"""
+		Публикация события.
+		Если шина не запущена (например, скрипты вне сервера), обработчики вызываются сразу.
+		"""
+		await self.dispatch(event, payload, inline=True)
+		if self.transport is not None:
+			try:
+				return await self.transport.send(event, payload)
+			except Exception:
+				logger.exception(f"Can't send event '{event}' to Redis stream, handling it locally")
+		await self.put(event, payload)
+
+	async def put(self, event: str, payload: dict[str, Any]) -> None:
+		if self._queue is None:
+			return await self.dispatch(event, payload)
+		await self._queue.put((event, payload))
+
+	async def dispatch(self, event: str, payload: dict[str, Any], inline: bool = False) -> None:
+		"""
+		Вызов обработчиков события. Ошибка одного обработчика не влияет на остальные.
+		"""
+		for handler in self.get_handlers(event, inline=inline):
+			try:
+				await handler(event, payload)
+			except Exception:
+				logger.exception(f"Event '{event}' handler '{handler.__name__}' failed (payload: {payload})")
+
+	async def start(self, transport: RedisStreamTransport = None) -> None:
+		"""
+		Запуск воркер-корутин (и чтения Redis-стрима, если передан транспорт).
+		"""
+		if self.running:
+			return
+		self._queue = asyncio.Queue(maxsize=self._maxsize)
+		self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers_amount)]
+		self.transport = transport
+		if transport is not None:
+			self._tasks.append(asyncio.create_task(transport.listen(self)))
+
+	async def stop(self, timeout: float = config.EVENT_BUS_SHUTDOWN_TIMEOUT) -> None:
+		"""
+		Остановка шины: ожидание обработки уже опубликованных событий (не дольше timeout).
+		"""
+		if not self.running:
+			return
+		try:
+			await asyncio.wait_for(self._queue.join(), timeout=timeout)
+		except asyncio.TimeoutError:
+			logger.warning(f"Event bus was stopped with {self._queue.qsize()} unhandled events")
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks = []
+		self._queue = None
+		self.transport = None
+
+	async def _worker(self) -> None:
+		while True:
+			event, payload = await self._queue.get()
+			try:
+				await self.dispatch(event, payload)
+			finally:
+				self._queue.task_done()
+
+
+event_bus = EventBus()
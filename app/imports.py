@@ -0,0 +1,149 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+
+IMPORT_FORMATS = {  # content type: format
+	"application/x-ndjson": "ndjson",
+	"application/jsonl": "ndjson",
+	"text/csv": "csv"
+}
+
+
+class ImportValidationError(Exception):
+	"""
+	Ошибки в строках импортируемого файла: [{"line": номер строки, "errors": [...]}, ...].
+	"""
+	def __init__(self, errors: list[dict[str, Any]]):
+		super().__init__(f"{len(errors)} invalid lines")
+		self.errors = errors
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+	"""
+	Построчное чтение тела запроса по мере его получения (файл целиком в память не загружается).
+	"""
+	decoder, tail = codecs.getincrementaldecoder("utf-8-sig")(), ""
+	async for chunk in stream:
+		*lines, tail = (tail + decoder.decode(chunk)).split("\n")
+		for line in lines:
+			yield line.removesuffix("\r")
+	tail += decoder.decode(b"", final=True)
+	if tail:
+		yield tail.removesuffix("\r")
+
+
+async def iter_records(
+	stream: AsyncIterator[bytes],
+	import_format: str,
+	max_record_lines: int = config.IMPORT_MAX_RECORD_LINES
+) -> AsyncIterator[tuple[int, Any]]:
+	"""
+	Записи файла с номерами строк: NDJSON - JSON-объект в каждой строке,
+	 CSV - строки с заголовком (пустые значения - null).
+	Некорректная запись отдается как ValueError - ошибка попадет в отчет валидации.
+
+	CSV-запись длиннее max_record_lines строк считается незакрытой кавычкой: чтение файла прекращается,
+	 а не буферизует его остаток в памяти.
+	"""
+	header, record_lines, quoted, line_number = None, [], False, 0
+	async for line in iter_lines(stream):
+		line_number += 1
+		if import_format == "ndjson":
+			if line.strip():
+				try:
+					yield line_number, json.loads(line)
+				except ValueError as e:
+					yield line_number, ValueError(f"Invalid JSON: {e}")
+			continue
+
+		record_lines.append(line)
+		if line.count('"') % 2:
+			quoted = not quoted
+		if quoted:  # quoted value with line breaks continues
+			if len(record_lines) >= max_record_lines:
+				yield line_number - len(record_lines) + 1, ValueError("Unterminated quoted value")
+				return
+			continue
+		row = next(csv.reader(["\n".join(record_lines)]), [])
+		record_lines = []
+		if not any(row):
+			continue
+		if header is None:
+			header = [column.strip() for column in row]
+		elif len(row) != len(header):
+			yield line_number, ValueError(f"Expected {len(header)} values, got {len(row)}")
+		else:
+			yield line_number, {column: value or None for column, value in zip(header, row)}
+	if quoted:  # the quote isn't closed till the end of the file
+		yield line_number - len(record_lines) + 1, ValueError("Unterminated quoted value")
+
+
+async def validate_chunks(
+	records: AsyncIterator[tuple[int, Any]],
+	schema: Type[BaseModel],
+	check: Optional[Callable[[BaseModel], Awaitable[Optional[str]]]] = None,
+	chunk_size: int = config.IMPORT_CHUNK_SIZE,
+	max_errors: int = config.IMPORT_MAX_ERRORS
+) -> AsyncIterator[list[BaseModel]]:
+	"""
+	Валидация записей pydantic-схемой пачками по chunk_size.
+	Check - дополнительная проверка объекта (возвращает текст ошибки или None).
+
+	Импорт - "все или ничего": пачка с ошибками не отдается, а после нее (или после max_errors ошибок)
+	 поднимается ImportValidationError со всеми найденными ошибками.
+	"""
+	chunk, errors = [], []
+	async for line_number, record in records:
+		try:
+			if isinstance(record, ValueError):
+				raise record
+			if not isinstance(record, dict):
+				raise ValueError("Record must be an object")
+			obj = schema.parse_obj(record)
+			error = await check(obj) if check is not None else None
+			if error is not None:
+				raise ValueError(error)
+		except ValidationError as e:
+			errors.append({"line": line_number, "errors": e.errors()})
+		except ValueError as e:
+			errors.append({"line": line_number, "errors": [{"msg": str(e)}]})
+		else:
+			chunk.append(obj)
+
+		if len(errors) >= max_errors:
+			raise ImportValidationError(errors)
+		if len(chunk) >= chunk_size:
+			if errors:
+				raise ImportValidationError(errors)
+			yield chunk
+			chunk = []
+	if errors:
+		raise ImportValidationError(errors)
+	if chunk:
+		yield chunk
+
+
+async def create_staging_table(db: AsyncSession, table: str, columns: dict[str, str]) -> None:
+	"""
+	Временная таблица для загрузки данных COPY'ем (удаляется при завершении транзакции).
+	Таблица прошлого импорта может остаться, если транзакция сессии вложенная (SAVEPOINT).
+	"""
+	columns_sql = ", ".join(f"{name} {column_type}" for name, column_type in columns.items())
+	await db.execute(text(f"DROP TABLE IF EXISTS pg_temp.{table}"))
+	await db.execute(text(f"CREATE TEMP TABLE {table} ({columns_sql}) ON COMMIT DROP"))
+
+
+async def copy_to_staging(db: AsyncSession, table: str, columns: tuple[str, ...], records: list[tuple]) -> None:
+	"""
+	Загрузка пачки записей во временную таблицу через COPY (asyncpg) - в транзакции сессии.
+	"""
+	connection = await db.connection()
+	driver_connection = (await connection.get_raw_connection()).driver_connection  # asyncpg connection
+	await driver_connection.copy_records_to_table(table, records=records, columns=columns)
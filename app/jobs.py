@@ -0,0 +1,225 @@
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from loguru import logger
+from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
+
+import config
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+
+class JobQueue:
+	"""
+	Надежная очередь фоновых задач на Redis Streams (в отличие от BackgroundTasks fastapi,
+	 задачи не теряются при перезапуске воркера).
+
+	- Задача добавляется в стрим (XADD) и читается воркерами через consumer group (XREADGROUP);
+	- Задача подтверждается (XACK) только после выполнения. Задачи упавшего воркера забираются
+	 другими воркерами после JOBS_CLAIM_IDLE_MS простоя (XAUTOCLAIM) - это тоже неудачная попытка.
+	 Пока задача выполняется, воркер продлевает ее аренду (XCLAIM JUSTID), поэтому долгие задачи не забираются;
+	- При ошибке задача перезапускается до JOBS_MAX_RETRIES раз (с экспоненциальной задержкой: до срока
+	 задача ждет в sorted set "{stream}:retry"), затем попадает в dead-letter стрим;
+	- Ключ дедупликации (например, "poll:{user_id}:{date}") не дает поставить одну и ту же задачу повторно.
+
+	Воркеры запускаются отдельно от API (python main.py --worker), поэтому масштабируются независимо.
+	"""
+	def __init__(
+		self,
+		stream: str = config.JOBS_STREAM,
+		group: str = config.JOBS_GROUP,
+		dead_letter_stream: str = config.JOBS_DEAD_LETTER_STREAM,
+		max_retries: int = config.JOBS_MAX_RETRIES,
+		dedup_ttl: int = config.JOBS_DEDUP_TTL,
+		claim_idle_ms: int = config.JOBS_CLAIM_IDLE_MS,
+		retry_backoff: float = config.JOBS_RETRY_BACKOFF
+	):
+		self.stream = stream
+		self.group = group
+		self.dead_letter_stream = dead_letter_stream
+		self.max_retries = max_retries
+		self.dedup_ttl = dedup_ttl
+		self.claim_idle_ms = claim_idle_ms
+		self.retry_backoff = retry_backoff
+		self.retry_key = f"{stream}:retry"
+		self.redis: Optional[aioredis.Redis] = None
+		self.eager = False  # задачи выполняются сразу при постановке, без стрима и воркеров (тесты)
+		self._handlers: dict[str, JobHandler] = {}
+
+	def register(self, job: str, handler: JobHandler = None):
+		"""
+		Регистрация обработчика задачи. Можно использовать как декоратор.
+		"""
+		def decorator(func: JobHandler) -> JobHandler:
+			self._handlers[job] = func
+			return func
+
+		if handler is not None:
+			return decorator(handler)
+		return decorator
+
+	def _dedup_key(self, key: str) -> str:
+		return f"{self.stream}:dedup:{key}"
+
+	async def enqueue(self, job: str, payload: dict[str, Any], dedup_key: str = None, dedup_ttl: int = None) -> bool:
+		"""
+		Постановка задачи в очередь.
+		Возвращает False, если задача с таким ключом дедупликации уже ставилась (в течение dedup_ttl,
+		 по умолчанию - JOBS_DEDUP_TTL).
+		"""
+		if dedup_key is not None:
+			if not await self.redis.set(self._dedup_key(dedup_key), 1, nx=True, ex=dedup_ttl or self.dedup_ttl):
+				return False
+		if self.eager:
+			await self._handlers[job](payload)
+			return True
+		try:
+			await self.redis.xadd(self.stream, {
+				"job": job, "payload": json.dumps(payload), "attempt": 0, "dedup_key": dedup_key or ""
+			})
+		except Exception:
+			if dedup_key is not None:  # иначе задачу нельзя было бы поставить до истечения ключа
+				await self.redis.delete(self._dedup_key(dedup_key))
+			raise
+		return True
+
+	async def schedule(self, job: str, payload: dict[str, Any], interval: int) -> None:
+		"""
+		Периодическая постановка задачи в очередь раз в interval секунд (останавливается отменой корутины).
+
+		Планировщик запускается в каждом воркере, но ключ дедупликации по номеру интервала
+		 не дает поставить задачу больше одного раза за интервал.
+		"""
+		while True:
+			try:
+				bucket = int(time.time() // interval)
+				await self.enqueue(job, payload, dedup_key=f"schedule:{job}:{bucket}", dedup_ttl=interval)
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				logger.exception(f"Can't schedule job '{job}'")
+			await asyncio.sleep(interval - time.time() % interval)
+
+	async def _ensure_group(self) -> None:
+		try:
+			await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+		except ResponseError as error:
+			if "BUSYGROUP" not in str(error):  # group already exists
+				raise
+
+	async def _process(self, message_id: str, fields: dict[str, str], consumer: str = None) -> None:
+		"""
+		Выполнение задачи: при успехе - подтверждение, при ошибке - повтор или dead-letter.
+		Если передан consumer, аренда задачи продлевается на время выполнения (_heartbeat).
+		"""
+		job, attempt = fields["job"], int(fields["attempt"])
+		handler = self._handlers.get(job)
+		heartbeat = asyncio.create_task(self._heartbeat(message_id, consumer)) if consumer is not None else None
+		try:
+			if handler is None:
+				raise LookupError(f"Job '{job}' has no registered handler")
+			await handler(json.loads(fields["payload"]))
+		except Exception:
+			logger.exception(f"Job '{job}' (message ID: {message_id}, attempt {attempt + 1}) failed")
+			await self._fail(message_id, fields)
+			return
+		finally:
+			if heartbeat is not None:
+				heartbeat.cancel()
+		await self._ack(message_id)
+
+	async def _heartbeat(self, message_id: str, consumer: str) -> None:
+		"""
+		Продление аренды выполняемой задачи: XCLAIM JUSTID сбрасывает время простоя сообщения, поэтому
+		 задача, выполняющаяся дольше claim_idle_ms, не забирается другими воркерами (_claim_stale).
+		"""
+		while True:
+			await asyncio.sleep(self.claim_idle_ms / 1000 / 3)
+			try:
+				await self.redis.xclaim(
+					self.stream, self.group, consumer, min_idle_time=0, message_ids=[message_id], justid=True
+				)
+			except Exception:
+				logger.exception(f"Can't renew the lease of job message ID {message_id}")
+
+	async def _ack(self, message_id: str) -> None:
+		await self.redis.xack(self.stream, self.group, message_id)
+		await self.redis.xdel(self.stream, message_id)
+
+	async def _fail(self, message_id: str, fields: dict[str, str]) -> None:
+		"""
+		Неудачная попытка: отложенный повтор (JOBS_RETRY_BACKOFF * 2 ** attempt секунд) или dead-letter,
+		 если попытки кончились. Сообщение подтверждается - повтор ставится новым сообщением.
+		"""
+		attempt = int(fields["attempt"])
+		if attempt + 1 < self.max_retries:
+			retry = json.dumps({"id": message_id, "fields": {**fields, "attempt": attempt + 1}})
+			await self.redis.zadd(self.retry_key, {retry: time.time() + self.retry_backoff * 2 ** attempt})
+		else:
+			await self.redis.xadd(self.dead_letter_stream, fields)
+			if fields["dedup_key"]:  # задачу можно будет поставить заново
+				await self.redis.delete(self._dedup_key(fields["dedup_key"]))
+		await self._ack(message_id)
+
+	async def _enqueue_due_retries(self) -> int:
+		"""
+		Перенос в стрим повторов, срок которых наступил. Повтор забирает тот воркер, которому удалось его удалить
+		 из sorted set - поэтому он ставится один раз.
+		"""
+		retries = await self.redis.zrangebyscore(self.retry_key, "-inf", time.time())
+		enqueued = 0
+		for retry in retries:
+			if await self.redis.zrem(self.retry_key, retry):
+				await self.redis.xadd(self.stream, json.loads(retry)["fields"])
+				enqueued += 1
+		return enqueued
+
+	async def _claim_stale(self, consumer: str, count: int) -> int:
+		"""
+		Задачи упавшего или зависшего воркера (не подтверждены дольше claim_idle_ms). Такая доставка
+		 считается неудачной попыткой: иначе задача, которая роняет воркер, перезапускалась бы бесконечно,
+		 не доходя до dead-letter.
+		"""
+		_, messages, *_ = await self.redis.xautoclaim(
+			self.stream, self.group, consumer, min_idle_time=self.claim_idle_ms, count=count
+		)
+		for message_id, fields in messages:
+			if not fields:  # сообщение уже удалено из стрима
+				await self.redis.xack(self.stream, self.group, message_id)
+				continue
+			logger.warning(f"Job '{fields['job']}' (message ID: {message_id}) was not completed by crashed worker")
+			await self._fail(message_id, fields)
+		return len(messages)
+
+	async def _read(self, consumer: str, count: int, block: Optional[int] = 5000) -> list[tuple[str, dict[str, str]]]:
+		response = await self.redis.xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=block)
+		return [message for _, stream_messages in response for message in stream_messages]
+
+	async def run_worker(self, consumer: str, concurrency: int = config.JOBS_WORKER_CONCURRENCY) -> None:
+		"""
+		Бесконечный цикл воркера (останавливается отменой корутины).
+		Задачи выполняются пачками до concurrency штук одновременно.
+		"""
+		await self._ensure_group()
+		logger.info(f"Jobs worker '{consumer}' was started")
+		last_claim = 0.0
+		while True:
+			try:
+				if time.monotonic() - last_claim > self.claim_idle_ms / 1000:
+					last_claim = time.monotonic()
+					await self._claim_stale(consumer, concurrency)
+				await self._enqueue_due_retries()
+				messages = await self._read(consumer, concurrency)
+				await asyncio.gather(*(self._process(message_id, fields, consumer) for message_id, fields in messages))
+			except asyncio.CancelledError:
+				logger.info(f"Jobs worker '{consumer}' was stopped")
+				raise
+			except Exception:
+				logger.exception(f"Jobs worker '{consumer}' error")
+				await asyncio.sleep(1)
+
+
+job_queue = JobQueue()
@@ -1,12 +1,18 @@
-from fastapi import FastAPI, APIRouter, status
+import asyncio
+
+from fastapi import FastAPI, APIRouter, Request, status
 from fastapi.responses import RedirectResponse
 from loguru import logger
 
 import config
 from config import LOGGING_PARAMS
-from .routers import users, auth, notes, day_ratings, polling
-from . import fastapi_cache_init, init_db_strings, check_connections
-from .database import async_session_maker
+from .routers import users, auth, notes, day_ratings, polling, cache, imports, analytics
+from . import cache_init, init_db_strings, check_connections, event_bus_init, run_jobs_worker, \
+	partitions_init
+from .database import async_session_maker, engine, replica_engine, stick_to_primary
+from .dependencies import get_token_subject
+from .events import event_bus
+from .middleware import CompressionMiddleware
 from .static import app_description
 
 
@@ -15,7 +21,6 @@ app = FastAPI(
 	openapi_url=config.OPENAPI_URL,
 	docs_url=config.API_DOCS_URL,
 	redoc_url=None,
-	description=app_description(),
 	summary="Note your life easy!",
 	version="0.0.1",
 	contact={
@@ -26,10 +31,39 @@ app = FastAPI(
 )
 
 api_router = APIRouter(prefix="/api/v1")
-for r in (users, auth, notes, day_ratings, polling):
+for r in (users, auth, notes, day_ratings, polling, cache, imports, analytics):
 	api_router.include_router(r.router)
 
 app.include_router(api_router)
+app.add_middleware(CompressionMiddleware)
+
+
+def openapi() -> dict:
+	"""
+	OpenAPI-схема строится при первом запросе документации - тогда же читается описание приложения.
+	"""
+	if app.openapi_schema is None:
+		app.description = app_description()
+	return FastAPI.openapi(app)
+
+
+app.openapi = openapi
+
+
+@app.middleware("http")
+async def stick_to_primary_after_write(request: Request, call_next):
+	"""
+	Read-your-writes для реплики БД: после успешного изменяющего запроса пользователя его GET-запросы
+	 какое-то время читают из основной БД (см. dependencies.get_async_read_session).
+	Без реплики ничего не делает.
+	"""
+	response = await call_next(request)
+	if replica_engine is not None and request.method not in ("GET", "HEAD", "OPTIONS") \
+		and response.status_code < 400:
+		subject = get_token_subject(request)
+		if subject is not None:
+			await stick_to_primary(subject)
+	return response
 
 
 @app.on_event("startup")
@@ -40,8 +74,12 @@ async def startup():
 	logger.add(**LOGGING_PARAMS)
 	logger.info("Starting server")
 	await check_connections()
-	await fastapi_cache_init()
+	await cache_init(async_session_maker)
+	await partitions_init(engine)
 	await init_db_strings(async_session_maker)
+	await event_bus_init()
+	if config.JOBS_WORKER_IN_APP is True:
+		app.state.jobs_worker = asyncio.create_task(run_jobs_worker(async_session_maker))
 
 
 @app.on_event("shutdown")
@@ -50,6 +88,9 @@ async def shutdown():
 	Действия при отключении сервера.
 	"""
 	logger.info("Stopping server")
+	await event_bus.stop()
+	if hasattr(app.state, "jobs_worker"):
+		app.state.jobs_worker.cancel()
 
 
 @app.get("/docs")
@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+
+try:
+	import brotli  # optional dependency: without it only gzip is used
+except ImportError:
+	brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = ("application/json", "text/")
+
+
+class CompressionMiddleware:
+	"""
+	Сжатие ответов (brotli, если он установлен и поддерживается клиентом, иначе gzip).
+
+	- Ответы меньше minimum_size байт не сжимаются (выигрыш меньше затрат);
+	- Сжатые тела кэшируются (LRU в памяти воркера) по ETag ответа (или хэшу тела) и кодировке:
+	 повторная отдача того же закэшированного ответа не сжимает его заново;
+	- Потоковые ответы (из нескольких частей) и уже сжатые ответы отдаются как есть.
+	"""
+	def __init__(
+		self,
+		app: ASGIApp,
+		minimum_size: int = config.COMPRESSION_MINIMUM_SIZE,
+		gzip_level: int = config.COMPRESSION_GZIP_LEVEL,
+		brotli_quality: int = config.COMPRESSION_BROTLI_QUALITY,
+		cache_size: int = config.COMPRESSION_CACHE_SIZE
+	):
+		self.app = app
+		self.minimum_size = minimum_size
+		self.gzip_level = gzip_level
+		self.brotli_quality = brotli_quality
+		self.cache_size = cache_size
+		self._cache: OrderedDict[tuple[str, str], bytes] = OrderedDict()
+
+	@staticmethod
+	def choose_encoding(accept_encoding: str) -> Optional[str]:
+		"""
+		Кодировка по заголовку Accept-Encoding (кодировки с q=0 клиент не принимает).
+		"""
+		accepted = set()
+		for item in accept_encoding.split(","):
+			encoding, *params = (part.strip() for part in item.split(";"))
+			quality = next(
+				(param.split("=", 1)[1] for param in params if param.replace(" ", "").startswith("q=")), "1"
+			)
+			try:
+				if float(quality) > 0:
+					accepted.add(encoding.lower())
+			except ValueError:
+				continue
+		if brotli is not None and "br" in accepted:
+			return "br"
+		if "gzip" in accepted or "*" in accepted:
+			return "gzip"
+
+	def compress(self, body: bytes, encoding: str, etag: Optional[str]) -> bytes:
+		key = (etag or hashlib.blake2b(body, digest_size=16).hexdigest(), encoding)
+		compressed = self._cache.get(key)
+		if compressed is not None:
+			self._cache.move_to_end(key)
+			return compressed
+		if encoding == "br":
+			compressed = brotli.compress(body, quality=self.brotli_quality)
+		else:
+			compressed = gzip.compress(body, compresslevel=self.gzip_level)
+		self._cache[key] = compressed
+		if len(self._cache) > self.cache_size:
+			self._cache.popitem(last=False)
+		return compressed
+
+	async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+		if scope["type"] != "http":
+			return await self.app(scope, receive, send)
+		encoding = self.choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+		if encoding is None:
+			return await self.app(scope, receive, send)
+
+		start_message: Optional[Message] = None
+
+		async def send_compressed(message: Message) -> None:
+			nonlocal start_message
+			if message["type"] == "http.response.start":
+				start_message = message  # заголовки отправляются вместе с телом, когда известен его размер
+				return
+			if message["type"] != "http.response.body" or start_message is None:
+				return await send(message)
+
+			body, headers = message.get("body", b""), MutableHeaders(raw=start_message["headers"])
+			if message.get("more_body", False) or len(body) < self.minimum_size or "Content-Encoding" in headers \
+				or not headers.get("Content-Type", "").startswith(COMPRESSIBLE_CONTENT_TYPES):
+				await send(start_message)
+				start_message = None
+				return await send(message)
+
+			body = self.compress(body, encoding, headers.get("ETag"))
+			headers["Content-Encoding"] = encoding
+			headers["Content-Length"] = str(len(body))
+			headers.add_vary_header("Accept-Encoding")
+			await send(start_message)
+			start_message = None
+			await send({"type": "http.response.body", "body": body})
+
+		await self.app(scope, receive, send_compressed)
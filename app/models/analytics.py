@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Boolean, Date, DateTime, ForeignKey, Index, PrimaryKeyConstraint
+from sqlalchemy.sql import func
+
+from ..database import Base
+
+ACTIVITY_METRICS = ("notes", "tasks", "tasks_completed", "rated", "polls", "polls_completed")
+
+
+class UserActivityDaily(Base):
+	"""
+	Сводка активности пользователя за день (для аналитики стафф-пользователей).
+
+	Строки пересчитываются из "notes", "day_ratings" и "polling" по событиям изменений
+	 (см. crud.crud_analytics) - отчеты строятся по этой таблице, без сканирования исходных.
+	"""
+	__tablename__ = "user_activity_daily"
+	__table_args__ = (
+		PrimaryKeyConstraint("user_id", "date", name="user_activity_daily_pkey"),
+		# covering index: reports by period are index-only scans
+		Index("ix_user_activity_daily_date", "date", postgresql_include=["user_id", *ACTIVITY_METRICS]),
+	)
+
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"))
+	date = Column(Date)
+	notes = Column(Integer, default=0)  # standard notes of the day
+	tasks = Column(Integer, default=0)
+	tasks_completed = Column(Integer, default=0)
+	rated = Column(Boolean, default=False)  # day rating exists
+	polls = Column(Integer, default=0)
+	polls_completed = Column(Integer, default=0)
+	updated_at = Column(DateTime(timezone=True), server_default=func.now())
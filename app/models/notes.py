@@ -2,9 +2,11 @@ import datetime
 from datetime import date
 from typing import Any
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Enum, Boolean, DateTime
-from sqlalchemy import select
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Enum, Boolean, DateTime, Computed, Index
+from sqlalchemy import select, exists
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import deferred
 
 from ..database import Base
 from ..schemas import GetNotesParams
@@ -19,20 +21,33 @@ note_type_enum = Enum(
 	validate_strings=True
 )  # enum type for DB
 
+# full-text search config for notes text ("simple" - without stemming, notes are written in different languages)
+NOTES_SEARCH_CONFIG = "simple"
+
 
 class Note(Base):
 	"""
 	Модель заметки.
 	"""
 	__tablename__ = "notes"
-
-	id = Column(Integer, primary_key=True, index=True)
+	__table_args__ = (
+		Index("ix_notes_text_search", "text_search", postgresql_using="gin"),
+		Index("ix_notes_text_trgm", "text", postgresql_using="gin", postgresql_ops={"text": "gin_trgm_ops"}),
+		Index("ix_notes_user_id_date", "user_id", "date"),  # user's day notes (also activity rollups refreshing)
+		{"postgresql_partition_by": "RANGE (date)"}  # monthly partitions, see app.partitions
+	)
+
+	id = Column(Integer, primary_key=True, autoincrement=True, index=True)
 	note_type = Column(note_type_enum)
 	text = Column(String(length=1000))
-	date = Column(Date)
+	date = Column(Date, primary_key=True)  # partition key must be a part of primary key
 	created_at = Column(DateTime(timezone=True))
 	completed = Column(Boolean, nullable=True)  # it's null if note type is std note
 	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"))
+	text_search = deferred(Column(
+		TSVECTOR,
+		Computed(f"to_tsvector('{NOTES_SEARCH_CONFIG}', coalesce(text, ''))", persisted=True)
+	))  # generated by DB, it's not loading by default
 
 	@staticmethod
 	async def handle_get_params(notes_list: list[dict], params: GetNotesParams, db: AsyncSession):
@@ -77,7 +92,7 @@ class Note(Base):
 		return list(notes_list)
 
 	@staticmethod
-	async def get_user_notes(user: schemas.User,
+	async def get_user_notes(user_id: int,
 							 db: AsyncSession,
 							 notes_date: datetime = None,
 							 notes_type: str = NoteTypeEnumDB.note.value) -> \
@@ -94,7 +109,7 @@ class Note(Base):
 		if notes_date is None:
 			notes_date = datetime.date.today()
 		query = select(Note).where(
-			(Note.user_id == user.id) &
+			(Note.user_id == user_id) &
 			(Note.date == notes_date) &
 			(Note.note_type == notes_type)
 		)
@@ -103,3 +118,22 @@ class Note(Base):
 		notes = list(result.scalars().all())
 
 		return sa_objects_dicts_list(notes)
+
+	@staticmethod
+	async def check_user_day_notes(user_id: int, db: AsyncSession, notes_date: datetime.date = None) -> \
+		tuple[bool, bool]:
+		"""
+		Проверяет одним запросом, есть ли у пользователя заметки и задачи в указанный день
+		 (по умолчанию - текущий). Возвращает (есть ли заметки, есть ли задачи).
+		"""
+		if notes_date is None:
+			notes_date = datetime.date.today()
+		user_day_notes = (Note.user_id == user_id) & (Note.date == notes_date)
+		query = select(
+			exists().where(user_day_notes & (Note.note_type == NoteTypeEnumDB.note)),
+			exists().where(user_day_notes & (Note.note_type == NoteTypeEnumDB.task))
+		)
+		result = await db.execute(query)
+		notes_exists, tasks_exists = result.one()
+
+		return notes_exists, tasks_exists
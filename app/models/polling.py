@@ -1,11 +1,8 @@
 from ..database import Base
-from sqlalchemy import Column, Integer, Boolean, DateTime, Enum, ForeignKey, select, Date, String
+from sqlalchemy import Column, Integer, Boolean, DateTime, Enum, ForeignKey, select, Date, String, UniqueConstraint, Index
 from ..static.enums import PollingTypeEnum
 from sqlalchemy.sql import func
-from .. import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
-import datetime
-import random
 from typing import Any
 from ..utils import sa_objects_dicts_list
 
@@ -22,37 +19,29 @@ class Polling(Base):
 	"""
 	Таблица для создания и хранения опросов для пользователя.
 
-	Формируются посредством BackgroundTasks (fastapi).
+	Формируются обработчиком события "user.activity" шины событий (app.events, app.tasks).
 
 	Делать pydantic-форму не стал - не необходимо, избыточно.
 	"""
 	__tablename__ = "polling"
-
-	id = Column(Integer, primary_key=True, index=True)
-	created_at = Column(Date, server_default=func.current_date())
+	__table_args__ = (
+		UniqueConstraint("user_id", "created_at", name="user_date_polling_unique"),  # one poll per day
+		# covering index: per-day polling stats are index-only scans (see crud_polling.get_polling_days_stats)
+		Index(
+			"ix_polling_created_at_stats", "created_at",
+			postgresql_include=["poll_type", "polling_string_id", "completed", "completed_at"]
+		),
+		{"postgresql_partition_by": "RANGE (created_at)"}  # monthly partitions, see app.partitions
+	)
+
+	id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+	created_at = Column(Date, primary_key=True, server_default=func.current_date())  # partition key
 	poll_type = Column(polling_type_enum)
 	polling_string_id = Column(Integer, ForeignKey("polling_strings.id", onupdate="CASCADE", ondelete="RESTRICT"))
 	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"))
 	completed = Column(Boolean, default=False)
 	completed_at = Column(DateTime(timezone=True), nullable=True, default=None, onupdate=func.now())
 
-	@staticmethod
-	async def check_today_user_polls(user: schemas.User, db: AsyncSession) -> bool:
-		"""
-		Проверяет, сформирован ли уже опрос на текущий день для пользователя.
-		"""
-		query = select(Polling).where(
-			(Polling.user_id == user.id) &
-			(Polling.created_at == datetime.date.today())
-		)
-		result = await db.execute(query)
-
-		today_polls = result.scalars().all()
-
-		if not any(today_polls):
-			return False
-		return True
-
 
 class PollingString(Base):
 	"""
@@ -64,19 +53,6 @@ class PollingString(Base):
 	poll_type = Column(polling_type_enum)
 	text = Column(String)
 
-	@staticmethod
-	async def get_random_poll_text_id(polling_type: PollingTypeEnum, db: AsyncSession) -> int:
-		"""
-		Возвращает случайный опрос по указанному типу опроса.
-		"""
-		query = select(PollingString).where(
-			PollingString.poll_type == polling_type
-		)
-		result = await db.execute(query)
-		strings = result.scalars().all()
-
-		return random.choice(strings).id
-
 	@staticmethod
 	async def get_polling_type_strings(polling_type: PollingTypeEnum, db: AsyncSession) -> list[dict[str, Any]]:
 		"""
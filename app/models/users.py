@@ -1,6 +1,6 @@
 from typing import Optional, Any
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, select
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Index, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas, utils
@@ -14,6 +14,13 @@ class User(Base):
 	TODO: добавить поле ТГ-аккаунта, если буду интегрировать поддержку ТГ
 	"""
 	__tablename__ = "users"
+	__table_args__ = (  # trigram indexes for fuzzy search and autocomplete
+		Index("ix_users_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+		Index("ix_users_first_name_trgm", "first_name", postgresql_using="gin",
+			  postgresql_ops={"first_name": "gin_trgm_ops"}),
+		Index("ix_users_last_name_trgm", "last_name", postgresql_using="gin",
+			  postgresql_ops={"last_name": "gin_trgm_ops"}),
+	)
 
 	id = Column(Integer, primary_key=True, index=True)
 	email = Column(String(length=50), unique=True, index=True)
@@ -0,0 +1,204 @@
+import datetime
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import config
+from .database import Base
+from .models import notes, polling  # partitioned tables must be registered in Base.metadata
+
+# partitioned by month tables and their partition keys
+PARTITIONED_TABLES = {
+	"notes": "date",
+	"polling": "created_at"
+}
+
+PARTITIONS_LOCK_KEY = "eztask-partitions"  # advisory lock: workers don't run maintenance concurrently
+
+
+def month_start(date: datetime.date, months_shift: int = 0) -> datetime.date:
+	"""
+	Первый день месяца переданной даты (со сдвигом на months_shift месяцев).
+	"""
+	month_index = date.year * 12 + date.month - 1 + months_shift
+	return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+	return f"{table}_{month:%Y_%m}"
+
+
+def default_partition_name(table: str) -> str:
+	return f"{table}_default"
+
+
+def partition_month(table: str, name: str) -> Optional[datetime.date]:
+	"""
+	Месяц партиции по ее имени (None - если это не месячная партиция).
+	"""
+	try:
+		return datetime.datetime.strptime(name.removeprefix(f"{table}_"), "%Y_%m").date()
+	except ValueError:
+		return
+
+
+async def get_partitions(conn: AsyncConnection, table: str) -> list[str]:
+	result = await conn.execute(
+		text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+			 "WHERE i.inhparent = CAST(:table AS regclass)"),
+		{"table": table}
+	)
+	return list(result.scalars().all())
+
+
+async def create_month_partition(conn: AsyncConnection, table: str, month: datetime.date) -> None:
+	"""
+	Создание партиции таблицы на месяц.
+
+	Если строки этого месяца уже попали в DEFAULT-партицию, партицию так создать нельзя:
+	 DEFAULT-партиция временно отсоединяется, строки переносятся в новую партицию.
+	"""
+	key = PARTITIONED_TABLES[table]
+	name, default_name = partition_name(table, month), default_partition_name(table)
+	bounds = {"start": month, "end": month_start(month, 1)}
+	create_query = text(
+		f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+		f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+	)
+
+	rows_in_default = await conn.execute(
+		text(f"SELECT EXISTS (SELECT 1 FROM {default_name} WHERE {key} >= :start AND {key} < :end)"), bounds
+	)
+	if not rows_in_default.scalar():
+		await conn.execute(create_query)
+		return
+
+	columns = ", ".join(c.name for c in Base.metadata.tables[table].columns if c.computed is None)
+	await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default_name}"))
+	await conn.execute(create_query)
+	await conn.execute(text(
+		f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {default_name} "
+		f"WHERE {key} >= :start AND {key} < :end"
+	), bounds)
+	await conn.execute(text(f"DELETE FROM {default_name} WHERE {key} >= :start AND {key} < :end"), bounds)
+	await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default_name} DEFAULT"))
+	logger.info(f"Rows of {month:%Y-%m} were moved from '{default_name}' to the new partition '{name}'")
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int = config.PARTITIONS_MONTHS_AHEAD) -> None:
+	"""
+	Создание DEFAULT-партиций и партиций на текущий и months_ahead следующих месяцев, если их еще нет.
+
+	Также создаются партиции всех месяцев, строки которых лежат в DEFAULT-партиции (перенесенные
+	 из старой таблицы, импортированные за прошлые даты): иначе на них не действуют отсечение партиций
+	 и политика хранения (detach_old_partitions).
+	"""
+	current_month = month_start(datetime.date.today())
+	for table in PARTITIONED_TABLES:
+		key, default_name = PARTITIONED_TABLES[table], default_partition_name(table)
+		await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default_name} PARTITION OF {table} DEFAULT"))
+		partitions = await get_partitions(conn, table)
+		months = {month_start(current_month, shift) for shift in range(months_ahead + 1)}
+
+		default_range = await conn.execute(text(f"SELECT min({key}), max({key}) FROM {default_name}"))
+		date_from, date_to = default_range.one()
+		if date_from is not None:
+			month = month_start(date_from)
+			while month <= date_to:
+				months.add(month)
+				month = month_start(month, 1)
+
+		for month in sorted(months):
+			if partition_name(table, month) not in partitions:
+				await create_month_partition(conn, table, month)
+				logger.info(f"Partition '{partition_name(table, month)}' was successfully created")
+
+
+async def detach_old_partitions(
+	conn: AsyncConnection,
+	retention_months: Optional[int] = config.PARTITIONS_RETENTION_MONTHS,
+	archive_schema: Optional[str] = config.PARTITIONS_ARCHIVE_SCHEMA
+) -> list[str]:
+	"""
+	Политика хранения: партиции старше retention_months месяцев отсоединяются от таблиц
+	 (и переносятся в схему archive_schema, если она указана). Данные не удаляются.
+	Если retention_months не указан - ничего не делается.
+
+	:return: Возвращает список отсоединенных партиций.
+	"""
+	if retention_months is None:
+		return []
+	oldest_month = month_start(datetime.date.today(), -retention_months)
+	if archive_schema is not None:
+		await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+	detached = []
+	for table in PARTITIONED_TABLES:
+		for name in await get_partitions(conn, table):
+			month = partition_month(table, name)
+			if month is None or month >= oldest_month:
+				continue
+			await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+			if archive_schema is not None:
+				await conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+			detached.append(name)
+			logger.info(f"Partition '{name}' was detached by retention policy")
+	return detached
+
+
+async def partition_legacy_table(conn: AsyncConnection, table: str) -> bool:
+	"""
+	Перевод существующей (созданной до партиционирования) таблицы в партиционированную.
+
+	Миграции в проекте генерируются автоматически (config.ALEMBIC_MIGRATION_CMDS), а автогенерация alembic
+	 не умеет менять обычную таблицу на партиционированную. Поэтому старая таблица переименовывается,
+	 по модели создается новая (с DEFAULT-партицией, в которую переливаются данные), старая - удаляется.
+	Месячные партиции затем создает ensure_partitions (строки переносятся из DEFAULT-партиции).
+
+	:return: Возвращает True, если таблица была переведена.
+	"""
+	relkind = await conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table})
+	if relkind.scalar() != "r":  # таблицы нет (ее создаст create_all/alembic) или она уже партиционирована
+		return False
+	legacy_table, key = f"{table}_legacy", PARTITIONED_TABLES[table]
+
+	await conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy_table}"))
+	indexes = await conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :table"), {"table": legacy_table})
+	for index in indexes.scalars().all():  # имена индексов (и ограничений) нужны новой таблице
+		await conn.execute(text(f"ALTER INDEX {index} RENAME TO {index}_legacy"))
+	sequence = await conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy_table})
+	sequence = sequence.scalar()
+	if sequence is not None:
+		await conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {sequence.split('.')[-1]}_legacy"))
+
+	await conn.run_sync(Base.metadata.tables[table].create, checkfirst=True)
+	await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {table} DEFAULT"))
+
+	legacy_columns = await conn.execute(
+		text("SELECT column_name FROM information_schema.columns WHERE table_name = :table"), {"table": legacy_table}
+	)
+	legacy_columns = set(legacy_columns.scalars().all())
+	columns = [c.name for c in Base.metadata.tables[table].columns if c.computed is None and c.name in legacy_columns]
+	values = [f"coalesce({c}, CURRENT_DATE)" if c == key else c for c in columns]
+	await conn.execute(text(
+		f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {legacy_table}"
+	))
+	await conn.execute(text(
+		f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+	))
+	await conn.execute(text(f"DROP TABLE {legacy_table}"))  # последовательность удаляется вместе с таблицей
+	logger.info(f"Table '{table}' was successfully converted to partitioned table")
+	return True
+
+
+async def maintain_partitions(conn: AsyncConnection) -> None:
+	"""
+	Обслуживание партиций: перевод старых таблиц, создание будущих партиций и отсоединение старых.
+	Запускается при старте сервера и периодически воркером очереди задач (app.jobs).
+	"""
+	await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": PARTITIONS_LOCK_KEY})
+	for table in PARTITIONED_TABLES:
+		await partition_legacy_table(conn, table)
+	await ensure_partitions(conn)
+	await detach_old_partitions(conn)
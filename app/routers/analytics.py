@@ -0,0 +1,63 @@
+import datetime
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas
+from ..crud.crud_analytics import get_activity_stats
+from ..dependencies import get_current_active_user, get_async_read_session
+from ..exceptions import PermissionsError
+from ..jobs import job_queue
+from ..static.enums import AnalyticsPeriodEnum
+from ..uow import UnitOfWorkRoute
+from . import config
+
+router = APIRouter(
+	prefix="/analytics",
+	tags=["analytics"],
+	route_class=UnitOfWorkRoute
+)
+
+
+@router.get("/activity", response_model=list[schemas.ActivityStats])
+async def read_activity_stats(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	period: AnalyticsPeriodEnum = AnalyticsPeriodEnum.day,
+	date_from: Annotated[datetime.date, Query(description="Default - 30 days ago")] = None,
+	date_to: Annotated[datetime.date, Query(description="Default - today")] = None,
+	user_id: Annotated[int, Query(ge=1, description="Activity of one user")] = None
+):
+	"""
+	Активность пользователей по дням, неделям или месяцам: активные пользователи, заметки и задачи
+	 (доля выполненных), оценки дня, опросы (доля пройденных). Периоды без активности не возвращаются.
+
+	Отчет строится по сводкам активности (user_activity_daily), которые обновляются фоновой задачей
+	 раз в минуту (config.ANALYTICS_REFRESH_INTERVAL) - последние изменения видны с этой задержкой.
+	Доступно только для is_staff пользователей.
+	"""
+	if not current_user.is_staff:
+		raise PermissionsError()
+	date_to = date_to or datetime.date.today()
+	date_from = date_from or date_to - datetime.timedelta(days=config.ANALYTICS_DAYS_DEFAULT)
+	if date_from > date_to:
+		raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="date_from is after date_to")
+	return await get_activity_stats(period, date_from, date_to, db=db, user_id=user_id)
+
+
+@router.post("/activity/rebuild", status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_activity_stats(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	days: Annotated[int, Query(ge=1, le=3660)] = config.ANALYTICS_REBUILD_DAYS
+) -> dict[str, Any]:
+	"""
+	Постановка в очередь задачи полного пересчета сводок активности за последние days дней
+	 (например, после ручных изменений данных в БД).
+	Доступно только для is_staff пользователей.
+	"""
+	if not current_user.is_staff:
+		raise PermissionsError()
+	date_from = datetime.date.today() - datetime.timedelta(days=days)
+	await job_queue.enqueue("analytics.rebuild", {"date_from": date_from.isoformat()})
+	return {"date_from": date_from}
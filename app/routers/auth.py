@@ -10,10 +10,12 @@ from .. import utils
 from ..dependencies import get_async_session
 from ..exceptions import CredentialsException
 from ..models.users import User
+from ..uow import UnitOfWorkRoute
 
 router = APIRouter(
 	prefix="/token",
-	tags=["auth_token"]
+	tags=["auth_token"],
+	route_class=UnitOfWorkRoute
 )
 
 
@@ -0,0 +1,30 @@
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends
+
+from .. import schemas
+from ..cache import cache
+from ..dependencies import get_current_active_user
+from ..exceptions import PermissionsError
+from ..uow import UnitOfWorkRoute
+
+router = APIRouter(
+	prefix="/cache",
+	tags=["cache"],
+	route_class=UnitOfWorkRoute
+)
+
+
+@router.get("/metrics")
+async def read_cache_metrics(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)]
+) -> dict[str, Any]:
+	"""
+	Метрики кэша эндпоинтов: попадания/промахи и hit rate по уровням (L1 - память воркера, L2 - Redis),
+	 количество объединенных одновременных запросов (single-flight).
+	Метрики считаются в рамках воркера, обработавшего запрос.
+	Доступно только для is_staff пользователей.
+	"""
+	if not current_user.is_staff:
+		raise PermissionsError()
+	return cache.metrics()
@@ -4,3 +4,14 @@
 
 # caching params
 CACHE_EXPIRING_DEFAULT = 30
+
+# fuzzy search (pg_trgm) params
+AUTOCOMPLETE_LIMIT_DEFAULT = 10
+AUTOCOMPLETE_LIMIT_MAX = 50
+AUTOCOMPLETE_THRESHOLD_DEFAULT = 0.3
+
+# staff analytics params
+ANALYTICS_DAYS_DEFAULT = 30  # activity report period if dates aren't passed
+ANALYTICS_REBUILD_DAYS = 365  # rollups rebuilding period by default
+POLLING_STATS_MAX_DAYS = 92  # polling stats are summed up from per-day counters
+POLLING_RANGE_MAX_DAYS = 92  # user polls period for one request
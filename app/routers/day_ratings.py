@@ -1,21 +1,23 @@
 import datetime
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, Body, HTTPException, status
-from fastapi_cache.decorator import cache
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
+from ..cache import cached
 from ..crud import crud_day_ratings
-from ..dependencies import get_async_session
-from ..dependencies import get_current_active_user, get_day_rating, get_day_rating_filters
+from ..dependencies import get_async_session, get_async_read_session
+from ..dependencies import get_current_active_user, get_day_rating, get_day_rating_filters, get_etag
 from ..exceptions import PermissionsError
 from ..models.day_ratings import DayRating
+from ..uow import UnitOfWorkRoute
 from . import config
 
 router = APIRouter(
 	prefix="/day_ratings",
-	tags=["day_ratings"]
+	tags=["day_ratings"],
+	route_class=UnitOfWorkRoute
 )
 
 
@@ -56,7 +58,7 @@ async def create_day_rating(
 @router.get("/", response_model=list[schemas.DayRating])
 async def read_day_ratings(
 	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
 	"""
 	Получение списка всех оценок дня. Доступно только для is_staff-пользователей.
@@ -67,11 +69,12 @@ async def read_day_ratings(
 
 
 @router.get("/me", response_model=list[schemas.DayRating])
-@cache(expire=config.CACHE_EXPIRING_DEFAULT)
+@cached("day_ratings", expire=config.CACHE_EXPIRING_DEFAULT)
 async def read_day_ratings_me(
 	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
 	filtering: Annotated[dict[str, bool], Depends(get_day_rating_filters)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	etag: Annotated[Optional[str], Depends(get_etag("day_ratings"))]
 ):
 	"""
 	Получение пользователем списка оценок дня.
@@ -82,6 +85,8 @@ async def read_day_ratings_me(
 	оценочный параметр ЗАПОЛНЕН (а не равен True).
 
 	Если понадобится, в дальнейшем можно добавить фильтрацию именно по значениям параметров.
+
+	Поддерживается условный запрос (If-None-Match): если оценки не менялись - 304.
 	"""
 	return await crud_day_ratings.get_day_ratings_me(current_user, filtering, db=db)
 
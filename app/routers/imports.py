@@ -0,0 +1,67 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import schemas
+from ..crud import crud_notes, crud_day_ratings
+from ..dependencies import get_async_session, get_import_format, get_import_user_id
+from ..imports import ImportValidationError, iter_records, validate_chunks
+from ..models.day_ratings import DayRating
+from ..uow import UnitOfWorkRoute
+
+router = APIRouter(
+	prefix="/import",
+	tags=["import"],
+	route_class=UnitOfWorkRoute
+)
+
+
+async def check_day_rating(day_rating: schemas.DayRatingImport) -> Optional[str]:
+	if not await DayRating.check_day_rating_params(day_rating):
+		return "Day rating must contains at least one of rating params"
+
+
+@router.post("/notes", response_model=schemas.ImportResult, status_code=status.HTTP_201_CREATED)
+async def import_notes(
+	request: Request,
+	user_id: Annotated[int, Depends(get_import_user_id)],
+	import_format: Annotated[str, Depends(get_import_format)],
+	db: Annotated[AsyncSession, Depends(get_async_session)]
+):
+	"""
+	Импорт заметок из файла (например, при переходе из другого сервиса) - тело запроса:
+	- NDJSON (Content-Type: application/x-ndjson): по объекту заметки в строке;
+	- CSV (Content-Type: text/csv): строка заголовка с названиями полей, затем заметки.
+
+	Поля - как при создании заметки (+ "completed" для задач), дата может быть любой, в том числе прошедшей.
+	Файл обрабатывается потоково, пачками. Импорт - "все или ничего": если в файле есть невалидные строки,
+	 ничего не сохраняется, а в ответе (422) - номера строк и ошибки.
+	"""
+	records = iter_records(request.stream(), import_format)
+	try:
+		return await crud_notes.import_notes(validate_chunks(records, schemas.NoteImport), user_id, db=db)
+	except ImportValidationError as e:
+		raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=jsonable_encoder(e.errors))
+
+
+@router.post("/day_ratings", response_model=schemas.ImportResult, status_code=status.HTTP_201_CREATED)
+async def import_day_ratings(
+	request: Request,
+	user_id: Annotated[int, Depends(get_import_user_id)],
+	import_format: Annotated[str, Depends(get_import_format)],
+	db: Annotated[AsyncSession, Depends(get_async_session)]
+):
+	"""
+	Импорт оценок дня из файла (NDJSON или CSV, см. импорт заметок).
+	Дата обязательна, нужен как минимум один bool-параметр оценки.
+	Существующие оценки за те же даты перезаписываются.
+	"""
+	records = iter_records(request.stream(), import_format)
+	try:
+		return await crud_day_ratings.import_day_ratings(
+			validate_chunks(records, schemas.DayRatingImport, check=check_day_rating), user_id, db=db
+		)
+	except ImportValidationError as e:
+		raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=jsonable_encoder(e.errors))
@@ -1,27 +1,29 @@
 from datetime import date
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, Body, HTTPException, status, Query
-from fastapi_cache.decorator import cache
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
+from ..cache import cached
 from ..crud import crud_notes
-from ..dependencies import get_current_active_user, get_note, get_async_session
+from ..dependencies import get_current_active_user, get_note, get_async_session, get_async_read_session, get_etag
 from ..exceptions import PermissionsError
 from ..static import enums
+from ..uow import UnitOfWorkRoute
 from . import config
 
 router = APIRouter(
 	prefix="/notes",
-	tags=["notes"]
+	tags=["notes"],
+	route_class=UnitOfWorkRoute
 )
 
 
 @router.get("/", response_model=list[schemas.Note])
 async def read_notes(
 	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
 	"""
 	Получение списка всех заметок.
@@ -53,10 +55,11 @@ async def create_note(
 
 
 @router.get("/me", response_model=list[schemas.Note])
-@cache(expire=config.CACHE_EXPIRING_DEFAULT)
+@cached("notes", expire=config.CACHE_EXPIRING_DEFAULT)
 async def read_notes_me(
 	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
-	db: Annotated[AsyncSession, Depends(get_async_session)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	etag: Annotated[Optional[str], Depends(get_etag("notes"))],
 	sorting: Annotated[enums.NotesOrderByEnum, Query(example="-date")] = None,
 	period: Annotated[enums.NotesPeriodEnum, Query(example="past")] = None,
 	type_: Annotated[enums.NoteTypeEnum, Query(example="task", alias="type")] = None,
@@ -67,12 +70,44 @@ async def read_notes_me(
 	Возможна дополнительная сортировка/фильтрация.
 	По умолчанию возвращаются только сегодняшние/предстоящие заметки
 	 всех типов с сортировкой по дате создания.
+	Поддерживается условный запрос (If-None-Match): если заметки не менялись - 304.
 	"""
 	params = (sorting, period, type_, completed)
 
 	return await crud_notes.get_user_notes(current_user, params, db=db)
 
 
+@router.get("/me/search", response_model=list[schemas.NoteSearchResult])
+async def search_notes_me(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	q: Annotated[str, Query(min_length=1, max_length=200, example="walk")],
+	limit: Annotated[int, Query(ge=1, le=100)] = 20,
+	offset: Annotated[int, Query(ge=0)] = 0
+):
+	"""
+	Полнотекстовый поиск по всем заметкам пользователя.
+	Слова запроса ищутся по префиксу, результаты отсортированы по релевантности.
+	Постраничный вывод - параметры limit/offset.
+	"""
+	return await crud_notes.search_user_notes(current_user, q, limit=limit, offset=offset, db=db)
+
+
+@router.get("/me/autocomplete", response_model=list[schemas.Note])
+async def autocomplete_notes_me(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	q: Annotated[str, Query(min_length=1, max_length=200, example="walkin")],
+	limit: Annotated[int, Query(ge=1, le=config.AUTOCOMPLETE_LIMIT_MAX)] = config.AUTOCOMPLETE_LIMIT_DEFAULT,
+	threshold: Annotated[float, Query(gt=0, le=1)] = config.AUTOCOMPLETE_THRESHOLD_DEFAULT
+):
+	"""
+	Автодополнение по тексту заметок пользователя (нечеткий поиск, допускает опечатки).
+	Threshold - минимальная схожесть запроса со словами заметки (от 0 до 1).
+	"""
+	return await crud_notes.autocomplete_user_notes(current_user, q, limit=limit, threshold=threshold, db=db)
+
+
 @router.get("/{note_id}", response_model=schemas.Note)
 async def read_note(
 	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
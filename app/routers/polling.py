@@ -1,23 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import Annotated
-from ..dependencies import get_user_id, get_async_session, get_polling_id
+from ..dependencies import get_user_id, get_async_session, get_async_read_session, get_polling_id, \
+	get_current_active_user
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..crud.crud_polling import get_user_polling, update_user_polling
+from ..crud.crud_polling import get_user_polling, update_user_polling, get_polling_types_stats, \
+	get_polling_strings_stats, get_user_pollings
+from ..exceptions import PermissionsError
+from ..static.enums import PollingTypeEnum
+from ..uow import UnitOfWorkRoute
+from .. import schemas
+from . import config
+import datetime
 
 
 router = APIRouter(
 	prefix="/polling",
-	tags=["user_polling"]
+	tags=["user_polling"],
+	route_class=UnitOfWorkRoute
 )
 
 
 @router.get("/user/{user_id}")
 async def get_polling(
 	user_id: Annotated[int, Depends(get_user_id)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
 	"""
-	Получение опроса для пользователя на сегодняшний день.
+	Получение опроса для пользователя на сегодняшний день - вместе с текстом вопроса ("text").
 
 	Если нет - код 404.
 	"""
@@ -27,6 +36,32 @@ async def get_polling(
 	raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Polling not found")
 
 
+@router.get("/user/{user_id}/range")
+async def get_pollings_range(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	user_id: Annotated[int, Depends(get_user_id)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	date_from: datetime.date,
+	date_to: Annotated[datetime.date, Query(description="Default - today")] = None
+):
+	"""
+	Получение опросов пользователя за период (включительно) - например, для синхронизации клиента
+	 за месяц одним запросом. В каждом опросе - текст вопроса ("text").
+
+	Период - не больше config.POLLING_RANGE_MAX_DAYS дней.
+	Доступно только самому пользователю и is_staff пользователям.
+	"""
+	if current_user.id != user_id and not current_user.is_staff:
+		raise PermissionsError()
+	date_to = date_to or datetime.date.today()
+	if not 0 <= (date_to - date_from).days < config.POLLING_RANGE_MAX_DAYS:
+		raise HTTPException(
+			status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+			detail=f"Period should be from 1 to {config.POLLING_RANGE_MAX_DAYS} days"
+		)
+	return await get_user_pollings(user_id=user_id, date_from=date_from, date_to=date_to, db=db)
+
+
 @router.put("/{polling_id}")
 async def update_polling(
 	polling_id: Annotated[int, Depends(get_polling_id)],
@@ -42,3 +77,48 @@ async def update_polling(
 	await update_user_polling(polling_id=polling_id, db=db)
 
 	return {"completed": polling_id}
+
+
+async def get_polling_stats_period(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	date_from: Annotated[datetime.date, Query(description="Default - 30 days ago")] = None,
+	date_to: Annotated[datetime.date, Query(description="Default - today")] = None
+) -> tuple[datetime.date, datetime.date]:
+	"""
+	Период статистики опросов (не больше config.POLLING_STATS_MAX_DAYS дней, не позже сегодня).
+	Статистика доступна только для is_staff пользователей.
+	"""
+	if not current_user.is_staff:
+		raise PermissionsError()
+	date_to = min(date_to or datetime.date.today(), datetime.date.today())
+	date_from = date_from or date_to - datetime.timedelta(days=config.ANALYTICS_DAYS_DEFAULT)
+	if not 0 <= (date_to - date_from).days < config.POLLING_STATS_MAX_DAYS:
+		raise HTTPException(
+			status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+			detail=f"Period should be from 1 to {config.POLLING_STATS_MAX_DAYS} days"
+		)
+	return date_from, date_to
+
+
+@router.get("/stats/types", response_model=list[schemas.PollingTypeStats])
+async def read_polling_types_stats(
+	period: Annotated[tuple[datetime.date, datetime.date], Depends(get_polling_stats_period)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)]
+):
+	"""
+	Воронка опросов по типам за период: создано -> пройдено -> пройдено в тот же день.
+	"""
+	return await get_polling_types_stats(*period, db=db)
+
+
+@router.get("/stats/strings", response_model=list[schemas.PollingStringStats])
+async def read_polling_strings_stats(
+	period: Annotated[tuple[datetime.date, datetime.date], Depends(get_polling_stats_period)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	poll_type: PollingTypeEnum = None
+):
+	"""
+	Воронка опросов по вопросам за период - от менее к более проходимым (например, чтобы
+	 убрать вопросы, на которые не отвечают). Вопросы без опросов за период - в конце.
+	"""
+	return await get_polling_strings_stats(*period, db=db, poll_type=poll_type)
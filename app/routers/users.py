@@ -1,19 +1,22 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Body, HTTPException, status, Depends, BackgroundTasks
+from fastapi import APIRouter, Body, HTTPException, status, Depends, BackgroundTasks, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import schemas
 from ..crud import crud_users
-from ..dependencies import get_async_session
+from ..dependencies import get_async_session, get_async_read_session
 from ..dependencies import get_current_active_user, get_user_id
 from ..exceptions import PermissionsError
 from ..models.users import User
+from ..uow import UnitOfWorkRoute
+from . import config
 
 router = APIRouter(
 	prefix="/users",
-	tags=["users"]
+	tags=["users"],
+	route_class=UnitOfWorkRoute
 )
 
 # TODO: user retrieve by id (not by himself)
@@ -22,7 +25,7 @@ router = APIRouter(
 @router.get("/", response_model=list[schemas.User])
 async def read_users(
 	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
 	"""
 	Получение списка всех пользователей
@@ -32,6 +35,24 @@ async def read_users(
 	raise PermissionsError()
 
 
+@router.get("/search", response_model=list[schemas.User])
+async def search_users(
+	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
+	db: Annotated[AsyncSession, Depends(get_async_read_session)],
+	q: Annotated[str, Query(min_length=1, max_length=50, example="ijoech")],
+	limit: Annotated[int, Query(ge=1, le=config.AUTOCOMPLETE_LIMIT_MAX)] = config.AUTOCOMPLETE_LIMIT_DEFAULT,
+	threshold: Annotated[float, Query(gt=0, le=1)] = config.AUTOCOMPLETE_THRESHOLD_DEFAULT
+):
+	"""
+	Автодополнение (нечеткий поиск) пользователей по email, имени и фамилии.
+	Доступно только для is_staff-пользователей - вместо выгрузки полного списка пользователей.
+	Threshold - минимальная схожесть (от 0 до 1).
+	"""
+	if current_user.is_staff:
+		return await crud_users.search_users(q, limit=limit, threshold=threshold, db=db)
+	raise PermissionsError()
+
+
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
 async def create_user(
 	user: Annotated[schemas.UserCreate, Body(embed=True, title="User params dict key")],
@@ -51,7 +72,7 @@ async def create_user(
 @router.get("/me", response_model=schemas.User)
 async def read_users_me(
 	current_user: Annotated[schemas.User, Depends(get_current_active_user)],
-	db: Annotated[AsyncSession, Depends(get_async_session)]
+	db: Annotated[AsyncSession, Depends(get_async_read_session)]
 ):
 	"""
 	Получение данных аккаунта пользователем после проверки его токена.
@@ -3,10 +3,10 @@ from __future__ import annotations
 import datetime
 from typing import Optional
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, validator
 
 from .static.enums import NoteTypeEnumDB, NotesCompletedEnum, \
-	NotesOrderByEnum, NotesPeriodEnum, NoteTypeEnum
+	NotesOrderByEnum, NotesPeriodEnum, NoteTypeEnum, PollingTypeEnum
 
 
 class Token(BaseModel):
@@ -49,6 +49,23 @@ class NoteCreate(NoteBase):
 	pass
 
 
+class NoteImport(NoteCreate):
+	"""
+	Заметка из импортируемого файла (app.imports): задача может быть уже выполнена.
+	"""
+	completed: Optional[bool] = Field(
+		title="Is task completed?",
+		description="False for tasks by default, always null for standard notes",
+		default=None
+	)
+
+	@validator("completed", always=True)
+	def completed_only_for_tasks(cls, completed, values):
+		if values.get("note_type") != NoteTypeEnumDB.task:
+			return None
+		return completed or False
+
+
 class Note(NoteBase):
 	id: int = Field(ge=1)
 	completed: Optional[bool] = Field(
@@ -61,6 +78,17 @@ class Note(NoteBase):
 		orm_mode = True
 
 
+class NoteSearchResult(Note):
+	rank: float = Field(
+		title="Search relevance",
+		description="Results are sorted by relevance"
+	)
+	headline: str = Field(
+		title="Note text fragment with highlighted matches",
+		example="Needs for <b>walking</b> today"
+	)
+
+
 class NoteUpdate(BaseModel):
 	note_type: Optional[NoteTypeEnumDB] = Field(
 		title="Note type - note/task",
@@ -183,6 +211,12 @@ class DayRatingCreate(DayRatingBase):
 	pass
 
 
+class DayRatingImport(DayRatingCreate):
+	date: datetime.date = Field(
+		description="Date that was rated by user"
+	)
+
+
 class DayRating(DayRatingBase):
 	date: datetime.date = Field(
 		description="Date that was rated by user"
@@ -191,3 +225,39 @@ class DayRating(DayRatingBase):
 
 class DayRatingUpdate(DayRatingBase):
 	pass
+
+
+class ImportResult(BaseModel):
+	received: int = Field(description="Valid records in the file")
+	imported: int = Field(description="Written records (existing notes are skipped, day ratings are overwritten)")
+
+
+class ActivityStats(BaseModel):
+	period_start: datetime.date = Field(description="First day of the period (week starts from Monday)")
+	active_users: int = Field(description="Users who created notes, rated the day or completed a poll")
+	notes: int
+	tasks: int
+	tasks_completed: int
+	tasks_completion_rate: Optional[float] = Field(description="Completed tasks share (null if there are no tasks)")
+	day_ratings: int
+	polls: int
+	polls_completed: int
+	polls_response_rate: Optional[float] = Field(description="Completed polls share (null if there are no polls)")
+
+
+class PollingStats(BaseModel):
+	polls: int = Field(description="Created polls")
+	completed: int
+	completed_same_day: int = Field(description="Polls completed on the day they were created")
+	completion_rate: Optional[float] = Field(description="Completed polls share (null if there are no polls)")
+	same_day_completion_rate: Optional[float]
+
+
+class PollingTypeStats(PollingStats):
+	poll_type: PollingTypeEnum
+
+
+class PollingStringStats(PollingStats):
+	polling_string_id: int
+	poll_type: PollingTypeEnum
+	text: str
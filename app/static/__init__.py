@@ -1,3 +1,10 @@
+import functools
+from pathlib import Path
+
+
+@functools.cache
 def app_description() -> str:
-	with open("app/static/app_description.txt", encoding='utf-8') as f:
-		return f.read()
+	"""
+	Описание приложения для документации. Читается при первом обращении (см. main.openapi), а не при импорте.
+	"""
+	return (Path(__file__).parent / "app_description.txt").read_text(encoding="utf-8")
@@ -46,6 +46,15 @@ class NoteTypeEnumDB(Enum):
 	task = "task"
 
 
+class AnalyticsPeriodEnum(Enum):
+	"""
+	Период группировки аналитики активности пользователей.
+	"""
+	day = "day"
+	week = "week"
+	month = "month"
+
+
 class PollingTypeEnum(Enum):
 	"""
 	Типы рандомных опроса для пользователя.
@@ -1,66 +1,146 @@
-from . import schemas
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models.polling import Polling, PollingString
-from .static.enums import PollingTypeEnum, NoteTypeEnumDB
-import random
+from sqlalchemy.orm import sessionmaker
+import config
 from .models.notes import Note
-from typing import Optional
+from .static.enums import PollingTypeEnum
+from typing import Optional, Any
 from loguru import logger
 import sqlalchemy.exc
-from .crud.crud_polling import create_polling
+from .crud.crud_analytics import mark_activity_dirty, parse_activity_keys, refresh_user_activity, \
+	rebuild_user_activity
+from .crud.crud_polling import create_polling, get_polling_strings_catalog
+from . import database
+from .events import event_bus
+from .jobs import job_queue
+from .partitions import maintain_partitions
+from .uow import UnitOfWork, unit_of_work
+import datetime
+import random
 
 
-def get_random_poll_type() -> PollingTypeEnum:
+async def initialize_user_polls(user_id: int, db: AsyncSession) -> None:
 	"""
-	Возвращает рандомный тип опроса для пользователя.
+	Создает опрос для пользователя на текущий день, если его еще нет.
+	Стафф-пользователи отсекаются еще при публикации события (dependencies.get_current_active_user).
+
+	Предварительная проверка существования опроса не нужна: создание опроса идемпотентно
+	 (см. crud_polling.create_polling).
 	"""
-	return random.choice([e.value for e in PollingTypeEnum])
+	poll = await generate_poll(user_id, db)
+	if poll is None:
+		return
+	poll_string_id, poll_type = poll
+	work = UnitOfWork.of(db)
+	try:
+		async with work.savepoint():  # ошибка не должна оборвать всю транзакцию единицы работы
+			created_poll = await create_polling(
+				db, poll_type=poll_type, polling_string_id=poll_string_id, user_id=user_id
+			)
+	except sqlalchemy.exc.IntegrityError:
+		# если юзер удалился - не создавать опрос
+		return
+
+	if created_poll is not None:
+		logger.info(f"Polling ID {created_poll} for user ID {user_id} was successfully created!")
+		work.publish("polling.created", {
+			"polling_id": created_poll, "user_id": user_id, "date": datetime.date.today().isoformat()
+		})
 
 
-async def initialize_user_polls(user: schemas.User, db: AsyncSession) -> None:
+async def generate_poll(user_id: int, db: AsyncSession) -> Optional[tuple[int, str]]:
 	"""
-	Создает опрос для пользователя на текущий день, если его еще нет.
+	Возвращает ИД и тип случайного опроса (строки) для пользователя.
+	Опросы "note" и "task" выбираются, только если в текущем дне у пользователя есть заметки/задачи -
+	 иначе спрашивать не о чем.
+
+	Доступность типов проверяется одним запросом, опросы берутся из каталога в памяти, а тип -
+	 взвешенным случайным выбором (config.POLLING_TYPES_WEIGHTS). Без повторных попыток.
 	"""
-	if not user.is_staff:
-		polls_exists = await Polling.check_today_user_polls(
-			user=user, db=db
-		)
-		if not polls_exists:
-			while True:
-				random_poll_type = get_random_poll_type()
-				poll_string_id = await generate_poll(random_poll_type, user, db)
-				if poll_string_id is not None:
-					break
-			try:
-				created_poll = await create_polling(
-					db, poll_type=random_poll_type, polling_string_id=poll_string_id, user_id=user.id
-				)
+	catalog = await get_polling_strings_catalog(db)
+	notes_exists, tasks_exists = await Note.check_user_day_notes(user_id=user_id, db=db)
+	unavailable_types = {
+		PollingTypeEnum.note.value: not notes_exists,
+		PollingTypeEnum.task.value: not tasks_exists
+	}
+	poll_types = [
+		poll_type for poll_type in catalog
+		if not unavailable_types.get(poll_type) and config.POLLING_TYPES_WEIGHTS.get(poll_type, 1) > 0
+	]
+	if not any(poll_types):
+		return
+	poll_type = random.choices(
+		poll_types, weights=[config.POLLING_TYPES_WEIGHTS.get(poll_type, 1) for poll_type in poll_types]
+	)[0]
+	return random.choice(catalog[poll_type]), poll_type
+
+
+def register_event_handlers() -> None:
+	"""
+	Подписка фоновых задач на события шины (app.events).
+
+	Активность пользователя ставит в очередь (app.jobs) задачу генерации опроса на текущий день.
+	Ключ дедупликации "poll:{user_id}:{date}" не дает ставить задачу при каждом запросе пользователя.
 
-				print(created_poll)
+	Изменения заметок, оценок дня и опросов отмечают дни пользователя для пересчета сводок аналитики
+	 (пересчитываются пачками периодической задачей "analytics.refresh", а не на каждое изменение).
+	"""
+	async def enqueue_user_polls_job(event: str, payload: dict[str, Any]) -> None:
+		user_id = payload["user_id"]
+		await job_queue.enqueue(
+			"poll.generate", {"user_id": user_id}, dedup_key=f"poll:{user_id}:{datetime.date.today()}"
+		)
 
-				logger.info(f"Polling ID {created_poll} for user ID {user.id} was successfully created!")
+	async def mark_user_activity_dirty(event: str, payload: dict[str, Any]) -> None:
+		dates = payload.get("dates") or [payload.get("date") or datetime.date.today().isoformat()]
+		if payload.get("previous_date"):
+			dates.append(payload["previous_date"])
+		await mark_activity_dirty(
+			database.redis_client,
+			((payload["user_id"], datetime.date.fromisoformat(date)) for date in dates)
+		)
 
-			except sqlalchemy.exc.IntegrityError:
-				# если юзер удалился - не создавать опрос
-				pass
+	event_bus.subscribe("user.activity", enqueue_user_polls_job)
+	for event in ("note.*", "rating.*", "polling.created", "polling.completed"):
+		event_bus.subscribe(event, mark_user_activity_dirty)
 
 
-async def generate_poll(polling_type: PollingTypeEnum, user: schemas.User, db: AsyncSession) -> Optional[int]:
+def register_job_handlers(sa_session_maker: sessionmaker) -> None:
 	"""
-	Возвращает ИД случайного опроса (строки) в зависимости от типа опроса.
-	Если выпал опрос "note" или "task" - сначала проверяет, есть ли в текущем дне у пользователя задачи/заметки.
-	Если их нет - спрашивать не о чем. В таком случае тип опроса переопределяется.
+	Регистрация обработчиков задач очереди (app.jobs).
+
+	Задачи работают в собственной БД-сессии, а не в сессии запроса: к моменту выполнения
+	 задачи сессия запроса уже закрыта.
+	Sa_session_maker передаю извне, ибо в тестах и в приложении они отличаются.
 	"""
-	match polling_type:
-		case PollingTypeEnum.note.value:
-			user_notes = await Note.get_user_notes(user=user, db=db)
-			if any(user_notes):
-				return await PollingString.get_random_poll_text_id(polling_type, db)
-			return
-		case PollingTypeEnum.task.value:
-			user_tasks = await Note.get_user_notes(user=user, db=db, notes_type=NoteTypeEnumDB.task.value)
-			if any(user_tasks):
-				return await PollingString.get_random_poll_text_id(polling_type, db)
-			return
-		case _:
-			return await PollingString.get_random_poll_text_id(polling_type, db)
+	async def generate_user_polls_job(payload: dict[str, Any]) -> None:
+		async with unit_of_work(sa_session_maker) as work:
+			await initialize_user_polls(user_id=payload["user_id"], db=work.session)
+
+	async def maintain_partitions_job(payload: dict[str, Any]) -> None:
+		async with unit_of_work(sa_session_maker) as work:
+			await maintain_partitions(await work.session.connection())
+
+	async def refresh_activity_job(payload: dict[str, Any]) -> None:
+		# не больше ANALYTICS_REFRESH_MAX_BATCHES пачек: при постоянных изменениях задача иначе не завершилась бы
+		for _ in range(config.ANALYTICS_REFRESH_MAX_BATCHES):
+			members = await database.redis_client.spop(config.ANALYTICS_DIRTY_SET, config.ANALYTICS_REFRESH_BATCH)
+			if not members:
+				break
+			try:
+				async with unit_of_work(sa_session_maker) as work:
+					await refresh_user_activity(parse_activity_keys(members), db=work.session)
+			except Exception:
+				# keys are returned to the set - they will be recomputed by the next job
+				await database.redis_client.sadd(config.ANALYTICS_DIRTY_SET, *members)
+				raise
+
+	async def rebuild_activity_job(payload: dict[str, Any]) -> None:
+		date_from = datetime.date.fromisoformat(payload["date_from"])
+		async with unit_of_work(sa_session_maker) as work:
+			refreshed = await rebuild_user_activity(date_from, db=work.session)
+		logger.info(f"Activity rollups of {refreshed} user days since {date_from} were successfully rebuilt")
+
+	job_queue.register("poll.generate", generate_user_polls_job)
+	job_queue.register("partitions.maintain", maintain_partitions_job)
+	job_queue.register("analytics.refresh", refresh_activity_job)
+	job_queue.register("analytics.rebuild", rebuild_activity_job)
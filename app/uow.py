@@ -0,0 +1,135 @@
+import contextlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from .events import event_bus
+
+UNIT_OF_WORK_KEY = "unit_of_work"  # key in AsyncSession.info and in request.state
+
+
+class UnitOfWork:
+	"""
+	Единица работы запроса: одна БД-сессия на все зависимости и эндпоинт, кэш загруженных
+	 за запрос объектов (пользователи, заметки, оценки дня) и одна фиксация транзакции в конце запроса
+	 (см. UnitOfWorkRoute).
+
+	Кэш хранит pydantic-объекты по ключу (вид объекта, ключ объекта) - например, пользователь, загруженный
+	 при проверке токена, не запрашивается повторно при обновлении его данных в том же запросе.
+
+	Crud-функции не фиксируют транзакцию сами: это делает владелец единицы работы (маршрут запроса или
+	 контекст unit_of_work) - один раз за все операции. События об изменениях публикуются только после
+	 фиксации (publish), иначе подписчики могли бы не увидеть данных или увидеть откаченные.
+	"""
+	def __init__(self, session: AsyncSession):
+		self.session = session
+		self._identity_map: dict[tuple[str, Hashable], Any] = {}
+		self._after_commit: list[Callable[[], Awaitable[Any]]] = []
+
+	@classmethod
+	def of(cls, session: AsyncSession) -> "UnitOfWork":
+		"""
+		Единица работы сессии (создается при первом обращении и хранится в session.info).
+		"""
+		unit_of_work = session.info.get(UNIT_OF_WORK_KEY)
+		if unit_of_work is None:
+			unit_of_work = session.info[UNIT_OF_WORK_KEY] = cls(session)
+		return unit_of_work
+
+	def get(self, kind: str, key: Hashable) -> Any:
+		return self._identity_map.get((kind, key))
+
+	def put(self, kind: str, key: Hashable, obj: Any) -> Any:
+		self._identity_map[(kind, key)] = obj
+		return obj
+
+	def forget(self, kind: str, key: Hashable) -> None:
+		self._identity_map.pop((kind, key), None)
+
+	async def load(self, kind: str, key: Hashable, loader: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+		"""
+		Объект из кэша запроса или загруженный loader'ом (отсутствующий объект - None - не кэшируется).
+		"""
+		obj = self.get(kind, key)
+		if obj is None:
+			obj = await loader()
+			if obj is not None:
+				self.put(kind, key, obj)
+		return obj
+
+	def after_commit(self, callback: Callable[[], Awaitable[Any]]) -> None:
+		self._after_commit.append(callback)
+
+	def publish(self, event: str, payload: dict[str, Any]) -> None:
+		"""
+		Публикация события шины (app.events) после фиксации транзакции.
+		"""
+		self.after_commit(lambda: event_bus.publish(event, payload))
+
+	async def commit(self) -> None:
+		if self.session.in_transaction():
+			await self.session.commit()
+		callbacks, self._after_commit = self._after_commit, []
+		for callback in callbacks:
+			await callback()
+
+	async def rollback(self) -> None:
+		self._after_commit.clear()
+		self._identity_map.clear()
+		await self.session.rollback()
+
+	@contextlib.asynccontextmanager
+	async def savepoint(self) -> AsyncIterator["UnitOfWork"]:
+		"""
+		Вложенная транзакция (SAVEPOINT): при ошибке внутри блока откатываются только его изменения,
+		 а отложенные в нем события не публикуются. Блоки могут быть вложены друг в друга.
+		"""
+		callbacks_count, identity_map = len(self._after_commit), dict(self._identity_map)
+		try:
+			async with self.session.begin_nested():
+				yield self
+		except BaseException:
+			del self._after_commit[callbacks_count:]
+			self._identity_map = identity_map
+			raise
+
+
+@contextlib.asynccontextmanager
+async def unit_of_work(sa_session_maker: sessionmaker) -> AsyncIterator[UnitOfWork]:
+	"""
+	Единица работы вне запроса (задачи очереди, инициализация при старте): все операции в блоке -
+	 одна транзакция, которая фиксируется при выходе из блока (при ошибке - откатывается).
+	"""
+	async with sa_session_maker() as session:
+		work = UnitOfWork.of(session)
+		yield work
+		await work.commit()
+
+
+def bind_unit_of_work(request: Request, session: AsyncSession) -> None:
+	"""
+	Привязка единицы работы сессии к запросу - для фиксации после эндпоинта (UnitOfWorkRoute).
+	"""
+	setattr(request.state, UNIT_OF_WORK_KEY, UnitOfWork.of(session))
+
+
+class UnitOfWorkRoute(APIRoute):
+	"""
+	Маршрут, фиксирующий транзакцию запроса после выполнения эндпоинта - до отправки ответа.
+	(Код зависимостей после yield выполняется уже после отправки ответа, и ошибку фиксации
+	 клиент бы не увидел.) Если эндпоинт завершился ошибкой, транзакция откатывается при закрытии сессии.
+	"""
+	def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+		route_handler = super().get_route_handler()
+
+		async def unit_of_work_route_handler(request: Request) -> Response:
+			response = await route_handler(request)
+			unit_of_work: Optional[UnitOfWork] = getattr(request.state, UNIT_OF_WORK_KEY, None)
+			if unit_of_work is not None:
+				await unit_of_work.commit()
+			return response
+
+		return unit_of_work_route_handler
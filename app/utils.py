@@ -1,7 +1,10 @@
+import re
 from datetime import timedelta, datetime
 from typing import Any, Sequence
 
 from jose import jwt
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from .database import Base
@@ -71,3 +74,29 @@ def convert_query_enums(params_schema: GetNotesParams, params: tuple[Any, ...])
 
 	return params_schema
 
+
+def make_prefix_tsquery(text: str) -> str:
+	"""
+	Строка поискового запроса для to_tsquery: все слова запроса с поиском по префиксу ("wor" найдет "word").
+	Спецсимволы tsquery удаляются, поэтому пользовательский ввод не ломает запрос.
+	"""
+	words = re.findall(r"\w+", text)
+	return " & ".join(f"{word}:*" for word in words)
+
+
+def escape_like(text: str, escape_char: str = "\\") -> str:
+	"""
+	Экранирование спецсимволов LIKE/ILIKE-шаблона (для поиска по префиксу пользовательского ввода).
+	"""
+	for char in (escape_char, "%", "_"):
+		text = text.replace(char, escape_char + char)
+	return text
+
+
+async def set_trgm_threshold(db: AsyncSession, threshold: float, word_similarity: bool = False) -> None:
+	"""
+	Порог схожести для операторов pg_trgm ("%" / "<%") - только в текущей транзакции.
+	Операторы (в отличие от функции similarity) используют trigram-индексы.
+	"""
+	param = "pg_trgm.word_similarity_threshold" if word_similarity else "pg_trgm.similarity_threshold"
+	await db.execute(select(func.set_config(param, str(threshold), True)))
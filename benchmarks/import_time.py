@@ -0,0 +1,79 @@
+"""
+Профилирование времени импорта приложения (python -X importtime).
+
+Запуск из корня проекта:
+	python benchmarks/import_time.py [--module app.main] [--runs 5] [--top 20]
+
+Каждый прогон - отдельный процесс (холодный импорт, но с готовым байткодом). Выводится медиана
+ общего времени импорта модуля и самые медленные модули - по собственному и накопленному времени.
+Используется для контроля времени запуска воркеров сервера (и сбора тестов) после изменений.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str) -> dict[str, tuple[int, int]]:
+	"""
+	Один прогон: {модуль: (собственное время, накопленное время)} в микросекундах.
+	"""
+	env = dict(os.environ)
+	env.pop("PYTHONDONTWRITEBYTECODE", None)
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", f"import {module}"],
+		cwd=ROOT, env=env, capture_output=True, text=True
+	)
+	if result.returncode != 0:
+		raise RuntimeError(f"Can't import '{module}':\n{result.stderr[-3000:]}")
+	timings = {}
+	for line in result.stderr.splitlines():
+		match = IMPORT_TIME_LINE.match(line)
+		if match is not None:
+			self_us, cumulative_us, _, name = match.groups()
+			timings[name] = (int(self_us), int(cumulative_us))
+	return timings
+
+
+def report(module: str, runs: int, top: int) -> None:
+	measure(module)  # прогрев: компиляция байткода не должна попасть в замеры
+	total, self_times, cumulative_times = [], defaultdict(list), defaultdict(list)
+	for _ in range(runs):
+		timings = measure(module)
+		total.append(timings[module][1])
+		for name, (self_us, cumulative_us) in timings.items():
+			self_times[name].append(self_us)
+			cumulative_times[name].append(cumulative_us)
+
+	print(f"'{module}' import time (median of {runs} runs): {statistics.median(total) / 1000:.1f} ms")
+	for title, times in (("self", self_times), ("cumulative", cumulative_times)):
+		print(f"\nTop {top} modules by {title} time:")
+		medians = sorted(((statistics.median(t), name) for name, t in times.items()), reverse=True)
+		for median_us, name in medians[:top]:
+			print(f"{median_us / 1000:10.1f} ms  {name}")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description="Import time profiling report")
+	parser.add_argument("--module", default="app.main", help="imported module (default: app.main)")
+	parser.add_argument("--runs", type=int, default=5)
+	parser.add_argument("--top", type=int, default=20)
+	args = parser.parse_args()
+
+	try:
+		from dotenv import load_dotenv
+		load_dotenv(ROOT / ".env")  # app settings are needed for importing app modules
+	except ImportError:
+		pass
+	report(args.module, args.runs, args.top)
+
+
+if __name__ == '__main__':
+	main()
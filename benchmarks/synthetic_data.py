@@ -0,0 +1,270 @@
+"""
+Генератор синтетических данных в объемах, близких к продакшену: пользователи, заметки, оценки дня и опросы.
+Данные загружаются напрямую в PostgreSQL через COPY (asyncpg.copy_records_to_table) пачками пользователей -
+ без ORM и HTTP-запросов (для функциональных тестов есть tests.additional.fills).
+
+Запуск из корня проекта (схема БД уже должна быть создана - миграциями или стартом сервера):
+	python benchmarks/synthetic_data.py --users 1000000 [--days 180] [--batch-size 10000] [--seed 1] [--test-db]
+
+Использование как библиотеки (бенчмарки, EXPLAIN-проверки):
+	from benchmarks.synthetic_data import load_synthetic_data
+	async with engine.connect() as conn:
+		await load_synthetic_data(conn, users=10_000, days=90, seed=1)
+
+Распределения (параметры - у каждого пользователя свои, как и в жизни):
+- дата регистрации - равномерно за последние days дней;
+- доля дней, в которые пользователь активен - Beta(2, 5) (в среднем ~30%, у немногих - почти каждый день);
+- заметок за активный день - экспоненциально, со средним по пользователю из логнормального распределения
+ (большинство пишет 1-2 заметки, немногие - десятки); часть заметок - на несколько дней вперед;
+- доля задач среди заметок - Beta(3, 3), доля выполненных прошедших задач - Beta(5, 2);
+- оценка дня - в Beta(1.5, 3) активных дней, каждый вопрос оценки пропускается с вероятностью 20%;
+- опрос - в каждый активный день (как при работе приложения), доля пройденных опросов - Beta(2, 2).
+"""
+import argparse
+import asyncio
+import datetime
+import math
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))  # app modules are imported when running as a script
+try:
+	from dotenv import load_dotenv
+	load_dotenv(ROOT / ".env")  # DB settings are needed for importing config
+except ImportError:
+	pass
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import config
+from app.partitions import PARTITIONED_TABLES, month_start, partition_name, default_partition_name, \
+	get_partitions, create_month_partition
+from app.static.enums import NoteTypeEnumDB
+
+FIRST_NAMES = ("Andrew", "Petr", "Ivan", "Anna", "Maria", "Olga", "Dmitry", "Elena", "Sergey", "Natalia")
+LAST_NAMES = ("Ivanov", "Petrov", "Smirnov", "Kuznetsova", "Popova", "Sokolov", "Lebedeva", None)
+NOTE_WORDS = (
+	"купить", "сделать", "позвонить", "встреча", "отчет", "домашка", "спорт", "врач", "проект", "прочитать",
+	"написать", "письмо", "магазин", "продукты", "оплатить", "счета", "call", "meeting", "review", "deploy",
+	"buy", "gym", "book", "plan", "weekly", "release", "бабушке", "завтра", "срочно", "вечером"
+)
+SYNTHETIC_PASSWORD = "synthetic-password"  # all generated users have the same password (for load tests)
+
+COLUMNS = {
+	"users": ("id", "email", "first_name", "last_name", "is_staff", "disabled", "hashed_password", "registered_at"),
+	"notes": ("id", "note_type", "text", "date", "created_at", "completed", "user_id"),
+	"day_ratings": ("user_id", "date", "notes", "mood", "next_day_expectations", "health"),
+	"polling": ("id", "created_at", "poll_type", "polling_string_id", "user_id", "completed", "completed_at")
+}
+NOTES_MAX_DAYS_AHEAD = 10  # notes can be planned for some days ahead
+
+
+class SyntheticDataGenerator:
+	"""
+	Генерация строк таблиц для пачки пользователей.
+	ИД задаются явно, начиная с текущих максимумов (последовательности сдвигаются после загрузки).
+	"""
+	def __init__(
+		self,
+		days: int,
+		polling_strings: dict[str, list[int]],
+		hashed_password: str,
+		first_ids: dict[str, int],
+		seed: int | None = None
+	):
+		self.days = days
+		self.today = datetime.date.today()
+		self.polling_strings = polling_strings
+		self.hashed_password = hashed_password
+		self.next_ids = dict(first_ids)
+		self.random = random.Random(seed)
+
+	def _next_id(self, table: str) -> int:
+		self.next_ids[table] += 1
+		return self.next_ids[table]
+
+	def _binomial(self, n: int, p: float) -> int:
+		"""
+		Приближение биномиального распределения нормальным (random не умеет binomial, а numpy - лишняя зависимость).
+		"""
+		value = round(self.random.gauss(n * p, math.sqrt(n * p * (1 - p))))
+		return min(max(value, 0), n)
+
+	def _moment(self, day: datetime.date) -> datetime.datetime:
+		return datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc) + \
+			datetime.timedelta(seconds=self.random.randrange(7 * 3600, 24 * 3600))
+
+	def _note_text(self) -> str:
+		return " ".join(self.random.choices(NOTE_WORDS, k=self.random.randint(2, 12))).capitalize()
+
+	def users_batch(self, amount: int) -> dict[str, list[tuple[Any, ...]]]:
+		"""
+		Строки всех таблиц для amount новых пользователей: {таблица: [строка, ...]}.
+		"""
+		rows = {table: [] for table in COLUMNS}
+		rnd = self.random
+		for _ in range(amount):
+			user_id = self._next_id("users")
+			registered_day = self.today - datetime.timedelta(days=rnd.randrange(self.days))
+			rows["users"].append((
+				user_id, f"synthetic_{user_id}@example.com", rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES),
+				False, rnd.random() < 0.01, self.hashed_password, self._moment(registered_day)
+			))
+
+			activity, notes_rate = rnd.betavariate(2, 5), rnd.lognormvariate(0.3, 0.8)
+			task_share, completion_rate = rnd.betavariate(3, 3), rnd.betavariate(5, 2)
+			rating_density, polls_completion_rate = rnd.betavariate(1.5, 3), rnd.betavariate(2, 2)
+
+			days_registered = (self.today - registered_day).days + 1
+			active_days = rnd.sample(range(days_registered), k=self._binomial(days_registered, activity))
+			for day in sorted(registered_day + datetime.timedelta(days=shift) for shift in active_days):
+				for _ in range(int(rnd.expovariate(1 / notes_rate))):
+					note_date = day if rnd.random() < 0.7 else day + datetime.timedelta(
+						days=rnd.randint(1, NOTES_MAX_DAYS_AHEAD)
+					)
+					is_task = rnd.random() < task_share
+					completed = rnd.random() < (completion_rate if note_date < self.today else 0.1) if is_task else None
+					rows["notes"].append((
+						self._next_id("notes"), NoteTypeEnumDB.task.value if is_task else NoteTypeEnumDB.note.value,
+						self._note_text(), note_date, self._moment(day), completed, user_id
+					))
+
+				if rnd.random() < rating_density:
+					answers = [None if rnd.random() < 0.2 else rnd.random() < 0.65 for _ in range(4)]
+					if all(answer is None for answer in answers):  # at least one answer is required
+						answers[1] = rnd.random() < 0.65
+					rows["day_ratings"].append((user_id, day, *answers))
+
+				poll_type = rnd.choice(tuple(self.polling_strings))
+				completed = rnd.random() < polls_completion_rate
+				rows["polling"].append((
+					self._next_id("polling"), day, poll_type, rnd.choice(self.polling_strings[poll_type]), user_id,
+					completed, self._moment(day) if completed else None
+				))
+		return rows
+
+
+async def ensure_data_partitions(conn: AsyncConnection, first_day: datetime.date, last_day: datetime.date) -> None:
+	"""
+	Месячные партиции на весь период данных - иначе строки попадут в DEFAULT-партицию.
+	"""
+	for table in PARTITIONED_TABLES:
+		await conn.execute(text(
+			f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {table} DEFAULT"
+		))
+		partitions = await get_partitions(conn, table)
+		month = month_start(first_day)
+		while month <= last_day:
+			if partition_name(table, month) not in partitions:
+				await create_month_partition(conn, table, month)
+			month = month_start(month, 1)
+
+
+async def get_first_ids(conn: AsyncConnection) -> dict[str, int]:
+	first_ids = {}
+	for table in ("users", "notes", "polling"):
+		result = await conn.execute(text(f"SELECT coalesce(max(id), 0) FROM {table}"))
+		first_ids[table] = result.scalar()
+	return first_ids
+
+
+async def get_polling_strings(conn: AsyncConnection) -> dict[str, list[int]]:
+	"""
+	ИД вопросов по типам опросов (вопросы создаются при старте сервера - app.init_db_strings).
+	"""
+	result = await conn.execute(text("SELECT id, poll_type FROM polling_strings"))
+	polling_strings = {}
+	for string_id, poll_type in result.all():
+		polling_strings.setdefault(poll_type, []).append(string_id)
+	if not polling_strings:
+		raise RuntimeError("Table 'polling_strings' is empty. Start the server once to fill it")
+	return polling_strings
+
+
+def batches(total: int, batch_size: int) -> Iterator[int]:
+	for start in range(0, total, batch_size):
+		yield min(batch_size, total - start)
+
+
+def transaction(conn: AsyncConnection):
+	"""
+	Транзакция соединения; если оно уже в транзакции (например, в тестах) - SAVEPOINT.
+	"""
+	return conn.begin_nested() if conn.in_transaction() else conn.begin()
+
+
+async def load_synthetic_data(
+	conn: AsyncConnection,
+	users: int,
+	days: int = 180,
+	batch_size: int = 10_000,
+	seed: int | None = None
+) -> dict[str, int]:
+	"""
+	Загружает данные users пользователей за последние days дней. Каждая пачка - отдельная транзакция
+	 (или SAVEPOINT - см. transaction).
+	Возвращает количество загруженных строк по таблицам.
+	"""
+	today = datetime.date.today()
+	async with transaction(conn):
+		await ensure_data_partitions(
+			conn, today - datetime.timedelta(days=days), today + datetime.timedelta(days=NOTES_MAX_DAYS_AHEAD)
+		)
+		generator = SyntheticDataGenerator(
+			days=days,
+			polling_strings=await get_polling_strings(conn),
+			hashed_password=config.pwd_context.hash(SYNTHETIC_PASSWORD),
+			first_ids=await get_first_ids(conn),
+			seed=seed
+		)
+
+	loaded = {table: 0 for table in COLUMNS}
+	driver_connection = (await conn.get_raw_connection()).driver_connection  # asyncpg connection
+	for amount in batches(users, batch_size):
+		rows = generator.users_batch(amount)
+		async with transaction(conn):
+			await conn.execute(text("SELECT 1"))  # the transaction is started by SA lazily
+			for table, columns in COLUMNS.items():  # tables order matters (foreign keys)
+				await driver_connection.copy_records_to_table(table, records=rows[table], columns=columns)
+				loaded[table] += len(rows[table])
+		logger.info(f"Loaded {loaded['users']}/{users} users ({', '.join(f'{t}: {n}' for t, n in loaded.items())})")
+
+	async with transaction(conn):
+		for table in ("users", "notes", "polling"):
+			await conn.execute(text(
+				f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+			))
+		for table in COLUMNS:
+			await conn.execute(text(f"ANALYZE {table}"))  # fresh statistics for query plans
+	return loaded
+
+
+async def main() -> None:
+	parser = argparse.ArgumentParser(description="Bulk load of synthetic data into PostgreSQL")
+	parser.add_argument("--users", type=int, required=True)
+	parser.add_argument("--days", type=int, default=180, help="data period (default: 180 days)")
+	parser.add_argument("--batch-size", type=int, default=10_000, help="users per COPY batch")
+	parser.add_argument("--seed", type=int, default=None, help="seed for reproducible data")
+	parser.add_argument("--test-db", action="store_true", help="load data into the test DB")
+	args = parser.parse_args()
+
+	from sqlalchemy.ext.asyncio import create_async_engine
+
+	engine = create_async_engine(config.DATABASE_URL_TEST if args.test_db else config.DATABASE_URL)
+	started_at = time.perf_counter()
+	try:
+		async with engine.connect() as conn:
+			loaded = await load_synthetic_data(conn, args.users, args.days, args.batch_size, args.seed)
+	finally:
+		await engine.dispose()
+	logger.info(f"Loaded {sum(loaded.values())} rows in {time.perf_counter() - started_at:.1f} s")
+
+
+if __name__ == '__main__':
+	asyncio.run(main())
@@ -4,6 +4,7 @@ from passlib.context import CryptContext
 from dotenv import load_dotenv
 
 STARTING_APP_FROM_CMD_DEBUG_ARG = "--debug"
+STARTING_WORKER_FROM_CMD_ARG = "--worker"
 
 if STARTING_APP_FROM_CMD_DEBUG_ARG in sys.argv:  # если запуск сервера из докера, используется .env-docker;
 	# если запуск локальный - можно использовать только debug-mode
@@ -21,6 +22,16 @@ DATABASE_URL = "postgresql+asyncpg://%s:%s@%s:%s/%s" % tuple(DB_PARAMS.values())
 DATABASE_URL_SYNC = "postgresql://%s:%s@%s:%s/%s" % tuple(DB_PARAMS.values())  # for alembic
 DATABASE_URL_TEST = "postgresql+asyncpg://%s:%s@%s:%s/%s" % tuple(DB_PARAMS_TEST.values())
 
+# read replica (optional): if DB_REPLICA_HOST isn't defined, all queries go to the main DB
+DB_PARAMS_REPLICA = {"user": os.environ.get("DB_REPLICA_USER", DB_PARAMS["user"]),
+	"password": os.environ.get("DB_REPLICA_PASSWORD", DB_PARAMS["password"]), "host": os.environ.get("DB_REPLICA_HOST"),
+	"port": os.environ.get("DB_REPLICA_PORT", DB_PARAMS["port"]), "dbname": os.environ.get("DB_REPLICA_NAME", DB_PARAMS["dbname"])}
+DATABASE_URL_REPLICA = "postgresql+asyncpg://%s:%s@%s:%s/%s" % tuple(DB_PARAMS_REPLICA.values()) \
+	if DB_PARAMS_REPLICA["host"] else None
+# read-your-writes: after a user's write his GET requests go to the main DB during this time (seconds)
+DB_REPLICA_STICKINESS_TIME = int(os.environ.get("DB_REPLICA_STICKINESS_TIME", 5))
+REDIS_DB_STICKINESS_PREFIX = "eztask-db-primary"
+
 
 API_DOCS_URL = "/api/v1/docs"
 OPENAPI_URL = "/api/v1/openapi.json"
@@ -30,7 +41,8 @@ LOGGING_OUTPUT = "logs.log"
 LOGGING_PARAMS = {
 	"sink": LOGGING_OUTPUT,
 	"rotation": "1 MB",
-	"compression": "zip"
+	"compression": "zip",
+	"enqueue": True  # запись логов в файл - в отдельном потоке, а не в обработчике запроса
 }
 
 # alembic: commands for initializing migrations
@@ -44,7 +56,7 @@ DB_AUTO_UPDATING = False
 
 # starting params
 STARTING_APP_CMD_DEBUG_MODE = "uvicorn app.main:app --reload"
-STARTING_APP_CMD = "gunicorn app.main:app --workers 4 --worker-class uvicorn.workers.UvicornWorker --bind=0.0.0.0:8000"
+STARTING_APP_CMD = "gunicorn app.main:app --config gunicorn_conf.py"  # server params - in gunicorn_conf.py
 
 # users passwords hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -59,3 +71,69 @@ REDIS_HOST = f"redis://{os.environ.get('REDIS_HOST')}"
 REDIS_PORT = os.environ.get("REDIS_PORT")
 REDIS_URL = f"{REDIS_HOST}:{REDIS_PORT}"
 REDIS_CACHE_PREFIX = "eztask-cache"
+
+# two-tier cache params (app.cache): in-process LRU cache of every app worker in front of Redis
+CACHE_LOCAL_MAXSIZE = 1024  # users (cache groups) amount
+CACHE_LOCAL_TTL = 5  # seconds
+CACHE_STALE_TTL = 60  # expired entries are served this time (seconds) while they are refreshing in background
+CACHE_XFETCH_BETA = 1.0  # early refreshing probability factor (> 1 - earlier refreshing, 0 - disabled)
+CACHE_REFRESH_LOCK_TTL = 10  # seconds
+# per-day polling stats (app.crud.crud_polling.get_polling_stats): past days are reset when their polls are completed
+POLLING_STATS_CACHE_EXPIRE = 60 * 60 * 24  # seconds
+POLLING_STATS_TODAY_CACHE_EXPIRE = 60  # seconds
+
+# responses compression (app.middleware.CompressionMiddleware)
+COMPRESSION_MINIMUM_SIZE = 1024  # bytes, smaller responses aren't compressed
+COMPRESSION_GZIP_LEVEL = 6  # 1 (fastest) - 9 (smallest)
+COMPRESSION_BROTLI_QUALITY = 5  # 0 (fastest) - 11 (smallest), brotli is used if it's installed
+COMPRESSION_CACHE_SIZE = 256  # compressed bodies amount cached by every app worker
+
+# event bus params (app.events)
+EVENT_BUS_QUEUE_SIZE = int(os.environ.get("EVENT_BUS_QUEUE_SIZE", 1000))
+EVENT_BUS_WORKERS = int(os.environ.get("EVENT_BUS_WORKERS", 4))
+EVENT_BUS_SHUTDOWN_TIMEOUT = 5
+# if parameter is True, events are delivered through Redis Streams to every app worker
+EVENT_BUS_REDIS_TRANSPORT = os.environ.get("EVENT_BUS_REDIS_TRANSPORT", "false").lower() == "true"
+EVENT_BUS_REDIS_STREAM = "eztask-events"
+EVENT_BUS_REDIS_STREAM_MAXLEN = 10_000
+EVENT_BUS_REDIS_GROUP = "eztask-event-handlers"  # every event is handled by one of app workers
+
+# durable jobs queue params (app.jobs)
+JOBS_STREAM = "eztask-jobs"
+JOBS_GROUP = "eztask-workers"
+JOBS_DEAD_LETTER_STREAM = "eztask-jobs-dead"
+JOBS_MAX_RETRIES = 3
+JOBS_DEDUP_TTL = 60 * 60 * 24  # seconds
+JOBS_CLAIM_IDLE_MS = 60_000  # jobs of crashed worker will be retried after this time
+JOBS_RETRY_BACKOFF = 5  # failed job is retried after JOBS_RETRY_BACKOFF * 2 ** attempt seconds
+JOBS_WORKER_CONCURRENCY = int(os.environ.get("JOBS_WORKER_CONCURRENCY", 10))
+# if parameter is True, jobs worker is started inside every app worker (without separate worker process)
+JOBS_WORKER_IN_APP = os.environ.get("JOBS_WORKER_IN_APP", "false").lower() == "true"
+
+# polling: weights of random poll types choosing (poll type with weight 0 is never chosen)
+POLLING_TYPES_WEIGHTS = {
+	"note": 1,
+	"task": 1,
+	"health": 1,
+	"next_day_expectations": 1,
+	"mood": 1
+}
+
+# monthly partitioning of "notes" and "polling" tables (app.partitions)
+PARTITIONS_MONTHS_AHEAD = 3  # partitions are created in advance for this amount of months
+# partitions older than this amount of months are detached from tables (None - keep all partitions)
+PARTITIONS_RETENTION_MONTHS = int(os.environ["PARTITIONS_RETENTION_MONTHS"]) \
+	if os.environ.get("PARTITIONS_RETENTION_MONTHS") else None
+PARTITIONS_ARCHIVE_SCHEMA = "archive"  # detached partitions are moved to this schema (None - keep in place)
+PARTITIONS_MAINTENANCE_INTERVAL = 60 * 60 * 12  # seconds
+
+# bulk import of notes and day ratings (app.imports)
+IMPORT_CHUNK_SIZE = 5000  # records are validated and loaded into DB by chunks of this size
+IMPORT_MAX_ERRORS = 100  # import is stopped after this amount of invalid records
+IMPORT_MAX_RECORD_LINES = 100  # CSV record (quoted value with line breaks) longer than this is an unclosed quote
+
+# user activity rollups for staff analytics (app.crud.crud_analytics)
+ANALYTICS_DIRTY_SET = "eztask-analytics-dirty"  # redis set of "user_id:date" keys waiting for recomputing
+ANALYTICS_REFRESH_INTERVAL = 60  # seconds
+ANALYTICS_REFRESH_BATCH = 1000  # keys recomputed by one query
+ANALYTICS_REFRESH_MAX_BATCHES = 20  # batches per refresh job, the rest is left for the next scheduled one
@@ -2,16 +2,22 @@ import dotenv
 
 dotenv.load_dotenv()  # load env vars for safe importing
 
+import os
 import random
+from fastapi import Request
 from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from config import DATABASE_URL_TEST, JWT_SIGN_ALGORITHM, JWT_SECRET_KEY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncConnection, AsyncTransaction
+from config import DATABASE_URL_TEST, JWT_SIGN_ALGORITHM, JWT_SECRET_KEY, REDIS_URL
 from sqlalchemy.pool import NullPool
+from redis import asyncio as aioredis
+import app.database
 from app.database import Base
 from app.models.polling import Polling, PollingString
 from app.models.users import User
 from app.models.notes import Note
 from app.models.day_ratings import DayRating
+from app.models.analytics import UserActivityDaily
 from app.dependencies import get_async_session
 from sqlalchemy.orm import sessionmaker
 import pytest
@@ -19,20 +25,51 @@ from app.main import app
 from typing import AsyncGenerator
 import asyncio
 from tests.additional.fills import create_user
-from app import fastapi_cache_init, init_db_strings
-
-
-engine_test = create_async_engine(DATABASE_URL_TEST, poolclass=NullPool)
-async_session_maker = sessionmaker(engine_test, class_=AsyncSession, expire_on_commit=False)
+from app import cache_init, init_db_strings, event_bus_init, jobs_init, partitions_init
+from app.cache import cache
+from app.uow import bind_unit_of_work
+
+try:
+	import fakeredis  # Redis в памяти процесса (если установлен): для тестов не нужен запущенный Redis
+except ImportError:
+	fakeredis = None
+
+
+# при параллельном запуске (pytest -n auto --dist loadscope, pytest-xdist) у каждого воркера
+# своя схема в тестовой БД и своя БД Redis
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")  # "gw0", "gw1", ...
+TEST_SCHEMA = f"test_{XDIST_WORKER}" if XDIST_WORKER else None
+
+if fakeredis is not None:
+	redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+else:  # БД 0 - для приложения, тесты ее не трогают
+	redis_client = aioredis.from_url(
+		REDIS_URL, db=int(XDIST_WORKER.removeprefix("gw")) + 1 if XDIST_WORKER else 1, decode_responses=True
+	)
+app.database.redis_client = redis_client  # до инициализации кэша, шины событий и очереди задач
+
+engine_test = create_async_engine(
+	DATABASE_URL_TEST, poolclass=NullPool,
+	connect_args={"server_settings": {"search_path": f"{TEST_SCHEMA},public"}} if TEST_SCHEMA else {}
+)
+# на время теста привязывается к соединению с открытой транзакцией (см. db_transaction):
+# каждая сессия работает в своем SAVEPOINT, а все изменения теста откатываются в конце
+async_session_maker = sessionmaker(
+	engine_test, class_=AsyncSession, expire_on_commit=False, join_transaction_mode="create_savepoint"
+)
 Base.metadata.bind = engine_test
 
 
-async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
+async def override_get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
 	"""
 	Перезапись сессии БД в проекте.
 	Нужно для корректной работы тестов (иначе БД будет использоваться не тестовая).
+
+	Сессия здесь не фиксируется: это делает маршрут запроса (app.uow.UnitOfWorkRoute), как и в приложении -
+	 изменения маршрута без UnitOfWorkRoute откатятся (см. tests/test_uow.py::test_routes_unit_of_work).
 	"""
 	async with async_session_maker() as session:
+		bind_unit_of_work(request, session)
 		yield session
 
 app.dependency_overrides[get_async_session] = override_get_async_session
@@ -51,18 +88,83 @@ async def prepare_app():
 	Перед запуском тестов создает сущности в БД. После тестов - удаляет
 	 (yield - специальный разделитель действий для фикстур pytest).
 
-	 + инициализирует кэш и заливает нужные данные.
+	 + инициализирует кэш, шину событий, обработчики задач и заливает нужные данные.
 	"""
 	async with engine_test.begin() as conn:
+		# расширение ставится в общую схему один раз на всю БД (xdist-воркеры создают схемы параллельно)
+		await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('eztask-tests-init'))"))
+		await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public"))
+		if TEST_SCHEMA is not None:
+			await conn.execute(text(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE"))
+			await conn.execute(text(f"CREATE SCHEMA {TEST_SCHEMA}"))
 		await conn.run_sync(Base.metadata.create_all)
+	await partitions_init(engine_test)  # без партиций вставка в "notes" и "polling" невозможна
 
-	await fastapi_cache_init()  # для работы кеширования при тестах
+	await cache_init(None)  # без фонового обновления кэша: оно работало бы параллельно тесту в его соединении
 	await init_db_strings(async_session_maker)
+	await event_bus_init(eager=True)  # обработчики событий и задачи (опросы) выполняются сразу при публикации
+	jobs_init(async_session_maker)
 
 	yield
 
 	async with engine_test.begin() as conn:
-		await conn.run_sync(Base.metadata.drop_all)
+		if TEST_SCHEMA is not None:
+			await conn.execute(text(f"DROP SCHEMA {TEST_SCHEMA} CASCADE"))
+		else:
+			await conn.run_sync(Base.metadata.drop_all)
+
+
+async def begin_test_transaction() -> tuple[AsyncConnection, AsyncTransaction]:
+	"""
+	Открывает транзакцию, в которой работают все сессии теста (или класса тестов).
+	Последовательности ИД сбрасываются к текущему максимуму - тесты не зависят от порядка запуска.
+	"""
+	await redis_client.flushdb()
+	cache.local.clear()
+	connection = await engine_test.connect()
+	transaction = await connection.begin()
+	for table in Base.metadata.sorted_tables:
+		if "id" in table.c:
+			await connection.execute(text(
+				f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), coalesce(max(id), 0) + 1, false) "
+				f"FROM {table.name}"
+			))
+	async_session_maker.configure(bind=connection)
+	return connection, transaction
+
+
+async def rollback_test_transaction(connection: AsyncConnection, transaction: AsyncTransaction) -> None:
+	await transaction.rollback()
+	await connection.close()
+	async_session_maker.configure(bind=engine_test)
+
+
+@pytest.fixture(autouse=True, scope='class')
+async def class_db_transaction(request):
+	"""
+	Для классов с маркером shared_db - одна транзакция на весь класс: тесты класса
+	 используют данные, созданные предыдущими тестами.
+	"""
+	if request.node.get_closest_marker("shared_db") is None:
+		yield
+		return
+	connection, transaction = await begin_test_transaction()
+	yield
+	await rollback_test_transaction(connection, transaction)
+
+
+@pytest.fixture(autouse=True)
+async def db_transaction(request, class_db_transaction):
+	"""
+	Каждый тест работает в своей транзакции, которая откатывается после теста,
+	 поэтому тесты не видят данных друг друга (и могут запускаться параллельно).
+	"""
+	if request.node.get_closest_marker("shared_db") is not None:
+		yield
+		return
+	connection, transaction = await begin_test_transaction()
+	yield
+	await rollback_test_transaction(connection, transaction)
 
 
 @pytest.fixture(scope='session')
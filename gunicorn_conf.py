@@ -0,0 +1,46 @@
+"""
+Настройки gunicorn-сервера (запуск: gunicorn app.main:app --config gunicorn_conf.py, см. config.STARTING_APP_CMD).
+Все параметры можно переопределить переменными окружения.
+"""
+import importlib.util
+import multiprocessing
+import os
+
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+
+def env_bool(name: str, default: bool) -> bool:
+	return os.environ.get(name, str(default)).lower() == "true"
+
+
+class UvicornWorker(BaseUvicornWorker):
+	"""
+	Uvicorn-воркер с uvloop (если он установлен - на Windows его нет) и httptools.
+	"""
+	CONFIG_KWARGS = {
+		"loop": os.environ.get("UVICORN_LOOP", "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"),
+		"http": os.environ.get("UVICORN_HTTP", "httptools"),
+		"lifespan": "on"
+	}
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+# app is async, so one worker per CPU core is enough
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gunicorn_conf.UvicornWorker")
+
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))  # seconds
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))  # seconds
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))  # seconds
+
+# workers are restarted after this amount of requests (against memory leaks),
+# jitter - so that workers aren't restarted at the same time
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# app is imported once in master process before forking workers: faster workers boot and
+# less memory (copy-on-write). App mustn't open connections at import (see app.database)
+preload_app = env_bool("GUNICORN_PRELOAD_APP", True)
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
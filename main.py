@@ -18,11 +18,14 @@ def main():
 			raise RuntimeError(error_text)
 		time.sleep(5)  # ожидание, пока БД инициализируется докером
 
-	from app import database_init, start_app, execute_from_command_line
+	from app import database_init, start_app, start_worker, execute_from_command_line
 	# importing from app after load dotenv because
 	# .env params are needed for database initializing
 
 	starting_params = execute_from_command_line(*sys.argv)
+	if starting_params.get("worker"):
+		start_worker()  # воркер очереди фоновых задач (app.jobs), миграции делает сервер
+		return
 	database_init()
 	start_app(**starting_params)
 
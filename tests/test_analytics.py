@@ -0,0 +1,88 @@
+import datetime
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from app import database
+from app.crud.crud_analytics import mark_activity_dirty
+from app.jobs import job_queue
+from tests.additional.funcs import change_user_params
+
+
+@pytest.mark.usefixtures("generate_user_with_token")
+class TestAnalytics:
+	async def test_activity_refresh(self, async_test_client: AsyncClient, session: AsyncSession):
+		"""
+		Изменения данных пользователя попадают в сводку после периодического пересчета;
+		 отчет доступен только is_staff-пользователям.
+		"""
+		for note in ({"text": "Заметка"}, {"text": "Задача", "note_type": "task"}):
+			response = await async_test_client.post("/api/v1/notes/", json=dict(note=note), headers=self.headers)
+			assert response.status_code == 201
+		await async_test_client.post("/api/v1/day_ratings/", headers=self.headers, json=dict(day_rating={"mood": True}))
+
+		not_staff_response = await async_test_client.get("/api/v1/analytics/activity", headers=self.headers)
+		assert not_staff_response.status_code == 403
+
+		await change_user_params(user_id=self.id, sa_session=session, is_staff=True)
+		url = f"/api/v1/analytics/activity?user_id={self.id}"
+		assert (await async_test_client.get(url, headers=self.headers)).json() == []
+
+		await job_queue.enqueue("analytics.refresh", {})
+		response = await async_test_client.get(url, headers=self.headers)
+		assert response.status_code == 200
+		assert response.json() == [{
+			"period_start": datetime.date.today().isoformat(), "active_users": 1,
+			"notes": 1, "tasks": 1, "tasks_completed": 0, "tasks_completion_rate": 0.0,
+			"day_ratings": 1, "polls": 1, "polls_completed": 0, "polls_response_rate": 0.0
+		}]
+
+	async def test_activity_periods(self, async_test_client: AsyncClient, session: AsyncSession):
+		"""
+		Группировка по месяцам и пересчет сводок (rebuild) для импортированных данных.
+		"""
+		month_start = (datetime.date.today().replace(day=1) - datetime.timedelta(days=1)).replace(day=1)
+		notes = [
+			{"text": "Первая", "date": month_start.isoformat()},
+			{"text": "Вторая", "date": (month_start + datetime.timedelta(days=1)).isoformat()},
+			{"text": "Задача", "note_type": "task", "date": month_start.isoformat(), "completed": True}
+		]
+		await async_test_client.post(
+			"/api/v1/import/notes", headers={**self.headers, "Content-Type": "application/x-ndjson"},
+			content="\n".join(json.dumps(note) for note in notes)
+		)
+		await change_user_params(user_id=self.id, sa_session=session, is_staff=True)
+
+		rebuild_response = await async_test_client.post("/api/v1/analytics/activity/rebuild?days=100", headers=self.headers)
+		assert rebuild_response.status_code == 202
+
+		response = await async_test_client.get(
+			f"/api/v1/analytics/activity?period=month&user_id={self.id}&date_from={month_start}"
+			f"&date_to={month_start + datetime.timedelta(days=27)}",
+			headers=self.headers
+		)
+		assert [
+			(stats["period_start"], stats["notes"], stats["tasks_completed"], stats["tasks_completion_rate"])
+			for stats in response.json()
+		] == [(month_start.isoformat(), 2, 1, 1.0)]
+
+	async def test_refresh_batches_limit(self, monkeypatch: pytest.MonkeyPatch):
+		"""
+		Задача пересчета обрабатывает не больше ANALYTICS_REFRESH_MAX_BATCHES пачек - остальное
+		 остается для следующего запуска.
+		"""
+		monkeypatch.setattr(config, "ANALYTICS_REFRESH_BATCH", 1)
+		monkeypatch.setattr(config, "ANALYTICS_REFRESH_MAX_BATCHES", 2)
+		await database.redis_client.delete(config.ANALYTICS_DIRTY_SET)
+		today = datetime.date.today()
+		await mark_activity_dirty(
+			database.redis_client, ((self.id, today - datetime.timedelta(days=days)) for days in range(5))
+		)
+
+		await job_queue.enqueue("analytics.refresh", {})
+		assert await database.redis_client.scard(config.ANALYTICS_DIRTY_SET) == 3
+		await job_queue.enqueue("analytics.refresh", {})
+		assert await database.redis_client.scard(config.ANALYTICS_DIRTY_SET) == 1
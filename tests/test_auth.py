@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from .additional.funcs import change_user_params, endpoint_autotest, convert_obj_creating_time
 
 
+@pytest.mark.shared_db  # тесты используют пользователя, созданного в test_create_user
 @pytest.mark.usefixtures("generate_user", "get_jwt_token_params")
 class TestAuth:
 	async def test_create_user(self, async_test_client: AsyncClient):
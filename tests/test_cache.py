@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from app.cache import TwoTierCache
+from app.database import redis_client
+
+
+class TestTwoTierCache:
+	async def test_tiers(self):
+		"""
+		Промах обоих уровней вычисляет значение, далее оно берется из L1, а в другом воркере (пустой L1) - из L2.
+		"""
+		cache = TwoTierCache(prefix="autotest-cache", local_maxsize=10, local_ttl=5)
+		cache.redis = redis_client
+		await cache.invalidate("notes", 1)
+		calls = []
+
+		async def load():
+			calls.append(1)
+			return [{"id": 1}]
+
+		assert await cache.get_or_set(cache.group_key("notes", 1), "{}", 30, load) == [{"id": 1}]
+		assert await cache.get_or_set(cache.group_key("notes", 1), "{}", 30, load) == [{"id": 1}]
+		cache.local.clear()  # как будто запрос пришел в другой воркер
+		assert await cache.get_or_set(cache.group_key("notes", 1), "{}", 30, load) == [{"id": 1}]
+
+		assert len(calls) == 1
+		metrics = cache.metrics()
+		assert (metrics["l1_hits"], metrics["l2_hits"], metrics["l2_misses"]) == (1, 1, 1)
+		assert metrics["l1_hit_rate"] == 1 / 3
+
+		await cache.invalidate("notes", 1)
+		await cache.get_or_set(cache.group_key("notes", 1), "{}", 30, load)
+		assert len(calls) == 2
+
+	async def test_single_flight(self):
+		"""
+		Одновременные запросы холодного ключа ждут одного вычисления.
+		"""
+		cache = TwoTierCache(prefix="autotest-cache", local_maxsize=10, local_ttl=5)
+		cache.redis = redis_client
+		await cache.invalidate("day_ratings", 1)
+		calls = []
+
+		async def slow_load():
+			calls.append(1)
+			await asyncio.sleep(0.1)
+			return {"mood": True}
+
+		results = await asyncio.gather(*(
+			cache.get_or_set(cache.group_key("day_ratings", 1), "{}", 30, slow_load) for _ in range(10)
+		))
+
+		assert results == [{"mood": True}] * 10
+		assert len(calls) == 1
+		assert cache.metrics()["coalesced"] == 9
+
+	async def test_stale_while_revalidate(self):
+		"""
+		Истекшая запись отдается сразу, а пересчитывается фоновым обновлением (одним на ключ).
+		"""
+		cache = TwoTierCache(prefix="autotest-cache", local_maxsize=10, local_ttl=5, stale_ttl=60)
+		cache.redis = redis_client
+		group = cache.group_key("notes", time.time_ns())  # у блокировки обновления свое время жизни
+		await cache._set_remote(group, "{}", ["old"], expire=-1, delta=0)  # запись уже истекла
+
+		async def load():
+			raise AssertionError("Stale entry should be served without computing")
+
+		async def refresh():
+			await asyncio.sleep(0.05)
+			return ["new"]
+
+		results = await asyncio.gather(*(cache.get_or_set(group, "{}", 30, load, refresh=refresh) for _ in range(5)))
+		assert results == [["old"]] * 5
+		assert len(cache._refreshing) == 1
+
+		await asyncio.gather(*cache._refreshing.values())
+		assert await cache.get_or_set(group, "{}", 30, load, refresh=refresh) == ["new"]
+		assert cache.metrics()["stale_hits"] == 1
+		await redis_client.delete(group)
@@ -0,0 +1,61 @@
+import datetime
+
+import httpx
+import pytest
+
+from app import schemas
+from app.client import EztaskClient, EztaskClientError
+from app.main import app
+
+
+@pytest.fixture
+async def api_client(request):
+	async with EztaskClient(
+		"http://test", email=request.cls.email, password=request.cls.password,
+		http2=False, transport=httpx.ASGITransport(app=app)
+	) as client:
+		yield client
+
+
+@pytest.mark.usefixtures("generate_user_with_token")
+class TestClient:
+	async def test_launch(self, api_client: EztaskClient):
+		"""
+		Данные для запуска приложения одним вызовом; неизменившиеся списки отдаются из кэша по ETag.
+		"""
+		created_note = await api_client.create_note(schemas.NoteCreate(text="Заметка из клиента"))
+
+		data = await api_client.launch()
+		assert data["user"].id == self.id
+		assert [note.id for note in data["notes"]] == [created_note.id]
+		assert data["day_ratings"] == []
+		assert data["polling"]["user_id"] == self.id
+		assert "text" in data["polling"]
+
+		assert await api_client.notes_me() == data["notes"]
+		assert api_client.not_modified == 1
+
+	async def test_create_note_with_date(self, api_client: EztaskClient):
+		"""
+		Создание заметки с явной датой (дата сериализуется в запросе).
+		"""
+		tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+		created_note = await api_client.create_note(
+			schemas.NoteCreate(text="Задача на завтра", note_type="task", date=tomorrow)
+		)
+		assert created_note.date == tomorrow
+		assert [note.id for note in await api_client.notes_me()] == [created_note.id]
+
+	async def test_token_refresh(self, api_client: EztaskClient):
+		"""
+		Отклоненный токен обновляется входом по email и паролю; без них - ошибка.
+		"""
+		api_client.token = "expired-token"
+		user = await api_client.me()
+		assert user.id == self.id
+		assert api_client.token != "expired-token"
+
+		api_client.token, api_client.password = "expired-token", None
+		with pytest.raises(EztaskClientError) as error:
+			await api_client.me()
+		assert error.value.status_code == 401
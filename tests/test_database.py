@@ -0,0 +1,105 @@
+from typing import Optional
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+import app.dependencies
+import app.main
+from app import schemas
+from app.database import stick_to_primary, is_stuck_to_primary
+from app.dependencies import get_token_subject
+from app.models.users import User
+
+
+def make_request(headers: dict[str, str]) -> Request:
+	return Request({
+		"type": "http", "method": "GET", "path": "/",
+		"headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()]
+	})
+
+
+@pytest.fixture
+def replica_sessions(session: AsyncSession, monkeypatch: pytest.MonkeyPatch) -> list[AsyncSession]:
+	"""
+	"Реплика" - сессии на соединении теста (данные те же, что в основной БД); выданные сессии запоминаются.
+	Реплика считается настроенной и для привязки к основной БД после записи (main.stick_to_primary_after_write).
+	"""
+	sessions = []
+	replica_session_maker = sessionmaker(
+		session.bind, class_=AsyncSession, expire_on_commit=False, join_transaction_mode="create_savepoint"
+	)
+
+	def make_replica_session() -> AsyncSession:
+		sessions.append(replica_session_maker())
+		return sessions[-1]
+
+	monkeypatch.setattr(app.dependencies, "async_replica_session_maker", make_replica_session)
+	monkeypatch.setattr(app.main, "replica_engine", session.bind)
+	return sessions
+
+
+@pytest.mark.usefixtures("generate_user_with_token")
+class TestReadReplicaRouting:
+	async def test_token_subject(self):
+		"""
+		Субъект токена определяется без обращения к БД, некорректный токен - не ошибка.
+		"""
+		assert get_token_subject(make_request(self.headers)) == self.email
+		assert get_token_subject(make_request({"Authorization": "Bearer invalid"})) is None
+		assert get_token_subject(make_request({})) is None
+
+	async def test_stick_to_primary(self):
+		"""
+		После записи пользователь на время привязывается к основной БД (read-your-writes).
+		"""
+		assert not await is_stuck_to_primary(self.email)
+		await stick_to_primary(self.email)
+		assert await is_stuck_to_primary(self.email)
+
+	async def test_read_from_replica(self, async_test_client: AsyncClient, replica_sessions: list[AsyncSession]):
+		"""
+		GET-запросы читают из реплики, изменяющие запросы - из основной БД.
+		"""
+		response = await async_test_client.get("/api/v1/users/me", headers=self.headers)
+		assert response.status_code == 200
+		assert len(replica_sessions) == 1
+
+		response = await async_test_client.put(
+			f"/api/v1/users/{self.id}", headers=self.headers, json={"user": {"last_name": "Petrov"}}
+		)
+		assert response.status_code == 200
+		assert len(replica_sessions) == 1
+
+	async def test_primary_after_write(self, async_test_client: AsyncClient, replica_sessions: list[AsyncSession]):
+		"""
+		После записи GET-запросы пользователя читают из основной БД (реплика может отставать).
+		"""
+		await async_test_client.put(
+			f"/api/v1/users/{self.id}", headers=self.headers, json={"user": {"last_name": "Petrov"}}
+		)
+		response = await async_test_client.get("/api/v1/users/me", headers=self.headers)
+		assert response.json()["last_name"] == "Petrov"
+		assert replica_sessions == []
+
+	async def test_user_missing_on_replica(
+		self, async_test_client: AsyncClient, replica_sessions: list[AsyncSession], monkeypatch: pytest.MonkeyPatch
+	):
+		"""
+		Пользователь, которого еще нет в реплике (только что создан), ищется в основной БД.
+		"""
+		get_user_by_email = User.get_user_by_email
+		lookups = []
+
+		async def lagging_get_user_by_email(db: AsyncSession, email: str) -> Optional[schemas.UserInDB]:
+			on_replica = db in replica_sessions
+			lookups.append(on_replica)
+			return None if on_replica else await get_user_by_email(db=db, email=email)
+
+		monkeypatch.setattr(User, "get_user_by_email", lagging_get_user_by_email)
+		response = await async_test_client.get("/api/v1/users/me", headers=self.headers)
+		assert response.status_code == 200
+		assert response.json()["id"] == self.id
+		assert lookups == [True, False]
@@ -6,6 +6,7 @@ from .additional.fills import create_random_day_rating, create_random_day_rating
 from .additional.funcs import change_user_params, delete_day_rating
 from .additional.subtests import day_ratings_rud_test
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import cache
 from app.models.day_ratings import DayRating
 from app.utils import sa_object_to_dict
 
@@ -143,6 +144,48 @@ class TestDayRating:
 		assert all((day_rating.values() is not None for day_rating
 					in filtered_by_filled_all_fields_day_ratings_response.json()))
 
+	async def test_read_day_ratings_me_conditional(self, async_test_client: AsyncClient, monkeypatch: pytest.MonkeyPatch):
+		"""
+		Условный запрос списка оценок дня: при актуальном ETag - 304, после изменения оценки ETag меняется.
+		Если Redis недоступен - список отдается без ETag и кэша.
+		"""
+		day_rating = await create_random_day_rating(
+			headers=self.headers, async_client=async_test_client, raise_error=True, json=True
+		)
+		response = await async_test_client.get("/api/v1/day_ratings/me", headers=self.headers)
+		etag = response.headers["ETag"]
+
+		not_modified_response = await async_test_client.get(
+			"/api/v1/day_ratings/me", headers={**self.headers, "If-None-Match": etag}
+		)
+		assert not_modified_response.status_code == 304
+
+		await async_test_client.put(
+			f"/api/v1/day_ratings/user/{self.id}?date={day_rating['date']}",
+			headers=self.headers, json=dict(day_rating={"mood": not day_rating["mood"]})
+		)
+		modified_response = await async_test_client.get(
+			"/api/v1/day_ratings/me", headers={**self.headers, "If-None-Match": etag}
+		)
+		assert modified_response.status_code == 200
+		assert modified_response.headers["ETag"] != etag
+		assert modified_response.json()[0]["mood"] is not day_rating["mood"]
+
+		class UnavailableRedis:
+			def __getattr__(self, name):
+				async def command(*args, **kwargs):
+					raise ConnectionError
+				return command
+
+		monkeypatch.setattr(cache, "redis", UnavailableRedis())
+		cache.local.clear()
+		without_redis_response = await async_test_client.get(
+			"/api/v1/day_ratings/me", headers={**self.headers, "If-None-Match": etag}
+		)
+		assert without_redis_response.status_code == 200
+		assert "ETag" not in without_redis_response.headers
+		assert without_redis_response.json() == modified_response.json()
+
 	async def test_read_day_ratings_me_errors(self, async_test_client: AsyncClient):
 		"""
 		- Нельзя передать невалидные параметры запроса (фильтрации оценок дня).
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from app.events import EventBus, RedisStreamTransport
+
+
+class TestEventBus:
+	async def test_publish_to_subscribers(self):
+		"""
+		Событие получают точные подписчики, подписчики по объекту ("note.*") и общие ("*").
+		"""
+		bus = EventBus(maxsize=10, workers=2)
+		received = []
+
+		async def handler(event, payload):
+			received.append((handler.__name__, event, payload["note_id"]))
+
+		async def object_handler(event, payload):
+			received.append((object_handler.__name__, event, payload["note_id"]))
+
+		bus.subscribe("note.created", handler)
+		bus.subscribe("note.*", object_handler)
+		bus.subscribe("rating.created", handler)
+
+		await bus.start()
+		await bus.publish("note.created", {"note_id": 1})
+		await bus.stop()
+
+		assert sorted(received) == [("handler", "note.created", 1), ("object_handler", "note.created", 1)]
+
+	async def test_handler_error_does_not_break_bus(self):
+		"""
+		Ошибка в одном обработчике не мешает остальным и не останавливает воркеры.
+		"""
+		bus = EventBus(maxsize=10, workers=1)
+		received = []
+
+		@bus.subscribe("user.deleted")
+		async def failing_handler(event, payload):
+			raise ValueError
+
+		@bus.subscribe("user.deleted")
+		async def handler(event, payload):
+			received.append(payload["user_id"])
+
+		await bus.start()
+		await bus.publish("user.deleted", {"user_id": 1})
+		await bus.publish("user.deleted", {"user_id": 2})
+		await bus.stop()
+
+		assert received == [1, 2]
+
+	async def test_back_pressure(self):
+		"""
+		Если очередь заполнена, публикация ждет, пока воркеры освободят место.
+		"""
+		bus = EventBus(maxsize=1, workers=1)
+		release = asyncio.Event()
+
+		@bus.subscribe("note.created")
+		async def slow_handler(event, payload):
+			await release.wait()
+
+		await bus.start()
+		await bus.publish("note.created", {"note_id": 1})  # забирается воркером
+		await asyncio.sleep(0)
+		await bus.publish("note.created", {"note_id": 2})  # занимает очередь
+
+		blocked_publish = asyncio.create_task(bus.publish("note.created", {"note_id": 3}))
+		await asyncio.sleep(0.1)
+		assert not blocked_publish.done()
+
+		release.set()
+		await asyncio.wait_for(blocked_publish, timeout=1)
+		await bus.stop()
+
+	async def test_not_started_bus_handles_inline(self):
+		"""
+		Если шина не запущена (скрипты вне сервера), обработчики вызываются сразу.
+		"""
+		bus = EventBus()
+		received = []
+
+		@bus.subscribe("*")
+		async def handler(event, payload):
+			received.append(event)
+
+		await bus.publish("polling.completed", {"polling_id": 1})
+
+		assert received == ["polling.completed"]
+
+	async def test_inline_handlers(self):
+		"""
+		Inline-обработчики вызываются до возврата из publish, даже если шина запущена.
+		"""
+		bus = EventBus(maxsize=10, workers=1)
+		received = []
+
+		@bus.subscribe("note.*", inline=True)
+		async def handler(event, payload):
+			received.append(event)
+
+		await bus.start()
+		await bus.publish("note.deleted", {"note_id": 1})
+		assert received == ["note.deleted"]
+		await bus.stop()
+
+	async def test_redis_transport_delivers_once(self):
+		"""
+		Через Redis-транспорт каждое событие обрабатывает один из воркеров (consumer group), а не каждый.
+		"""
+		fakeredis = pytest.importorskip("fakeredis")
+		redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+		handled = []
+
+		async def handler(event, payload):
+			handled.append(payload["note_id"])
+
+		transports = [
+			RedisStreamTransport(redis, stream="test-events", maxlen=100, group="test-handlers", consumer=consumer)
+			for consumer in ("worker-1", "worker-2")
+		]
+		buses = [EventBus(), EventBus()]  # не запущены - события обрабатываются сразу при получении
+		for transport, bus in zip(transports, buses):
+			await transport.ensure_group()
+			bus.subscribe("note.created", handler)
+
+		for note_id in (1, 2, 3):
+			await transports[0].send("note.created", {"note_id": note_id})
+		assert await transports[1].read(buses[1], block=None) == 3
+		assert await transports[0].read(buses[0], block=None) == 0
+
+		assert handled == [1, 2, 3]
+		assert (await redis.xpending("test-events", "test-handlers"))["pending"] == 0
@@ -0,0 +1,113 @@
+import datetime
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.imports import iter_records
+
+
+@pytest.mark.usefixtures("generate_user_with_token")
+class TestImports:
+	async def test_import_notes(self, async_test_client: AsyncClient):
+		"""
+		Импорт заметок из NDJSON: прошедшие даты допустимы, повторный импорт не дублирует заметки.
+		"""
+		past_date = datetime.date.today() - datetime.timedelta(days=400)
+		notes = [
+			{"text": "Старая заметка", "date": past_date.isoformat()},
+			{"text": "Старая задача", "note_type": "task", "date": past_date.isoformat(), "completed": True},
+			{"text": "Заметка на сегодня"}
+		]
+		body = "\n".join(json.dumps(note) for note in notes) + "\n"
+		headers = {**self.headers, "Content-Type": "application/x-ndjson"}
+
+		import_response = await async_test_client.post("/api/v1/import/notes", headers=headers, content=body)
+		assert import_response.status_code == 201
+		assert import_response.json() == {"received": 3, "imported": 3}
+
+		repeated_import_response = await async_test_client.post("/api/v1/import/notes", headers=headers, content=body)
+		assert repeated_import_response.status_code == 201
+		assert repeated_import_response.json() == {"received": 3, "imported": 0}
+
+		past_notes = await async_test_client.get("/api/v1/notes/me?period=past&type=task", headers=self.headers)
+		assert [(note["text"], note["completed"]) for note in past_notes.json() if note["user_id"] == self.id] == [
+			("Старая задача", True)
+		]
+
+	async def test_import_duplicated_notes(self, async_test_client: AsyncClient):
+		"""
+		Одинаковые заметки внутри одного файла импортируются один раз.
+		"""
+		body = '{"text": "Заметка"}\n{"text": "Заметка"}\n{"text": "Заметка", "note_type": "task"}\n'
+		import_response = await async_test_client.post(
+			"/api/v1/import/notes", headers={**self.headers, "Content-Type": "application/x-ndjson"}, content=body
+		)
+		assert import_response.json() == {"received": 3, "imported": 2}
+
+	async def test_import_day_ratings(self, async_test_client: AsyncClient):
+		"""
+		Импорт оценок дня из CSV: пустые значения - null, повторная дата перезаписывает оценку.
+		"""
+		yesterday = datetime.date.today() - datetime.timedelta(days=1)
+		body = f"date,mood,health\r\n{yesterday},true,\r\n{yesterday},false,true\r\n{datetime.date.today()},,false\r\n"
+		import_response = await async_test_client.post(
+			"/api/v1/import/day_ratings", headers={**self.headers, "Content-Type": "text/csv"}, content=body
+		)
+		assert import_response.status_code == 201
+		assert import_response.json() == {"received": 3, "imported": 2}
+
+		day_ratings = (await async_test_client.get("/api/v1/day_ratings/me", headers=self.headers)).json()
+		assert [(rating["date"], rating["mood"], rating["health"]) for rating in day_ratings] == [
+			(yesterday.isoformat(), False, True), (datetime.date.today().isoformat(), None, False)
+		]
+
+	async def test_import_errors(self, async_test_client: AsyncClient):
+		"""
+		- Файл с невалидными строками не импортируется (в ответе - номера строк);
+		- Поддерживаются только NDJSON и CSV;
+		- Импортировать данные другого пользователя может только is_staff-пользователь.
+		"""
+		invalid_file_response = await async_test_client.post(
+			"/api/v1/import/notes", headers={**self.headers, "Content-Type": "application/x-ndjson"},
+			content='{"text": "Валидная заметка"}\n{"note_type": "qwerty", "text": "1"}\nnot json\n'
+		)
+		assert invalid_file_response.status_code == 422
+		assert [error["line"] for error in invalid_file_response.json()["detail"]] == [2, 3]
+
+		notes = await async_test_client.get("/api/v1/notes/me", headers=self.headers)
+		assert notes.json() == []
+
+		unterminated_quote_response = await async_test_client.post(
+			"/api/v1/import/day_ratings", headers={**self.headers, "Content-Type": "text/csv"},
+			content='date,mood\n2024-01-01,"true\n2024-01-02,true\n'
+		)
+		assert unterminated_quote_response.status_code == 422
+		assert [error["line"] for error in unterminated_quote_response.json()["detail"]] == [2]
+
+		bad_format_response = await async_test_client.post(
+			"/api/v1/import/notes", headers={**self.headers, "Content-Type": "application/xml"}, content="<notes/>"
+		)
+		assert bad_format_response.status_code == 415
+
+		another_user_response = await async_test_client.post(
+			f"/api/v1/import/day_ratings?user_id={self.id + 1}",
+			headers={**self.headers, "Content-Type": "text/csv"}, content="date,mood\n2020-01-01,true\n"
+		)
+		assert another_user_response.status_code == 403
+
+	async def test_unterminated_quote_limit(self):
+		"""
+		Незакрытая кавычка в CSV - ошибка после max_record_lines строк: остаток файла не читается.
+		"""
+		chunks_read = []
+
+		async def stream():
+			yield b'date,mood\n2024-01-01,"true\n'
+			for number in range(1000):
+				chunks_read.append(number)
+				yield b"2024-01-02,true\n"
+
+		records = [record async for record in iter_records(stream(), "csv", max_record_lines=10)]
+		assert [(line, str(error)) for line, error in records] == [(2, "Unterminated quoted value")]
+		assert len(chunks_read) < 20
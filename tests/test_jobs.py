@@ -0,0 +1,122 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from app.jobs import JobQueue
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+async def queue() -> JobQueue:
+	"""
+	Очередь задач на отдельном fakeredis (тесты приложения используют eager-режим, без стрима).
+	"""
+	queue = JobQueue(
+		stream="test-jobs", group="test-workers", dead_letter_stream="test-jobs-dead",
+		max_retries=2, claim_idle_ms=0, retry_backoff=0
+	)
+	queue.redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+	await queue._ensure_group()
+	return queue
+
+
+class TestJobQueue:
+	async def test_ack(self, queue: JobQueue):
+		"""
+		Выполненная задача подтверждается и удаляется из стрима; повтор по ключу дедупликации не ставится.
+		"""
+		payloads = []
+
+		async def handler(payload: dict[str, Any]) -> None:
+			payloads.append(payload)
+
+		queue.register("test.job", handler)
+		assert await queue.enqueue("test.job", {"id": 1}, dedup_key="test:1") is True
+		assert await queue.enqueue("test.job", {"id": 1}, dedup_key="test:1") is False
+
+		for message_id, fields in await queue._read("worker-1", count=10, block=None):
+			await queue._process(message_id, fields)
+		assert payloads == [{"id": 1}]
+		assert await queue.redis.xlen(queue.stream) == 0
+		assert (await queue.redis.xpending(queue.stream, queue.group))["pending"] == 0
+
+	async def test_retry_and_dead_letter(self, queue: JobQueue):
+		"""
+		Упавшая задача повторяется (через отложенный повтор), после max_retries попыток - попадает
+		 в dead-letter стрим, а ее ключ дедупликации удаляется.
+		"""
+		attempts = []
+
+		async def failing_handler(payload: dict[str, Any]) -> None:
+			attempts.append(payload)
+			raise RuntimeError
+
+		queue.register("test.failing", failing_handler)
+		await queue.enqueue("test.failing", {"id": 2}, dedup_key="test:2")
+
+		for message_id, fields in await queue._read("worker-1", count=10, block=None):
+			await queue._process(message_id, fields)
+		assert await queue.redis.zcard(queue.retry_key) == 1
+		assert await queue._enqueue_due_retries() == 1
+
+		messages = await queue._read("worker-1", count=10, block=None)
+		assert [fields["attempt"] for _, fields in messages] == ["1"]
+		for message_id, fields in messages:
+			await queue._process(message_id, fields)
+
+		assert len(attempts) == 2
+		dead_letters = await queue.redis.xrange(queue.dead_letter_stream)
+		assert [fields["job"] for _, fields in dead_letters] == ["test.failing"]
+		assert await queue.redis.exists(queue._dedup_key("test:2")) == 0
+		assert await queue.redis.xlen(queue.stream) == 0
+
+	async def test_claim_stale(self, queue: JobQueue):
+		"""
+		Задача упавшего воркера забирается другим воркером как неудачная попытка -
+		 поэтому задача, роняющая воркеры, в итоге попадает в dead-letter.
+		"""
+		await queue.enqueue("test.crashing", {"id": 3})
+
+		for attempt in range(queue.max_retries):
+			assert len(await queue._read("crashed-worker", count=10, block=None)) == 1  # и воркер упал
+			assert await queue._claim_stale("worker-2", count=10) == 1
+			await queue._enqueue_due_retries()
+
+		assert await queue.redis.xlen(queue.dead_letter_stream) == 1
+		assert await queue.redis.xlen(queue.stream) == 0
+		assert (await queue.redis.xpending(queue.stream, queue.group))["pending"] == 0
+
+	async def test_enqueue_error(self, queue: JobQueue, monkeypatch: pytest.MonkeyPatch):
+		"""
+		Если задачу не удалось добавить в стрим, ключ дедупликации удаляется - задачу можно поставить снова.
+		"""
+		async def broken_xadd(*args, **kwargs):
+			raise ConnectionError
+
+		monkeypatch.setattr(queue.redis, "xadd", broken_xadd)
+		with pytest.raises(ConnectionError):
+			await queue.enqueue("test.job", {"id": 4}, dedup_key="test:4")
+		assert await queue.redis.exists(queue._dedup_key("test:4")) == 0
+
+	async def test_heartbeat(self, queue: JobQueue):
+		"""
+		Аренда выполняющейся задачи продлевается: задача дольше claim_idle_ms не забирается другим воркером.
+		"""
+		queue.claim_idle_ms = 100
+		claimed = []
+
+		async def long_handler(payload: dict[str, Any]) -> None:
+			await asyncio.sleep(0.2)
+			claimed.append(await queue._claim_stale("worker-2", count=10))
+			await asyncio.sleep(0.2)
+
+		queue.register("test.long", long_handler)
+		await queue.enqueue("test.long", {"id": 5})
+		for message_id, fields in await queue._read("worker-1", count=10, block=None):
+			await queue._process(message_id, fields, "worker-1")
+
+		assert claimed == [0]
+		assert await queue.redis.zcard(queue.retry_key) == 0
+		assert (await queue.redis.xpending(queue.stream, queue.group))["pending"] == 0
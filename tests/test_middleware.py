@@ -0,0 +1,60 @@
+import gzip
+
+import pytest
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.middleware import CompressionMiddleware
+
+
+async def big_response(request):
+	return JSONResponse([{"text": "a" * 100}] * 50, headers={"ETag": '"big"'})
+
+
+async def small_response(request):
+	return JSONResponse({"text": "a"})
+
+
+class TestCompressionMiddleware:
+	async def test_compression(self):
+		"""
+		Большие ответы сжимаются (если клиент это поддерживает), маленькие - нет.
+		Повторный ответ с тем же ETag не сжимается заново.
+		"""
+		app = Starlette(routes=[Route("/big", big_response), Route("/small", small_response)])
+		middleware = CompressionMiddleware(app, minimum_size=500, cache_size=10)
+
+		async with AsyncClient(app=middleware, base_url="http://test") as client:
+			response = await client.get("/big", headers={"Accept-Encoding": "gzip"})
+			assert response.headers["Content-Encoding"] == "gzip"
+			assert response.headers["Vary"] == "Accept-Encoding"
+			assert int(response.headers["Content-Length"]) < len(response.content)  # content - уже распакованный
+			assert response.json() == [{"text": "a" * 100}] * 50
+
+			await client.get("/big", headers={"Accept-Encoding": "gzip"})
+			assert list(middleware._cache) == [('"big"', "gzip")]
+
+			small_response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+			assert "Content-Encoding" not in small_response.headers
+
+			identity_response = await client.get("/big", headers={"Accept-Encoding": "gzip;q=0, identity"})
+			assert "Content-Encoding" not in identity_response.headers
+
+		assert gzip.decompress(middleware._cache[('"big"', "gzip")]) == response.content
+
+	async def test_brotli(self):
+		"""
+		Клиент, поддерживающий brotli, получает ответ в brotli (он предпочтительнее gzip).
+		"""
+		brotli = pytest.importorskip("brotli")
+		app = Starlette(routes=[Route("/big", big_response)])
+		middleware = CompressionMiddleware(app, minimum_size=500, cache_size=10)
+
+		async with AsyncClient(app=middleware, base_url="http://test") as client:
+			response = await client.get("/big", headers={"Accept-Encoding": "gzip, br"})
+			assert response.headers["Content-Encoding"] == "br"
+			assert response.json() == [{"text": "a" * 100}] * 50
+
+		assert brotli.decompress(middleware._cache[('"big"', "br")]) == response.content
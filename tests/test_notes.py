@@ -146,7 +146,7 @@ class TestNotes:
 
 		assert user_notes == notes_list
 
-	async def test_read_notes_me_with_filtering_and_sorting(self, async_test_client: AsyncClient):
+	async def test_read_notes_me_with_filtering_and_sorting(self, async_test_client: AsyncClient, session: AsyncSession):
 		"""
 		Фильтрация и сортировка списка заметок.
 		Параметры: sorting, period, type, completed.
@@ -154,6 +154,13 @@ class TestNotes:
 		Варианты параметров - в schemas.GetNotesParams.
 		"""
 		await create_random_notes(headers=self.headers, async_client=async_test_client)
+		await change_user_params(user_id=self.id, sa_session=session, is_staff=True)
+		await create_random_note(
+			headers=self.headers,
+			async_client=async_test_client,
+			date=datetime.date.today() - datetime.timedelta(days=1),
+			raise_error=True
+		)
 
 		sorting_date_desc = enums.NotesOrderByEnum.date_desc.value
 
@@ -171,8 +178,8 @@ class TestNotes:
 			f"/api/v1/notes/me?period={period_past}", headers=self.headers
 		)
 		assert filtered_by_period_past_notes_response.status_code == 200
-		assert len(filtered_by_period_past_notes_response.json()) == 1  # на данном этапе создалась только одна задача
-		# с прошедшей датой - в тесте на создание заметок (пользователем is_staff)
+		assert len(filtered_by_period_past_notes_response.json()) == 1  # единственная заметка
+		# с прошедшей датой создана выше (пользователем is_staff); данные других тестов откатываются
 
 		type_task = enums.NoteTypeEnum.task.value
 		filtered_by_type_task_notes_list_response = await async_test_client.get(
@@ -250,6 +257,92 @@ class TestNotes:
 		)
 		assert mixed_bad_params_response.status_code == 422
 
+	async def test_read_notes_me_conditional(self, async_test_client: AsyncClient):
+		"""
+		Условный запрос списка заметок: при актуальном ETag - 304 без тела,
+		 после изменения заметок ETag меняется.
+		"""
+		await create_random_note(headers=self.headers, async_client=async_test_client, raise_error=True)
+
+		response = await async_test_client.get("/api/v1/notes/me", headers=self.headers)
+		assert response.status_code == 200
+		etag = response.headers["ETag"]
+
+		not_modified_response = await async_test_client.get(
+			"/api/v1/notes/me", headers={**self.headers, "If-None-Match": etag}
+		)
+		assert not_modified_response.status_code == 304
+		assert not_modified_response.content == b""
+
+		other_params_response = await async_test_client.get(
+			"/api/v1/notes/me?type=task", headers={**self.headers, "If-None-Match": etag}
+		)
+		assert other_params_response.status_code == 200
+
+		await create_random_note(headers=self.headers, async_client=async_test_client, raise_error=True)
+
+		modified_response = await async_test_client.get(
+			"/api/v1/notes/me", headers={**self.headers, "If-None-Match": etag}
+		)
+		assert modified_response.status_code == 200
+		assert modified_response.headers["ETag"] != etag
+		assert len(modified_response.json()) == 2
+
+	async def test_search_notes_me(self, async_test_client: AsyncClient):
+		"""
+		Полнотекстовый поиск по заметкам пользователя: поиск по префиксу, выделение найденного,
+		 постраничный вывод.
+		"""
+		for text in ("Walking in the park", "Walk the dog", "Buy some bread"):
+			response = await async_test_client.post(
+				"/api/v1/notes/",
+				json=dict(note={"text": text}),
+				headers=self.headers
+			)
+			assert response.status_code == 201
+
+		search_response = await async_test_client.get(
+			"/api/v1/notes/me/search?q=walk",
+			headers=self.headers
+		)
+		assert search_response.status_code == 200
+		found_notes = search_response.json()
+		assert sorted(note["text"] for note in found_notes) == ["Walk the dog", "Walking in the park"]
+		assert all("<b>" in note["headline"] for note in found_notes)
+		assert all(note["user_id"] == self.id for note in found_notes)
+
+		paginated_response = await async_test_client.get(
+			"/api/v1/notes/me/search?q=walk&limit=1&offset=1",
+			headers=self.headers
+		)
+		assert paginated_response.status_code == 200
+		assert len(paginated_response.json()) == 1
+
+		empty_query_response = await async_test_client.get(
+			"/api/v1/notes/me/search?q=",
+			headers=self.headers
+		)
+		assert empty_query_response.status_code == 422
+
+	async def test_autocomplete_notes_me(self, async_test_client: AsyncClient):
+		"""
+		Автодополнение по заметкам пользователя находит заметки и с опечаткой в запросе.
+		"""
+		for text in ("Call grandmother tomorrow", "Buy some bread"):
+			response = await async_test_client.post(
+				"/api/v1/notes/",
+				json=dict(note={"text": text}),
+				headers=self.headers
+			)
+			assert response.status_code == 201
+
+		autocomplete_response = await async_test_client.get(
+			"/api/v1/notes/me/autocomplete?q=grandmoter",
+			headers=self.headers
+		)
+		assert autocomplete_response.status_code == 200
+		assert [note["text"] for note in autocomplete_response.json()] == ["Call grandmother tomorrow"]
+
 	async def test_read_note(self, async_test_client: AsyncClient):
 		"""
 		Чтение заметки пользователем.
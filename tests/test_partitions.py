@@ -0,0 +1,64 @@
+import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.partitions import month_start, partition_name, partition_month, get_partitions, ensure_partitions, \
+	PARTITIONED_TABLES
+
+
+async def note_partition(conn, note_date: datetime.date) -> str:
+	"""
+	Вставка заметки на дату и имя партиции, в которую она попала.
+	"""
+	result = await conn.execute(
+		text("INSERT INTO notes (text, date) VALUES ('Заметка', :date) RETURNING id"), {"date": note_date}
+	)
+	result = await conn.execute(
+		text("SELECT tableoid::regclass::text FROM notes WHERE id = :id"), {"id": result.scalar()}
+	)
+	return result.scalar()
+
+
+class TestPartitions:
+	def test_partition_names(self):
+		"""
+		Границы и имена месячных партиций (в т.ч. переход через год).
+		"""
+		assert month_start(datetime.date(2023, 12, 15)) == datetime.date(2023, 12, 1)
+		assert month_start(datetime.date(2023, 12, 15), 1) == datetime.date(2024, 1, 1)
+		assert month_start(datetime.date(2024, 1, 31), -1) == datetime.date(2023, 12, 1)
+		assert partition_name("notes", datetime.date(2024, 1, 1)) == "notes_2024_01"
+		assert partition_month("notes", "notes_2024_01") == datetime.date(2024, 1, 1)
+		assert partition_month("notes", "notes_default") is None
+
+	async def test_current_month_partitions_exist(self, session: AsyncSession):
+		"""
+		При старте создаются DEFAULT-партиции и партиции на текущий месяц, строки попадают в нужную партицию.
+		"""
+		conn = await session.connection()
+		current_month = month_start(datetime.date.today())
+		for table in PARTITIONED_TABLES:
+			partitions = await get_partitions(conn, table)
+			assert f"{table}_default" in partitions
+			assert partition_name(table, current_month) in partitions
+
+		assert await note_partition(conn, datetime.date.today()) == partition_name("notes", current_month)
+
+	async def test_default_partition_months(self, session: AsyncSession):
+		"""
+		Строки прошлых месяцев (без своей партиции) сначала попадают в DEFAULT-партицию,
+		 а при обслуживании для их месяцев создаются партиции - строки переносятся в них.
+		"""
+		conn = await session.connection()
+		past_month = month_start(datetime.date.today(), -30)
+		assert await note_partition(conn, past_month) == "notes_default"
+		assert await note_partition(conn, month_start(past_month, 2)) == "notes_default"
+
+		await ensure_partitions(conn)
+		partitions = await get_partitions(conn, "notes")
+		assert {partition_name("notes", month_start(past_month, shift)) for shift in range(3)} <= set(partitions)
+		result = await conn.execute(
+			text("SELECT tableoid::regclass::text FROM notes WHERE date = :date"), {"date": past_month}
+		)
+		assert result.scalars().all() == [partition_name("notes", past_month)]
@@ -1,10 +1,18 @@
 import pytest
 from httpx import AsyncClient
 import datetime
+import random
+import config
+from app.crud import crud_polling
 from app.static.enums import PollingTypeEnum
-from app.models.polling import PollingString
+from app.models.polling import Polling, PollingString
+from app.events import event_bus
+from app.tasks import generate_poll, initialize_user_polls
+from app.uow import UnitOfWork
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
-import asyncio
+from tests.additional.fills import create_user
+from tests.additional.funcs import change_user_params
 
 
 @pytest.mark.usefixtures("generate_user_with_token")
@@ -20,8 +28,6 @@ class TestPolling:
 		)
 		assert user_action.status_code == 200
 
-		await asyncio.sleep(3)  # бэкграунд-задачи не успевают сразу сделать опрос
-
 		user_polling = await async_test_client.get(
 			f"/api/v1/polling/user/{self.id}"
 		)
@@ -42,6 +48,7 @@ class TestPolling:
 		assert polling_data["polling_string_id"] in [
 			poll["id"] for poll in polls
 		]
+		assert polling_data["text"] == next(poll["text"] for poll in polls if poll["id"] == polling_data["polling_string_id"])
 
 		assert polling_data["completed"] is False
 
@@ -74,8 +81,6 @@ class TestPolling:
 
 		assert user_action.status_code == 200
 
-		await asyncio.sleep(3)  # бэкграунд-задачи не успевают сразу сделать опрос
-
 		user_polling = await async_test_client.get(
 			f"/api/v1/polling/user/{self.id}"
 		)
@@ -108,3 +113,174 @@ class TestPolling:
 			f"/api/v1/polling/132435"
 		)
 		assert updated_non_existing_polling.status_code == 404
+
+	async def test_pollings_range(self, async_test_client: AsyncClient, session: AsyncSession):
+		"""
+		Опросы пользователя за период - с текстом вопроса.
+		"""
+		await async_test_client.get("/api/v1/notes/me", headers=self.headers)
+		polling = (await async_test_client.get(f"/api/v1/polling/user/{self.id}")).json()
+		month_ago = datetime.date.today() - datetime.timedelta(days=30)
+
+		unauthorized_response = await async_test_client.get(
+			f"/api/v1/polling/user/{self.id}/range?date_from={month_ago}"
+		)
+		assert unauthorized_response.status_code == 401
+
+		other_user = await create_user(
+			"other_range@gmail.com", "12345678", "Ivan", async_client=async_test_client, raise_error=True
+		)
+		other_user_response = await async_test_client.get(
+			f"/api/v1/polling/user/{other_user['id']}/range?date_from={month_ago}", headers=self.headers
+		)
+		assert other_user_response.status_code == 403
+
+		pollings_response = await async_test_client.get(
+			f"/api/v1/polling/user/{self.id}/range?date_from={month_ago}", headers=self.headers
+		)
+		assert pollings_response.status_code == 200
+		pollings = pollings_response.json()
+		assert [poll["id"] for poll in pollings] == [polling["id"]]
+
+		polls = await PollingString.get_polling_type_strings(polling_type=polling["poll_type"], db=session)
+		assert pollings[0]["text"] == next(poll["text"] for poll in polls if poll["id"] == polling["polling_string_id"])
+
+		empty_period_response = await async_test_client.get(
+			f"/api/v1/polling/user/{self.id}/range?date_from={month_ago}&date_to={month_ago}", headers=self.headers
+		)
+		assert empty_period_response.json() == []
+
+		wrong_period_response = await async_test_client.get(
+			f"/api/v1/polling/user/{self.id}/range?date_from={datetime.date.today()}&date_to={month_ago}",
+			headers=self.headers
+		)
+		assert wrong_period_response.status_code == 422
+
+	async def test_polling_stats(self, async_test_client: AsyncClient, session: AsyncSession):
+		"""
+		Статистика опросов по типам и вопросам (только для is_staff-пользователей).
+		"""
+		await async_test_client.get("/api/v1/notes/me", headers=self.headers)
+		polling = (await async_test_client.get(f"/api/v1/polling/user/{self.id}")).json()
+		await async_test_client.put(f"/api/v1/polling/{polling['id']}")
+
+		not_staff_response = await async_test_client.get("/api/v1/polling/stats/types", headers=self.headers)
+		assert not_staff_response.status_code == 403
+
+		await change_user_params(user_id=self.id, sa_session=session, is_staff=True)
+		types_stats = await async_test_client.get("/api/v1/polling/stats/types", headers=self.headers)
+		assert types_stats.status_code == 200
+		assert types_stats.json() == [{
+			"poll_type": polling["poll_type"], "polls": 1, "completed": 1, "completed_same_day": 1,
+			"completion_rate": 1.0, "same_day_completion_rate": 1.0
+		}]
+
+		strings_stats = await async_test_client.get(
+			f"/api/v1/polling/stats/strings?poll_type={polling['poll_type']}", headers=self.headers
+		)
+		assert strings_stats.json()[0]["polling_string_id"] == polling["polling_string_id"]
+		assert strings_stats.json()[0]["completion_rate"] == 1.0
+		assert all(stats["polls"] == 0 for stats in strings_stats.json()[1:])
+
+		long_period_response = await async_test_client.get(
+			"/api/v1/polling/stats/types?date_from=2020-01-01", headers=self.headers
+		)
+		assert long_period_response.status_code == 422
+
+	async def test_polling_stats_cold_cache(self, session: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+		"""
+		Дни периода, которых нет в кэше, считаются одним запросом; повторно - из кэша, без запросов.
+		"""
+		queries = []
+		execute = session.execute
+
+		async def counting_execute(*args, **kwargs):
+			queries.append(args[0])
+			return await execute(*args, **kwargs)
+
+		monkeypatch.setattr(session, "execute", counting_execute)
+		date_to = datetime.date.today() - datetime.timedelta(days=400)  # дни, которых нет в кэше других тестов
+		date_from = date_to - datetime.timedelta(days=6)
+
+		assert await crud_polling.get_polling_stats(date_from, date_to, db=session) == []
+		assert len(queries) == 1
+		assert await crud_polling.get_polling_stats(date_from, date_to, db=session) == []
+		assert len(queries) == 1
+
+	async def test_polling_creating_twice(self, session: AsyncSession, monkeypatch: pytest.MonkeyPatch):
+		"""
+		Повторное создание опроса пользователю на тот же день ничего не создает (None),
+		 а генерация опроса при уже существующем - не публикует событие "polling.created".
+		"""
+		published = []
+
+		async def publish(event: str, payload: dict) -> None:
+			published.append(event)
+
+		monkeypatch.setattr(event_bus, "publish", publish)
+		await session.execute(delete(Polling).where(Polling.user_id == self.id))
+		catalog = await crud_polling.get_polling_strings_catalog(session)
+		poll_type = PollingTypeEnum.mood.value
+		polling = dict(poll_type=poll_type, polling_string_id=catalog[poll_type][0], user_id=self.id)
+
+		assert await crud_polling.create_polling(session, **polling) is not None
+		assert await crud_polling.create_polling(session, **polling) is None
+
+		await initialize_user_polls(self.id, db=session)
+		await UnitOfWork.of(session).commit()
+		assert published == []
+
+	async def test_generate_poll(
+		self, async_test_client: AsyncClient, session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+	):
+		"""
+		Тип опроса выбирается взвешенно (config.POLLING_TYPES_WEIGHTS) только из доступных: без заметок
+		 и задач в текущем дне - без "note" и "task", с нулевым весом - никогда.
+		Каталог опросов загружается из БД один раз.
+		"""
+		choices_calls, queries = [], []
+		choices, execute = random.choices, session.execute
+
+		def recording_choices(population, weights=None, **kwargs):
+			choices_calls.append((population, weights))
+			return choices(population, weights=weights, **kwargs)
+
+		async def counting_execute(*args, **kwargs):
+			queries.append(args[0])
+			return await execute(*args, **kwargs)
+
+		monkeypatch.setattr(random, "choices", recording_choices)
+		monkeypatch.setattr(session, "execute", counting_execute)
+		monkeypatch.setattr(config, "POLLING_TYPES_WEIGHTS", {**config.POLLING_TYPES_WEIGHTS, "mood": 0})
+		crud_polling.polling_strings_catalog.clear()
+
+		for _ in range(10):
+			polling_string_id, poll_type = await generate_poll(self.id, db=session)
+			assert poll_type not in (PollingTypeEnum.note.value, PollingTypeEnum.task.value, "mood")
+			assert polling_string_id in crud_polling.polling_strings_catalog[poll_type]
+		assert len(queries) == 1 + 10  # catalog + check_user_day_notes on each call
+
+		population, weights = choices_calls[0]
+		assert set(population) == set(crud_polling.polling_strings_catalog) - {"note", "task", "mood"}
+		assert weights == [config.POLLING_TYPES_WEIGHTS[poll_type] for poll_type in population]
+
+		await async_test_client.post("/api/v1/notes/", json=dict(note={"text": "Заметка"}), headers=self.headers)
+		await generate_poll(self.id, db=session)
+		population, _ = choices_calls[-1]
+		assert PollingTypeEnum.note.value in population
+		assert PollingTypeEnum.task.value not in population
+
+	async def test_polling_completed_twice(self, async_test_client: AsyncClient, session: AsyncSession):
+		"""
+		Повторное прохождение опроса не меняет время первого прохождения.
+		"""
+		await async_test_client.get("/api/v1/notes/me", headers=self.headers)
+		polling = (await async_test_client.get(f"/api/v1/polling/user/{self.id}")).json()
+
+		completed_at = []
+		for _ in range(2):
+			assert (await async_test_client.put(f"/api/v1/polling/{polling['id']}")).status_code == 200
+			result = await session.execute(select(Polling.completed_at).where(Polling.id == polling["id"]))
+			completed_at.append(result.scalar())
+		assert completed_at[0] is not None
+		assert completed_at[1] == completed_at[0]
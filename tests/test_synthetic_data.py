@@ -0,0 +1,53 @@
+import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from benchmarks.synthetic_data import SyntheticDataGenerator, load_synthetic_data, COLUMNS
+
+POLLING_STRINGS = {"mood": [1, 2], "health": [3]}
+
+
+class TestSyntheticData:
+	def test_distributions(self):
+		"""
+		Распределения сгенерированных данных - в ожидаемых пределах (см. описание модуля synthetic_data).
+		"""
+		generator = SyntheticDataGenerator(
+			days=60, polling_strings=POLLING_STRINGS, hashed_password="hash",
+			first_ids={"users": 0, "notes": 0, "polling": 0}, seed=1
+		)
+		rows = generator.users_batch(2000)
+		today = datetime.date.today()
+		assert len(rows["users"]) == 2000
+		assert [user[0] for user in rows["users"]] == list(range(1, 2001))
+
+		notes_per_user = len(rows["notes"]) / len(rows["users"])
+		assert 3 < notes_per_user < 30
+
+		past_tasks = [note for note in rows["notes"] if note[1] == "task" and note[3] < today]
+		tasks_completion_rate = sum(note[5] for note in past_tasks) / len(past_tasks)
+		assert 0.55 < tasks_completion_rate < 0.85
+		assert all(note[5] is None for note in rows["notes"] if note[1] == "note")
+
+		rating_density = len(rows["day_ratings"]) / len(rows["polling"])  # a poll - in each active day
+		assert 0.2 < rating_density < 0.5
+		assert all(any(answer is not None for answer in rating[2:]) for rating in rows["day_ratings"])
+
+		assert {poll[2] for poll in rows["polling"]} == set(POLLING_STRINGS)
+		assert all(poll[6] is None for poll in rows["polling"] if not poll[5])
+
+	async def test_load(self, session: AsyncSession):
+		"""
+		Загрузка в тестовую БД в небольшом объеме: количество строк по таблицам совпадает с отчетом загрузки.
+		"""
+		conn = await session.connection()
+		loaded = await load_synthetic_data(conn, users=30, days=20, batch_size=20, seed=1)
+		assert loaded["users"] == 30
+		assert loaded["polling"] > 0 and loaded["notes"] > 0
+
+		synthetic_users = "SELECT id FROM users WHERE email LIKE 'synthetic\\_%@example.com'"
+		for table in COLUMNS:
+			column = "id" if table == "users" else "user_id"
+			result = await conn.execute(text(f"SELECT count(*) FROM {table} WHERE {column} IN ({synthetic_users})"))
+			assert result.scalar() == loaded[table], table
@@ -0,0 +1,91 @@
+import datetime
+
+import pytest
+from fastapi.dependencies.models import Dependant
+from fastapi.routing import APIRoute
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.crud.crud_day_ratings import create_day_rating
+from app.dependencies import get_async_session
+from app.main import app
+from app.models.day_ratings import DayRating
+from app.uow import UnitOfWork, UnitOfWorkRoute
+
+
+def uses_session(dependant: Dependant) -> bool:
+	return any(
+		dependency.call is get_async_session or uses_session(dependency) for dependency in dependant.dependencies
+	)
+
+
+@pytest.mark.usefixtures("generate_user_with_token")
+class TestUnitOfWork:
+	async def test_identity_map(self, session: AsyncSession):
+		"""
+		Объект загружается один раз за единицу работы, отсутствующий объект не кэшируется.
+		"""
+		unit_of_work = UnitOfWork.of(session)
+		assert UnitOfWork.of(session) is unit_of_work
+		loads = []
+
+		async def loader():
+			loads.append(1)
+			return {"id": 1} if len(loads) > 1 else None
+
+		assert await unit_of_work.load("note", 1, loader) is None
+		assert await unit_of_work.load("note", 1, loader) == {"id": 1}
+		assert await unit_of_work.load("note", 1, loader) == {"id": 1}
+		assert len(loads) == 2
+
+		unit_of_work.forget("note", 1)
+		assert unit_of_work.get("note", 1) is None
+
+	async def test_savepoint(self, session: AsyncSession):
+		"""
+		Ошибка в SAVEPOINT-блоке откатывает только его изменения и отменяет его отложенные действия;
+		 отложенные действия выполняются после фиксации.
+		"""
+		work = UnitOfWork.of(session)
+		committed, yesterday = [], datetime.date.today() - datetime.timedelta(days=1)
+
+		async def on_commit(name: str):
+			committed.append(name)
+
+		with pytest.raises(RuntimeError):
+			async with work.savepoint():
+				await create_day_rating(schemas.DayRatingImport(user_id=self.id, date=yesterday, mood=True), db=session)
+				work.after_commit(lambda: on_commit("rolled back"))
+				raise RuntimeError
+		await create_day_rating(schemas.DayRatingCreate(user_id=self.id, mood=True), db=session)
+		work.after_commit(lambda: on_commit("saved"))
+		assert committed == []
+
+		await work.commit()
+		assert committed == ["saved"]
+		result = await session.execute(select(DayRating.date).where(DayRating.user_id == self.id))
+		assert result.scalars().all() == [datetime.date.today()]
+
+	async def test_request_commit(self, async_test_client: AsyncClient):
+		"""
+		Изменения запроса фиксируются после эндпоинта и видны следующим запросам.
+		"""
+		update_response = await async_test_client.put(
+			f"/api/v1/users/{self.id}", headers=self.headers, json={"user": {"last_name": "Petrov"}}
+		)
+		assert update_response.status_code == 200
+		assert update_response.json()["last_name"] == "Petrov"
+
+		user_response = await async_test_client.get("/api/v1/users/me", headers=self.headers)
+		assert user_response.json()["last_name"] == "Petrov"
+
+	def test_routes_unit_of_work(self):
+		"""
+		Все маршруты с сессией БД (в том числе через зависимости) - UnitOfWorkRoute: сессия фиксируется
+		 только им, без него изменения запроса молча откатываются.
+		"""
+		routes = [route for route in app.routes if isinstance(route, APIRoute) and uses_session(route.dependant)]
+		assert routes
+		assert [route.path for route in routes if not isinstance(route, UnitOfWorkRoute)] == []
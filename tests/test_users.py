@@ -4,7 +4,7 @@ from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.users import User
-from .additional.funcs import convert_obj_creating_time
+from .additional.funcs import convert_obj_creating_time, change_user_params
 from .additional.fills import create_user
 
 
@@ -77,6 +77,48 @@ class TestUsers:
 			"id": self.id, "is_staff": False, "disabled": False
 		}
 
+	async def test_search_users(self, async_test_client: AsyncClient, session: AsyncSession):
+		"""
+		Автодополнение пользователей для is_staff-пользователей: по префиксу email
+		 и по похожему имени (с опечаткой).
+		"""
+		await change_user_params(user_id=self.id, sa_session=session, is_staff=True)
+
+		prefix_response = await async_test_client.get(
+			f"/api/v1/users/search?q={self.email[:8]}",
+			headers=self.headers
+		)
+		assert prefix_response.status_code == 200
+		assert any(user["id"] == self.id for user in prefix_response.json())
+
+		await create_user(
+			email="maximilian_search@example.com", password="qwerty123",
+			firstname="Maximilian", async_client=async_test_client, raise_error=True
+		)
+		fuzzy_response = await async_test_client.get(
+			"/api/v1/users/search?q=Maximilan&limit=1",
+			headers=self.headers
+		)
+		assert fuzzy_response.status_code == 200
+		assert [user["first_name"] for user in fuzzy_response.json()] == ["Maximilian"]
+
+	async def test_search_users_errors(self, async_test_client: AsyncClient):
+		"""
+		- Поиск без прав is_staff - ответ 403;
+		- Невалидные параметры поиска.
+		"""
+		response = await async_test_client.get(
+			"/api/v1/users/search?q=autotest",
+			headers=self.headers
+		)
+		assert response.status_code == 403
+
+		bad_threshold_response = await async_test_client.get(
+			"/api/v1/users/search?q=autotest&threshold=2",
+			headers=self.headers
+		)
+		assert bad_threshold_response.status_code == 422
+
 	async def test_update_user(self, async_test_client: AsyncClient):
 		"""
 		Тест изменения данных пользователя.